@@ -1,7 +1,18 @@
 import streamlit as st
-from database import MongoDBManager
-from auth import RedisAuth
-from cryptography.fernet import Fernet
+import streamlit.components.v1 as components
+from ratelimit import LoginThrottled
+from cache import CachedMongoDBManager, VaultCache
+from bulk import read_csv_entries, read_json_entries, import_entries, iter_export
+from crypto import VaultCrypto, seal_key, open_key
+from rotation import KeyRotationJob
+from breach import BreachChecker
+from observability import configure_logging, start_metrics_server
+from audit import start_audit
+from resilience import LazyConnection, ServiceUnavailable
+from storage import store_factories, VersionConflict
+from cryptography.fernet import InvalidToken
+import io
+import json
 import os
 
 # Configuração da página
@@ -11,32 +22,177 @@ st.set_page_config(
     layout="wide"
 )
 
+# Logging (LOG_LEVEL/LOG_FORMAT) e métricas em /metrics (METRICS_PORT), uma vez por processo
+@st.cache_resource
+def init_observability():
+    configure_logging()
+    return start_metrics_server()
+
+init_observability()
+
+# Trilha de auditoria (AUDIT_ENABLED): logins e alterações do cofre entram em
+# uma fila e são gravados em lote em segundo plano, fora do tempo da requisição
+@st.cache_resource
+def init_audit():
+    return start_audit()
+
+init_audit()
+
 # Inicializar gerenciadores
 @st.cache_resource
 def init_managers():
-    mongo = MongoDBManager()
-    redis_auth = RedisAuth()
-    return mongo, redis_auth
+    # As conexões são abertas em paralelo e em segundo plano: a página é
+    # servida sem esperar o handshake com o Atlas, e só o primeiro uso de cada
+    # gerenciador espera a conexão (com novas tentativas e disjuntor)
+    # O backend (STORAGE_BACKEND) define as classes: MongoDB + Redis ou um
+    # arquivo SQLite local
+    (nome_cofre, cofre), (nome_auth, autenticacao) = store_factories()
+    mongo_connection = LazyConnection(nome_cofre, cofre)
+    redis_connection = LazyConnection(nome_auth, autenticacao)
+    if os.getenv('BOOTSTRAP_MODE', 'parallel') == 'parallel':
+        mongo_connection.start()
+        redis_connection.start()
+    
+    # Páginas e buscas por usuário (só metadados) ficam em cache para não ir ao Atlas a cada rerun
+    mongo = CachedMongoDBManager(
+        mongo_connection,
+        VaultCache(
+            max_users=int(os.getenv('VAULT_CACHE_MAX_USERS', 1000)),
+            ttl=int(os.getenv('VAULT_CACHE_TTL', 60))
+        )
+    )
+    return mongo, redis_connection
 
 mongo_manager, redis_auth = init_managers()
 
-# Função para criptografar senha
-def encrypt_password(password, key):
-    f = Fernet(key)
-    return f.encrypt(password.encode()).decode()
+# Filtro local de senhas vazadas (BREACH_FILTER_PATH); None se não configurado
+@st.cache_resource
+def init_breach_checker():
+    return BreachChecker.from_env()
+
+breach_checker = init_breach_checker()
 
-# Função para descriptografar senha
-def decrypt_password(encrypted_password, key):
-    f = Fernet(key)
-    return f.decrypt(encrypted_password.encode()).decode()
+# Senhas vazadas só são salvas se o usuário confirmar
+MENSAGEM_VAZADA = "🚨 Esta senha aparece em vazamentos conhecidos. Escolha outra ou confirme para salvar mesmo assim."
 
-# Inicializar session state
-if 'logged_in' not in st.session_state:
+def breached_and_not_confirmed(senha, confirmado):
+    return bool(breach_checker) and not confirmado and breach_checker.is_breached(senha)
+
+# Resultado de uma alteração feita em callback, exibido na execução seguinte
+def show_feedback(chave):
+    feedback = st.session_state.pop(chave, None)
+    if feedback:
+        tipo, mensagem = feedback
+        getattr(st, tipo)(mensagem)
+
+MENSAGEM_CONFLITO = "⚠️ Esta senha foi alterada em outra sessão. Confira os dados atuais e tente novamente."
+
+# Quantidade de entradas por página na listagem
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+
+# Quantidade máxima de resultados da busca nas páginas de edição/exclusão
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 20))
+
+# O token de sessão (opaco) fica em um cookie do navegador, nunca na URL, onde
+# vazaria por histórico, logs de proxy ou Referer. A cada execução ele é
+# resolvido no Redis, então recarregar a página, reiniciar o processo ou cair em
+# outra réplica mantém o login. O Streamlit não grava cookies: o app só lê o
+# cookie enviado na conexão (st.context.cookies) e um componente sem altura o
+# grava (ou apaga) pelo JavaScript da página, sem HttpOnly.
+SESSION_COOKIE = os.getenv('SESSION_COOKIE', 'vault_session')
+SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'true').lower() == 'true'
+
+def get_session_token():
+    return st.session_state.get("session_token")
+
+def set_session_token(token):
+    st.session_state.session_token = token
+
+def cookie_token():
+    return st.context.cookies.get(SESSION_COOKIE)
+
+# Alinha o cookie com o token da sessão; o cookie lido é o da conexão, então o
+# componente é renderizado (de forma idempotente) enquanto os dois diferirem
+def sync_session_cookie():
+    token = get_session_token()
+    if token == cookie_token():
+        return
+    atributos = "; Path=/; SameSite=Strict" + ("; Secure" if SESSION_COOKIE_SECURE else "")
+    if token:
+        valor = f"{SESSION_COOKIE}={token}{atributos}"
+    else:
+        valor = f"{SESSION_COOKIE}=; Max-Age=0{atributos}"
+    components.html(f"<script>parent.document.cookie = {json.dumps(valor)};</script>", height=0)
+
+# Versões anteriores guardavam o token na URL (?sid=...): ele é descartado, sem uso
+def drop_url_token():
+    if "sid" in st.query_params:
+        st.query_params.pop("sid", None)
+
+def clear_session():
+    st.session_state.session_token = None
     st.session_state.logged_in = False
-if 'username' not in st.session_state:
     st.session_state.username = None
-if 'encryption_key' not in st.session_state:
-    st.session_state.encryption_key = None
+    st.session_state.vault_crypto = None
+    st.session_state.list_cursors = [None]
+    st.session_state.revealed = {}
+
+# Backend fora do ar (ou com o circuito aberto): avisa e interrompe esta execução
+def unavailable_message(e):
+    return f"🚫 Serviço temporariamente indisponível ({e}). Tente novamente em instantes."
+
+def service_unavailable(e):
+    st.error(unavailable_message(e))
+    st.stop()
+
+# Proxies reversos confiáveis na frente do app (0 = usar o endereço da conexão)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+
+def forwarded_client(forwarded, remote_ip, hops=TRUSTED_PROXY_HOPS):
+    # Cada proxy acrescenta à direita quem o chamou: só as `hops` últimas entradas
+    # foram escritas por proxies confiáveis, as anteriores vêm do próprio cliente
+    enderecos = [endereco.strip() for endereco in (forwarded or "").split(",") if endereco.strip()]
+    if hops <= 0 or not enderecos:
+        return remote_ip
+    return enderecos[-min(hops, len(enderecos))]
+
+# Identificador do cliente para o limitador de login (IP da conexão ou do proxy confiável)
+def get_client_id():
+    try:
+        from streamlit import runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        request = runtime.get_instance().get_client(get_script_run_ctx().session_id).request
+    except Exception:
+        return None
+    forwarded = request.headers.get("X-Forwarded-For")
+    if not forwarded and TRUSTED_PROXY_HOPS > 0:
+        forwarded = request.headers.get("X-Real-Ip")
+    return forwarded_client(forwarded, request.remote_ip)
+
+# Inicializar session state (uma sessão nova retoma o login pelo cookie)
+if 'logged_in' not in st.session_state:
+    clear_session()
+    set_session_token(cookie_token())
+drop_url_token()
+
+# Resolver a sessão pelo token a cada execução: o Redis é a fonte da verdade,
+# então sessões revogadas (ex.: troca da senha mestra) ou expiradas caem
+session_token = get_session_token()
+try:
+    session = redis_auth.resolve_session(session_token) if session_token else None
+except ServiceUnavailable as e:
+    service_unavailable(e)
+
+if session:
+    if not st.session_state.logged_in or st.session_state.username != session['username']:
+        try:
+            st.session_state.vault_crypto = VaultCrypto(open_key(session['sealed_key'], session_token))
+            st.session_state.username = session['username']
+            st.session_state.logged_in = True
+        except (KeyError, InvalidToken):
+            clear_session()
+else:
+    clear_session()
 
 # Página de Login
 def login_page():
@@ -53,13 +209,30 @@ def login_page():
             
             if submit:
                 if username and password:
-                    if redis_auth.authenticate(username, password):
-                        st.session_state.logged_in = True
-                        st.session_state.username = username
-                        # Gerar chave de criptografia baseada no usuário
-                        st.session_state.encryption_key = Fernet.generate_key()
-                        st.success("Login realizado com sucesso!")
-                        st.rerun()
+                    try:
+                        user = redis_auth.login(username, password, get_client_id())
+                    except LoginThrottled as e:
+                        st.error(f"🚫 {e}")
+                        return
+                    
+                    if user:
+                        # Derivar a chave do cofre da senha mestra (uma vez por login)
+                        vault_crypto = VaultCrypto.from_password(password, user['vault_salt'])
+                        
+                        # A sessão no Redis guarda a chave selada com o token
+                        token = redis_auth.create_session(
+                            username,
+                            seal=lambda t: seal_key(vault_crypto.key, t)
+                        )
+                        if token:
+                            st.session_state.logged_in = True
+                            st.session_state.username = username
+                            st.session_state.vault_crypto = vault_crypto
+                            set_session_token(token)
+                            st.success("Login realizado com sucesso!")
+                            st.rerun()
+                        else:
+                            st.error("Erro ao criar sessão. Tente novamente.")
                     else:
                         st.error("Usuário ou senha incorretos!")
                 else:
@@ -92,15 +265,17 @@ def main_page():
     col1, col2 = st.columns([6, 1])
     with col2:
         if st.button("🚪 Sair"):
-            st.session_state.logged_in = False
-            st.session_state.username = None
-            st.session_state.encryption_key = None
+            token = get_session_token()
+            if token:
+                redis_auth.revoke_session(token)
+            clear_session()
             st.rerun()
     
     # Menu de operações
     menu = st.sidebar.selectbox(
         "Menu",
-        ["📋 Listar Senhas", "➕ Adicionar Senha", "✏️ Editar Senha", "🗑️ Excluir Senha"]
+        ["📋 Listar Senhas", "➕ Adicionar Senha", "✏️ Editar Senha", "🗑️ Excluir Senha",
+         "📦 Importar/Exportar", "🛡️ Auditoria", "🔑 Trocar Senha Mestra"]
     )
     
     if menu == "📋 Listar Senhas":
@@ -111,35 +286,95 @@ def main_page():
         edit_password()
     elif menu == "🗑️ Excluir Senha":
         delete_password()
+    elif menu == "📦 Importar/Exportar":
+        import_export()
+    elif menu == "🛡️ Auditoria":
+        audit_passwords()
+    elif menu == "🔑 Trocar Senha Mestra":
+        change_master_password()
 
-# Listar todas as senhas
+# Listar senhas (paginado)
 def list_passwords():
     st.header("📋 Minhas Senhas Armazenadas")
     
-    passwords = mongo_manager.list_passwords(st.session_state.username)
+    # Pilha de cursores: o último é o da página atual
+    if 'list_cursors' not in st.session_state:
+        st.session_state.list_cursors = [None]
+    
+    passwords, next_cursor = mongo_manager.list_passwords_page(
+        st.session_state.username,
+        limit=PAGE_SIZE,
+        cursor=st.session_state.list_cursors[-1]
+    )
     
     if passwords:
-        st.info(f"Total de senhas armazenadas: {len(passwords)}")
+        st.info(f"Página {len(st.session_state.list_cursors)}")
         
-        for idx, pwd in enumerate(passwords, 1):
-            with st.expander(f"🔑 {pwd['nome']} (ID: {pwd['_id']})"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"**Nome:** {pwd['nome']}")
-                    st.write(f"**Usuário:** {st.session_state.username}")
-                with col2:
-                    # Mostrar senha ofuscada com opção de revelar
-                    if st.button(f"👁️ Mostrar Senha", key=f"show_{idx}"):
-                        try:
-                            decrypted = decrypt_password(pwd['senha'], st.session_state.encryption_key)
-                            st.code(decrypted)
-                        except:
-                            st.code(pwd['senha'])
-                    else:
-                        st.code("••••••••")
+        password_grid(passwords)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(st.session_state.list_cursors) > 1 and st.button("⬅️ Anterior"):
+                st.session_state.list_cursors.pop()
+                st.session_state.revealed = {}
+                st.rerun()
+        with col2:
+            if next_cursor and st.button("Próxima ➡️"):
+                st.session_state.list_cursors.append(next_cursor)
+                st.session_state.revealed = {}
+                st.rerun()
+    elif len(st.session_state.list_cursors) > 1:
+        # Página ficou vazia (ex.: entradas excluídas): volta ao início
+        st.session_state.list_cursors = [None]
+        st.rerun()
     else:
         st.warning("Nenhuma senha cadastrada ainda.")
 
+# Grade da página atual: só metadados; o texto cifrado é buscado e descriptografado
+# apenas para as linhas marcadas para revelar. Como fragmento, marcar uma linha
+# executa de novo só a grade, não o script inteiro
+@st.fragment
+def password_grid(passwords):
+    grade = st.data_editor(
+        [
+            {
+                "👁️": False,
+                "Nome": pwd['nome'],
+                "Atualizada em (UTC)": pwd.get('data_atualizacao'),
+                "ID": pwd['_id']
+            }
+            for pwd in passwords
+        ],
+        column_config={"👁️": st.column_config.CheckboxColumn("👁️", help="Mostrar senha", width="small")},
+        disabled=["Nome", "Atualizada em (UTC)", "ID"],
+        hide_index=True,
+        use_container_width=True,
+        key="password_grid"
+    )
+    
+    marcadas = [pwd for pwd, linha in zip(passwords, grade) if linha["👁️"]]
+    reveladas = st.session_state.revealed
+    for password_id in set(reveladas) - {pwd['_id'] for pwd in marcadas}:
+        del reveladas[password_id]
+    
+    for pwd in marcadas:
+        if pwd['_id'] not in reveladas:
+            # A listagem não traz o texto cifrado: busca só esta entrada. Uma
+            # execução só do fragmento não passa pelo try/except do fim do
+            # script, então a indisponibilidade (inclusive CircuitOpen) é tratada aqui
+            try:
+                completa = mongo_manager.get_password_by_id(st.session_state.username, pwd['_id'])
+            except ServiceUnavailable as e:
+                st.error(unavailable_message(e))
+                return
+            reveladas[pwd['_id']] = completa and st.session_state.vault_crypto.decrypt_many([completa['senha']])[0]
+        
+        if reveladas[pwd['_id']] is None:
+            st.warning(f"Não foi possível descriptografar a senha de '{pwd['nome']}' com a chave atual.")
+        else:
+            st.write(f"**🔑 {pwd['nome']}**")
+            st.code(reveladas[pwd['_id']])
+
 # Adicionar nova senha
 def add_password():
     st.header("➕ Adicionar Nova Senha")
@@ -147,17 +382,23 @@ def add_password():
     with st.form("add_form"):
         nome = st.text_input("Nome/Serviço (ex: Gmail, Facebook)")
         senha = st.text_input("Senha", type="password")
+        confirmado = st.checkbox("Salvar mesmo se a senha constar em vazamentos") if breach_checker else False
         submit = st.form_submit_button("💾 Salvar")
         
         if submit:
             if nome and senha:
+                if breached_and_not_confirmed(senha, confirmado):
+                    st.error(MENSAGEM_VAZADA)
+                    return
+                
                 # Criptografar senha antes de salvar
-                encrypted = encrypt_password(senha, st.session_state.encryption_key)
+                encrypted = st.session_state.vault_crypto.encrypt(senha)
                 
                 result = mongo_manager.create_password(
                     st.session_state.username,
                     nome,
-                    encrypted
+                    encrypted,
+                    st.session_state.vault_crypto.fingerprint(senha)
                 )
                 
                 if result:
@@ -171,8 +412,11 @@ def add_password():
 # Editar senha existente
 def edit_password():
     st.header("✏️ Editar Senha")
+    show_feedback("edit_feedback")
     
-    passwords = mongo_manager.list_passwords(st.session_state.username)
+    # Busca incremental: só as entradas cujo nome começa com o texto digitado
+    query = st.text_input("🔎 Buscar pelo nome", key="edit_search")
+    passwords = mongo_manager.search_passwords(st.session_state.username, query, SEARCH_LIMIT)
     
     if passwords:
         # Criar dicionário para seleção
@@ -183,37 +427,66 @@ def edit_password():
         if selected:
             pwd = pwd_dict[selected]
             
+            # A alteração roda no callback, antes da próxima execução: a busca em
+            # cache já foi corrigida com o documento gravado (ou descartada, se o nome mudou)
             with st.form("edit_form"):
-                novo_nome = st.text_input("Novo Nome/Serviço", value=pwd['nome'])
-                nova_senha = st.text_input("Nova Senha", type="password")
-                submit = st.form_submit_button("💾 Atualizar")
-                
-                if submit:
-                    if novo_nome and nova_senha:
-                        # Criptografar nova senha
-                        encrypted = encrypt_password(nova_senha, st.session_state.encryption_key)
-                        
-                        result = mongo_manager.update_password(
-                            pwd['_id'],
-                            novo_nome,
-                            encrypted
-                        )
-                        
-                        if result:
-                            st.success(f"✅ Senha atualizada com sucesso!")
-                            st.rerun()
-                        else:
-                            st.error("Erro ao atualizar senha.")
-                    else:
-                        st.warning("⚠️ Preencha todos os campos!")
+                st.text_input("Novo Nome/Serviço", value=pwd['nome'], key="edit_nome")
+                st.text_input("Nova Senha", type="password", key="edit_senha")
+                if breach_checker:
+                    st.checkbox("Salvar mesmo se a senha constar em vazamentos", key="edit_confirmado")
+                st.form_submit_button("💾 Atualizar", on_click=submit_edit, args=(pwd,))
+    elif query:
+        st.info("Nenhuma senha encontrada com esse nome.")
     else:
         st.info("Nenhuma senha cadastrada para editar.")
 
+def submit_edit(pwd):
+    novo_nome = st.session_state.edit_nome
+    nova_senha = st.session_state.edit_senha
+    
+    if not (novo_nome and nova_senha):
+        st.session_state.edit_feedback = ("warning", "⚠️ Preencha todos os campos!")
+        return
+    if breached_and_not_confirmed(nova_senha, st.session_state.get("edit_confirmado", False)):
+        st.session_state.edit_feedback = ("error", MENSAGEM_VAZADA)
+        return
+    
+    # Criptografar nova senha
+    encrypted = st.session_state.vault_crypto.encrypt(nova_senha)
+    
+    try:
+        # Só altera se a senha ainda estiver na versão exibida ao usuário
+        result = mongo_manager.update_password(
+            st.session_state.username,
+            pwd['_id'],
+            novo_nome,
+            encrypted,
+            st.session_state.vault_crypto.fingerprint(nova_senha),
+            expected_version=pwd.get('versao', 0)
+        )
+    except VersionConflict:
+        st.session_state.edit_feedback = ("warning", MENSAGEM_CONFLITO)
+        return
+    except ServiceUnavailable as e:
+        # Callbacks rodam fora do fluxo da página: o erro vira feedback em vez de st.stop()
+        st.session_state.edit_feedback = ("error", unavailable_message(e))
+        return
+    
+    if result:
+        st.session_state.revealed.pop(pwd['_id'], None)
+        st.session_state.edit_senha = ""
+        st.session_state.edit_feedback = ("success", f"✅ Senha de '{result['nome']}' atualizada com sucesso!")
+    else:
+        st.session_state.edit_feedback = ("error", "Erro ao atualizar senha.")
+
 # Excluir senha
 def delete_password():
     st.header("🗑️ Excluir Senha")
+    show_feedback("delete_feedback")
     
-    passwords = mongo_manager.list_passwords(st.session_state.username)
+    # Busca incremental: só as entradas cujo nome começa com o texto digitado
+    query = st.text_input("🔎 Buscar pelo nome", key="delete_search")
+    passwords = mongo_manager.search_passwords(st.session_state.username, query, SEARCH_LIMIT)
     
     if passwords:
         pwd_dict = {f"{pwd['nome']} (ID: {pwd['_id']})": pwd for pwd in passwords}
@@ -227,21 +500,228 @@ def delete_password():
             
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("✅ Sim, excluir", type="primary"):
-                    result = mongo_manager.delete_password(pwd['_id'])
-                    if result:
-                        st.success("Senha excluída com sucesso!")
-                        st.rerun()
-                    else:
-                        st.error("Erro ao excluir senha.")
+                st.button("✅ Sim, excluir", type="primary", on_click=confirm_delete, args=(pwd,))
             with col2:
                 if st.button("❌ Cancelar"):
                     st.info("Operação cancelada.")
+    elif query:
+        st.info("Nenhuma senha encontrada com esse nome.")
     else:
         st.info("Nenhuma senha cadastrada para excluir.")
 
+def confirm_delete(pwd):
+    try:
+        result = mongo_manager.delete_password(
+            st.session_state.username,
+            pwd['_id'],
+            expected_version=pwd.get('versao', 0)
+        )
+    except VersionConflict:
+        st.session_state.delete_feedback = ("warning", MENSAGEM_CONFLITO)
+        return
+    except ServiceUnavailable as e:
+        st.session_state.delete_feedback = ("error", unavailable_message(e))
+        return
+    
+    if result:
+        st.session_state.revealed.pop(pwd['_id'], None)
+        st.session_state.delete_feedback = ("success", f"Senha de '{pwd['nome']}' excluída com sucesso!")
+    else:
+        st.session_state.delete_feedback = ("error", "Erro ao excluir senha.")
+
+# Importar/Exportar senhas em lote
+def import_export():
+    st.header("📦 Importar / Exportar")
+    
+    st.subheader("📥 Importar")
+    arquivo = st.file_uploader(
+        "Arquivo CSV ou JSON exportado de outro gerenciador",
+        type=["csv", "json", "jsonl"]
+    )
+    ordered = st.checkbox("Parar no primeiro erro de gravação", value=False)
+    
+    if arquivo and st.button("📥 Importar"):
+        texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+        if arquivo.name.lower().endswith(".csv"):
+            entradas = read_csv_entries(texto)
+        else:
+            entradas = read_json_entries(texto)
+        
+        with st.spinner("Importando..."):
+            try:
+                relatorio = import_entries(
+                    mongo_manager,
+                    st.session_state.username,
+                    entradas,
+                    st.session_state.vault_crypto.encrypt_many,
+                    ordered=ordered,
+                    fingerprint_many=st.session_state.vault_crypto.fingerprint_many
+                )
+            except ValueError as e:
+                st.error(f"Arquivo inválido: {e}")
+                return
+        
+        st.success(f"✅ {relatorio['inseridas']} senha(s) importada(s)!")
+        if relatorio['erros']:
+            st.warning(f"⚠️ {len(relatorio['erros'])} entrada(s) não importada(s):")
+            st.dataframe(
+                [{"Linha": linha, "Erro": erro} for linha, erro in relatorio['erros'][:1000]],
+                use_container_width=True
+            )
+    
+    st.subheader("📤 Exportar")
+    formato = st.selectbox("Formato", ["csv", "jsonl"])
+    
+    if st.button("📤 Gerar exportação"):
+        vault_crypto = st.session_state.vault_crypto
+        
+        # O download_button precisa do conteúdo inteiro; os pedaços (um por
+        # lote do cursor) já são codificados ao sair do gerador, então o cofre
+        # fica em memória uma vez, como bytes, em vez de texto + cópias
+        total = 0
+        pedacos = []
+        for quantidade, texto in iter_export(
+            mongo_manager,
+            st.session_state.username,
+            lambda senhas: vault_crypto.decrypt_many(senhas, default=""),
+            formato
+        ):
+            pedacos.append(texto.encode())
+            total += quantidade
+        st.download_button(
+            f"💾 Baixar {total} senha(s)",
+            b"".join(pedacos),
+            file_name=f"senhas.{formato}",
+            mime="text/csv" if formato == "csv" else "application/jsonl"
+        )
+
+# Calcula as impressões digitais que faltam (senhas gravadas antes delas existirem)
+def backfill_fingerprints(username, vault_crypto, batch_size=500):
+    while True:
+        lote = mongo_manager.fingerprint_backlog(username, batch_size)
+        if not lote:
+            return
+        
+        senhas = vault_crypto.decrypt_many([token for _, token in lote])
+        impressoes = [
+            (password_id, token, vault_crypto.fingerprint(senha))
+            for (password_id, token), senha in zip(lote, senhas) if senha is not None
+        ]
+        # Entradas que a chave não abre continuam sem impressão; para quando não há progresso
+        if not mongo_manager.set_fingerprints(username, impressoes) or len(lote) < batch_size:
+            return
+
+# Auditoria do cofre (senhas vazadas e repetidas)
+def audit_passwords():
+    st.header("🛡️ Auditoria de Senhas")
+    
+    st.subheader("🚨 Senhas vazadas")
+    if not breach_checker:
+        st.info("Verificação de vazamentos não configurada (BREACH_FILTER_PATH).")
+    elif st.button("🔍 Verificar cofre"):
+        with st.spinner("Verificando..."):
+            vazadas = breach_checker.audit_vault(
+                mongo_manager,
+                st.session_state.username,
+                st.session_state.vault_crypto.decrypt_many
+            )
+        if vazadas:
+            st.warning(f"⚠️ {len(vazadas)} senha(s) aparecem em vazamentos conhecidos:")
+            st.dataframe(
+                [{"Nome": pwd['nome'], "ID": pwd['_id']} for pwd in vazadas],
+                use_container_width=True
+            )
+        else:
+            st.success("✅ Nenhuma senha do cofre aparece em vazamentos conhecidos.")
+    
+    st.subheader("🔁 Senhas repetidas")
+    if st.button("🔍 Procurar senhas repetidas"):
+        with st.spinner("Procurando..."):
+            backfill_fingerprints(st.session_state.username, st.session_state.vault_crypto)
+            grupos = mongo_manager.find_reused_passwords(st.session_state.username)
+        if grupos:
+            st.warning(f"⚠️ {len(grupos)} senha(s) usadas em mais de uma entrada:")
+            for grupo in grupos:
+                st.write(f"**{grupo['count']} entradas:** " + ", ".join(pwd['nome'] for pwd in grupo['entries']))
+        else:
+            st.success("✅ Nenhuma senha se repete no cofre.")
+
+# Trocar a senha mestra (re-cifra o cofre com a nova chave)
+def change_master_password():
+    st.header("🔑 Trocar Senha Mestra")
+    st.caption(
+        "Todas as senhas do cofre são re-cifradas com a chave derivada da nova senha. "
+        "Se a troca for interrompida, repita-a com as mesmas senhas para continuar de onde parou."
+    )
+    
+    with st.form("change_password_form"):
+        current_password = st.text_input("Senha atual", type="password")
+        new_password = st.text_input("Nova senha", type="password")
+        confirm_password = st.text_input("Confirmar nova senha", type="password")
+        submit = st.form_submit_button("🔑 Trocar senha")
+    
+    if not submit:
+        return
+    if not (current_password and new_password and confirm_password):
+        st.warning("Preencha todos os campos!")
+        return
+    if new_password != confirm_password:
+        st.error("As senhas não conferem!")
+        return
+    
+    username = st.session_state.username
+    try:
+        user = redis_auth.login(username, current_password, get_client_id())
+    except LoginThrottled as e:
+        st.error(f"🚫 {e}")
+        return
+    if not user:
+        st.error("Senha atual incorreta!")
+        return
+    
+    vault_salt = redis_auth.begin_key_rotation(username)
+    if not vault_salt:
+        st.error("Erro ao iniciar a troca de senha. Tente novamente.")
+        return
+    
+    old_crypto = VaultCrypto.from_password(current_password, user['vault_salt'])
+    new_crypto = VaultCrypto.from_password(new_password, vault_salt)
+    
+    barra = st.progress(0.0, text="Re-cifrando senhas...")
+    job = KeyRotationJob(mongo_manager, username, old_crypto.key, new_crypto.key)
+    # A senha só é trocada quando nenhuma entrada ficou na chave antiga
+    relatorio = job.commit(
+        switch=lambda: redis_auth.change_password(username, new_password, vault_salt),
+        progress=lambda feitas, total: barra.progress(
+            min(1.0, feitas / total) if total else 1.0,
+            text=f"{feitas} de {total} senha(s) re-cifrada(s)..."
+        )
+    )
+    barra.progress(1.0, text=f"{relatorio['regravadas']} senha(s) re-cifrada(s)")
+    
+    if relatorio['erros']:
+        st.warning(f"⚠️ {len(relatorio['erros'])} senha(s) não puderam ser abertas e mantêm a cifra anterior.")
+    
+    if not relatorio['trocada']:
+        st.error("A senha mestra não foi trocada: o cofre está sendo alterado em outra sessão "
+                 "ou a nova senha não pôde ser gravada. Repita a troca para concluir.")
+        return
+    
+    # Todas as sessões foram revogadas; esta continua com uma nova, já na nova chave
+    token = redis_auth.create_session(username, seal=lambda t: seal_key(new_crypto.key, t))
+    if token:
+        st.session_state.vault_crypto = new_crypto
+        set_session_token(token)
+    st.success("✅ Senha mestra alterada com sucesso!")
+
 # Controle de fluxo da aplicação
-if st.session_state.logged_in:
-    main_page()
-else:
-    login_page()
\ No newline at end of file
+try:
+    if st.session_state.logged_in:
+        main_page()
+    else:
+        login_page()
+except ServiceUnavailable as e:
+    service_unavailable(e)
+
+# Grava/apaga o cookie depois da página, sem deslocar os elementos acima
+sync_session_cookie()
\ No newline at end of file
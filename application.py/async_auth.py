@@ -0,0 +1,367 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import redis.asyncio as aioredis
+import hashlib
+import os
+import secrets
+from datetime import datetime
+
+from crypto import new_salt
+from hashing import PasswordHasher, HashingQueueFull, split_hash
+from ratelimit import LoginRateLimiter, LoginThrottled
+from auth import (
+    USER_INDEX_KEY, REGISTER_SCRIPT, FETCH_USER_SCRIPT, LOGIN_FETCH_SCRIPT, TOUCH_LOGIN_SCRIPT,
+    CREATE_SESSION_SCRIPT, BEGIN_ROTATION_SCRIPT, CHANGE_PASSWORD_SCRIPT, RESOLVE_SESSION_SCRIPT, redis_settings,
+    _pairs, _flatten, _stored_hash, _login_update, _verified_hash, _login_fetch_call, _login_fetched,
+    _login_result, _lex_range
+)
+from audit import AUDIT
+from observability import get_logger, instrumented
+
+logger = get_logger(__name__)
+
+@instrumented('redis')
+class AsyncRedisAuth:
+    def __init__(self, max_connections=None):
+        """
+        Versão assíncrona (asyncio) do RedisAuth, com a mesma interface
+
+        O construtor não faz I/O: chame `await connect()` (ou use
+        `await AsyncRedisAuth.create()`) antes de usar.
+
+        Args:
+            max_connections (int): Tamanho máximo do pool de conexões
+                (padrão: REDIS_MAX_CONNECTIONS ou 50)
+        """
+        self.max_connections = max_connections or int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+
+        self.pool = aioredis.ConnectionPool(**redis_settings(self.max_connections))
+        self.redis_client = aioredis.Redis(connection_pool=self.pool)
+
+        self.hasher = PasswordHasher.from_env()
+        self.rate_limiter = LoginRateLimiter.from_env(self.redis_client)
+        self.session_ttl = int(os.getenv('SESSION_TTL', 1800))
+
+        self._register_script = self.redis_client.register_script(REGISTER_SCRIPT)
+        self._fetch_user_script = self.redis_client.register_script(FETCH_USER_SCRIPT)
+        self._login_fetch_script = self.redis_client.register_script(LOGIN_FETCH_SCRIPT)
+        self._touch_login_script = self.redis_client.register_script(TOUCH_LOGIN_SCRIPT)
+        self._create_session_script = self.redis_client.register_script(CREATE_SESSION_SCRIPT)
+        self._begin_rotation_script = self.redis_client.register_script(BEGIN_ROTATION_SCRIPT)
+        self._change_password_script = self.redis_client.register_script(CHANGE_PASSWORD_SCRIPT)
+        self._resolve_session_script = self.redis_client.register_script(RESOLVE_SESSION_SCRIPT)
+
+    @classmethod
+    async def create(cls, max_connections=None):
+        """Cria e conecta uma instância"""
+        auth = cls(max_connections)
+        await auth.connect()
+        return auth
+
+    async def connect(self):
+        """Testa a conexão com o Redis"""
+        try:
+            await self.redis_client.ping()
+            logger.info("✅ Conectado ao Redis (async) com sucesso!")
+        except Exception as e:
+            logger.error("❌ Erro ao conectar ao Redis: %s", e)
+            raise
+
+    async def register(self, username, password):
+        """Registra um novo usuário (ver RedisAuth.register)"""
+        try:
+            registro = split_hash(await self.hasher.hash_async(password))
+            registro['vault_salt'] = new_salt()
+            registro['created_at'] = datetime.now().isoformat()
+
+            if not await self._register_script(
+                keys=[f"user:{username}", USER_INDEX_KEY],
+                args=[username] + _flatten(registro)
+            ):
+                logger.warning("⚠️ Usuário '%s' já existe", username)
+                return False
+
+            logger.debug("✅ Usuário '%s' registrado com sucesso!", username)
+            return True
+
+        except Exception as e:
+            logger.error("❌ Erro ao registrar usuário: %s", e)
+            return False
+
+    async def login(self, username, password, client_id=None):
+        """
+        Autentica um usuário e devolve os dados da sessão (ver RedisAuth.login)
+
+        Raises:
+            LoginThrottled: Se a tentativa foi recusada pelo limitador
+        """
+        try:
+            registro, falhas_pendentes = _login_fetched(
+                await self._login_fetch_script(**_login_fetch_call(self.rate_limiter, username, client_id))
+            )
+
+            if not registro:
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                await self.rate_limiter.record_failure_async(username, client_id)
+                return None
+
+            legado, stored_hash = _stored_hash(registro)
+
+            if not await self.hasher.verify_async(password, stored_hash):
+                logger.warning("❌ Senha incorreta para usuário '%s'", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                await self.rate_limiter.record_failure_async(username, client_id)
+                return None
+
+            novo_hash = None
+            if self.hasher.needs_rehash(stored_hash):
+                novo_hash = await self.hasher.hash_async(password)
+            atualizacao = _login_update(registro, legado, stored_hash, novo_hash)
+
+            if atualizacao or falhas_pendentes:
+                await self._touch_login_script(
+                    keys=[f"user:{username}", f"vault_salt:{username}", USER_INDEX_KEY]
+                         + self.rate_limiter.reset_keys(username),
+                    args=[username, _verified_hash(registro)] + _flatten(atualizacao)
+                )
+
+            logger.debug("✅ Usuário '%s' autenticado com sucesso!", username)
+            AUDIT.record('login', username, cliente=client_id)
+            return _login_result(username, registro, atualizacao)
+
+        except LoginThrottled as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            AUDIT.record('login_throttled', username, cliente=client_id)
+            raise
+
+        except HashingQueueFull as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            return None
+
+        except Exception as e:
+            logger.error("❌ Erro ao autenticar usuário: %s", e)
+            return None
+
+    async def authenticate(self, username, password, client_id=None):
+        """Autentica um usuário (ver RedisAuth.authenticate)"""
+        try:
+            return await self.login(username, password, client_id) is not None
+        except LoginThrottled:
+            return False
+
+    async def get_vault_salt(self, username):
+        """Retorna (criando se preciso) o salt do cofre do usuário"""
+        try:
+            bruto = await self._fetch_user_script(
+                keys=[f"user:{username}", f"vault_salt:{username}"],
+                args=[new_salt()]
+            )
+            return _pairs(bruto).get('vault_salt')
+
+        except Exception as e:
+            logger.error("❌ Erro ao obter salt do cofre: %s", e)
+            return None
+
+    async def begin_key_rotation(self, username):
+        """Reserva o salt da nova chave do cofre (ver RedisAuth.begin_key_rotation)"""
+        try:
+            return await self._begin_rotation_script(keys=[f"user:{username}"], args=[new_salt()])
+
+        except Exception as e:
+            logger.error("❌ Erro ao reservar salt do cofre: %s", e)
+            return None
+
+    async def change_password(self, username, new_password, vault_salt):
+        """Troca a senha mestra e o salt do cofre, revogando as sessões (ver RedisAuth.change_password)"""
+        try:
+            registro = split_hash(await self.hasher.hash_async(new_password))
+            registro['vault_salt'] = vault_salt
+
+            if not await self._change_password_script(keys=[f"user:{username}"], args=_flatten(registro)):
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
+                return False
+            await self.revoke_user_sessions(username)
+
+            logger.info("✅ Senha de '%s' alterada com sucesso!", username)
+            return True
+
+        except Exception as e:
+            logger.error("❌ Erro ao alterar senha: %s", e)
+            return False
+
+    @staticmethod
+    def _session_id(token):
+        """ID da sessão no Redis: hash do token, que nunca é armazenado"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def create_session(self, username, seal=None):
+        """Cria uma sessão e devolve o token (ver RedisAuth.create_session)"""
+        try:
+            token = secrets.token_urlsafe(32)
+            session_id = self._session_id(token)
+
+            dados = {'username': username, 'created_at': datetime.now().isoformat()}
+            if seal:
+                dados['sealed_key'] = seal(token)
+
+            await self._create_session_script(
+                keys=[f"session:{session_id}", f"sessions:{username}", f"user:{username}"],
+                args=[self.session_ttl, session_id, dados['created_at']] + _flatten(dados)
+            )
+
+            return token
+
+        except Exception as e:
+            logger.error("❌ Erro ao criar sessão: %s", e)
+            return None
+
+    async def resolve_session(self, token):
+        """Busca a sessão de um token e renova sua expiração"""
+        try:
+            sessao = _pairs(await self._resolve_session_script(
+                keys=[f"session:{self._session_id(token)}"],
+                args=[self.session_ttl]
+            ))
+            if not sessao:
+                return None
+
+            await self.redis_client.expire(f"sessions:{sessao['username']}", self.session_ttl)
+            return sessao
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar sessão: %s", e)
+            return None
+
+    async def revoke_session(self, token):
+        """Revoga uma sessão (logout)"""
+        try:
+            session_id = self._session_id(token)
+            username = await self.redis_client.hget(f"session:{session_id}", "username")
+
+            pipe = self.redis_client.pipeline()
+            pipe.delete(f"session:{session_id}")
+            if username:
+                pipe.srem(f"sessions:{username}", session_id)
+            return (await pipe.execute())[0] > 0
+
+        except Exception as e:
+            logger.error("❌ Erro ao revogar sessão: %s", e)
+            return False
+
+    async def revoke_user_sessions(self, username):
+        """Revoga todas as sessões de um usuário"""
+        try:
+            chave = f"sessions:{username}"
+            ids = await self.redis_client.smembers(chave)
+            if not ids:
+                return 0
+            pipe = self.redis_client.pipeline(transaction=False)
+            for session_id in ids:
+                pipe.delete(f"session:{session_id}")
+            pipe.srem(chave, *ids)
+            await pipe.execute()
+            return len(ids)
+        except Exception as e:
+            logger.error("❌ Erro ao revogar sessões: %s", e)
+            return 0
+
+    async def delete_user(self, username):
+        """Remove um usuário do Redis"""
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.delete(f"user:{username}", f"vault_salt:{username}")
+            pipe.zrem(USER_INDEX_KEY, username)
+            result = (await pipe.execute())[0]
+            await self.revoke_user_sessions(username)
+
+            if result > 0:
+                logger.debug("✅ Usuário '%s' removido com sucesso!", username)
+                return True
+            else:
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
+                return False
+
+        except Exception as e:
+            logger.error("❌ Erro ao remover usuário: %s", e)
+            return False
+
+    async def user_exists(self, username):
+        """Verifica se um usuário existe"""
+        try:
+            return await self.redis_client.exists(f"user:{username}") > 0
+        except Exception as e:
+            logger.error("❌ Erro ao verificar usuário: %s", e)
+            return False
+
+    async def list_users_page(self, prefix="", cursor=None, page_size=100):
+        """Lista uma página de usuários a partir do índice (ver RedisAuth.list_users_page)"""
+        try:
+            minimo, maximo = _lex_range(prefix, cursor)
+            usernames = await self.redis_client.zrangebylex(
+                USER_INDEX_KEY, minimo, maximo, start=0, num=page_size + 1
+            )
+
+            if len(usernames) > page_size:
+                usernames = usernames[:page_size]
+                return usernames, usernames[-1]
+            return usernames, None
+
+        except Exception as e:
+            logger.error("❌ Erro ao listar usuários: %s", e)
+            return [], None
+
+    async def iter_users(self, prefix="", page_size=1000):
+        """Percorre os usuários cadastrados, página por página (gerador assíncrono)"""
+        cursor = None
+        while True:
+            usernames, cursor = await self.list_users_page(prefix, cursor, page_size)
+            for username in usernames:
+                yield username
+            if not cursor:
+                break
+
+    async def list_users(self, prefix=""):
+        """Lista todos os usuários cadastrados"""
+        usernames = [username async for username in self.iter_users(prefix)]
+        logger.debug("✅ %s usuário(s) encontrado(s)", len(usernames))
+        return usernames
+
+    async def backfill_user_index(self, batch_size=1000):
+        """Popula o índice de usuários a partir das chaves "user:*" (ver RedisAuth.backfill_user_index)"""
+        try:
+            total = 0
+            lote = []
+
+            async for key in self.redis_client.scan_iter(match="user:*", count=batch_size):
+                lote.append(key[len("user:"):])
+                if len(lote) >= batch_size:
+                    await self.redis_client.zadd(USER_INDEX_KEY, dict.fromkeys(lote, 0))
+                    total += len(lote)
+                    lote = []
+
+            if lote:
+                await self.redis_client.zadd(USER_INDEX_KEY, dict.fromkeys(lote, 0))
+                total += len(lote)
+
+            logger.info("✅ %s usuário(s) indexado(s)", total)
+            return total
+
+        except Exception as e:
+            logger.error("❌ Erro ao indexar usuários: %s", e)
+            return 0
+
+    def hash_stats(self):
+        """Estatísticas de latência do hashing de senhas"""
+        return self.hasher.stats()
+
+    async def close_connection(self):
+        """Fecha o pool de conexões com o Redis"""
+        try:
+            await self.redis_client.aclose()
+            await self.pool.disconnect()
+            self.hasher.shutdown()
+            logger.info("✅ Conexão com Redis fechada")
+        except Exception as e:
+            logger.error("❌ Erro ao fechar conexão: %s", e)
@@ -0,0 +1,327 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from bson.objectid import ObjectId
+import os
+
+from database import (
+    MongoDBManager, PROJECAO_METADADOS, INDICES, INDICE_USUARIO_NOME, INDICE_USUARIO_BUSCA,
+    INDICE_USUARIO_ATUALIZACAO, FILTRO_ATIVO, CAMPOS, decode_document, mongo_settings, write_time
+)
+from audit import AUDIT
+from observability import get_logger, instrumented
+from storage import VersionConflict
+
+logger = get_logger(__name__)
+
+@instrumented('mongodb')
+class AsyncMongoDBManager:
+    def __init__(self, max_pool_size=None, min_pool_size=None):
+        """
+        Versão assíncrona (asyncio, via motor) do MongoDBManager
+
+        Os filtros, documentos e cursores são os mesmos do MongoDBManager, então
+        as duas versões podem ser usadas sobre a mesma coleção. O construtor não
+        faz I/O: chame `await connect()` (ou use `await AsyncMongoDBManager.create()`).
+        Pool e timeouts vêm de mongo_settings, os mesmos do cliente síncrono.
+
+        Args:
+            max_pool_size (int): Conexões máximas no pool (padrão: MONGO_MAX_POOL_SIZE ou 100)
+            min_pool_size (int): Conexões mantidas abertas (padrão: MONGO_MIN_POOL_SIZE ou 0)
+        """
+        self.connection_string = os.getenv(
+            'MONGODB_URI',
+            'mongodb+srv://<usuario>:<senha>@cluster.mongodb.net/?retryWrites=true&w=majority'
+        )
+
+        self.client = AsyncIOMotorClient(self.connection_string, **mongo_settings(max_pool_size, min_pool_size))
+        self.db = self.client['gerenciador_senhas']
+        self.collection = self.db['senhas']
+
+        self._migrated = False
+        self._migrated_users = set()
+
+    @classmethod
+    async def create(cls, max_pool_size=None, min_pool_size=None):
+        """Cria e conecta uma instância"""
+        manager = cls(max_pool_size, min_pool_size)
+        await manager.connect()
+        return manager
+
+    async def connect(self):
+        """Testa a conexão e garante os índices usados pelas consultas"""
+        try:
+            await self.client.server_info()
+            logger.info("✅ Conectado ao MongoDB (async) com sucesso!")
+
+            for chaves, opcoes in INDICES:
+                await self.collection.create_index(chaves, **opcoes)
+
+            # A migração completa é feita pelo MongoDBManager; até ela terminar,
+            # os documentos antigos são convertidos no primeiro acesso
+            self._migrated = await self.db['migracoes'].find_one({'_id': 'documentos_compactos'}) is not None
+
+        except Exception as e:
+            logger.error("❌ Erro ao conectar ao MongoDB: %s", e)
+            raise
+
+    async def _migrate(self, filtro, batch_size=500):
+        """Converte documentos antigos para o formato compacto (ver MongoDBManager._migrate)"""
+        total = 0
+        ultimo_id = None
+
+        while True:
+            lote = await (
+                self.collection.find(MongoDBManager._migration_filter(filtro, ultimo_id))
+                .sort('_id', ASCENDING)
+                .to_list(batch_size)
+            )
+            if not lote:
+                break
+
+            resultado = await self.collection.bulk_write(MongoDBManager._migration_operations(lote), ordered=False)
+            total += resultado.modified_count
+            ultimo_id = lote[-1]['_id']
+
+            if len(lote) < batch_size:
+                break
+
+        return total
+
+    async def _ensure_migrated(self, usuario):
+        """Converte os documentos antigos do usuário antes da primeira consulta"""
+        if self._migrated or usuario in self._migrated_users:
+            return
+        await self._migrate({'usuario': usuario})
+        self._migrated_users.add(usuario)
+
+    async def _ensure_document_migrated(self, password_id):
+        """Converte um documento antigo antes de alterá-lo pelo ID"""
+        if not self._migrated:
+            await self._migrate({'_id': password_id})
+
+    async def create_password(self, usuario, nome, senha, impressao=None):
+        """CREATE - Insere uma nova senha (ver MongoDBManager.create_password)"""
+        try:
+            documento = MongoDBManager._new_document(usuario, nome, senha, write_time(), impressao)
+
+            resultado = await self.collection.insert_one(documento)
+            logger.debug("✅ Senha cadastrada com ID: %s", resultado.inserted_id)
+            AUDIT.record('create_password', usuario, password_id=str(resultado.inserted_id))
+            return str(resultado.inserted_id)
+
+        except Exception as e:
+            logger.error("❌ Erro ao cadastrar senha: %s", e)
+            return None
+
+    async def bulk_create_passwords(self, usuario, entradas, ordered=False):
+        """CREATE (em lote) - Insere várias senhas (ver MongoDBManager.bulk_create_passwords)"""
+        if not entradas:
+            return 0, []
+
+        agora = write_time()
+        operacoes = [
+            InsertOne(MongoDBManager._new_document(usuario, *entrada[:2], agora, *entrada[2:]))
+            for entrada in entradas
+        ]
+
+        try:
+            resultado = await self.collection.bulk_write(operacoes, ordered=ordered)
+            AUDIT.record('bulk_create_passwords', usuario, quantidade=resultado.inserted_count)
+            return resultado.inserted_count, []
+
+        except BulkWriteError as e:
+            inseridas, erros = MongoDBManager._bulk_write_errors(e.details, ordered, len(operacoes))
+            if inseridas:
+                AUDIT.record('bulk_create_passwords', usuario, quantidade=inseridas)
+            return inseridas, erros
+
+        except Exception as e:
+            logger.error("❌ Erro ao cadastrar senhas em lote: %s", e)
+            return 0, [(i, str(e)) for i in range(len(operacoes))]
+
+    async def iter_passwords(self, usuario, batch_size=1000):
+        """
+        READ - Percorre todas as senhas de um usuário (gerador assíncrono)
+
+        Yields:
+            dict: Documento da senha (com '_id' como string)
+        """
+        await self._ensure_migrated(usuario)
+        cursor = (
+            self.collection.find(MongoDBManager._user_filter(usuario))
+            .sort(INDICE_USUARIO_NOME[1:])
+            .batch_size(batch_size)
+        )
+
+        try:
+            async for documento in cursor:
+                yield decode_document(documento)
+        finally:
+            await cursor.close()
+
+    async def list_passwords(self, usuario):
+        """READ - Lista todas as senhas de um usuário"""
+        try:
+            senhas = [senha async for senha in self.iter_passwords(usuario)]
+            logger.debug("✅ %s senha(s) encontrada(s) para o usuário %s", len(senhas), usuario)
+            return senhas
+
+        except Exception as e:
+            logger.error("❌ Erro ao listar senhas: %s", e)
+            return []
+
+    async def list_passwords_page(self, usuario, limit=50, cursor=None):
+        """READ - Lista uma página das senhas de um usuário (ver MongoDBManager.list_passwords_page)"""
+        try:
+            await self._ensure_migrated(usuario)
+            documentos = await (
+                self.collection.find(MongoDBManager._page_filter(usuario, cursor), PROJECAO_METADADOS)
+                .sort(INDICE_USUARIO_NOME[1:])
+                .to_list(limit + 1)
+            )
+
+            return MongoDBManager._page_result(documentos, limit)
+
+        except Exception as e:
+            logger.error("❌ Erro ao listar página de senhas: %s", e)
+            return [], None
+
+    async def search_passwords(self, usuario, query, limit=20):
+        """READ - Busca senhas cujo nome começa com o texto informado"""
+        try:
+            await self._ensure_migrated(usuario)
+            documentos = await (
+                self.collection.find(MongoDBManager._search_filter(usuario, query), PROJECAO_METADADOS)
+                .sort(INDICE_USUARIO_BUSCA[1:])
+                .to_list(limit)
+            )
+
+            return [decode_document(documento) for documento in documentos]
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senhas: %s", e)
+            return []
+
+    async def find_reused_passwords(self, usuario):
+        """READ - Grupos de senhas com a mesma senha (ver MongoDBManager.find_reused_passwords)"""
+        try:
+            await self._ensure_migrated(usuario)
+            cursor = self.collection.aggregate(MongoDBManager._reused_pipeline(usuario))
+            return await cursor.to_list(None)
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senhas repetidas: %s", e)
+            return []
+
+    async def get_password_by_id(self, usuario, password_id):
+        """READ - Busca uma senha específica do usuário por ID"""
+        try:
+            await self._ensure_document_migrated(ObjectId(password_id))
+            documento = await self.collection.find_one(MongoDBManager._owned_filter(usuario, password_id))
+
+            if documento:
+                return decode_document(documento)
+            else:
+                logger.warning("⚠️ Senha com ID %s não encontrada", password_id)
+                return None
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senha: %s", e)
+            return None
+
+    async def _raise_if_conflict(self, usuario, password_id, expected_version):
+        """Distingue senha inexistente de senha em outra versão (ver MongoDBManager._raise_if_conflict)"""
+        if expected_version is None:
+            return
+        atual = await self.collection.find_one(
+            MongoDBManager._owned_filter(usuario, password_id), PROJECAO_METADADOS
+        )
+        if atual:
+            raise VersionConflict(password_id, expected_version, decode_document(atual))
+
+    async def update_password(self, usuario, password_id, novo_nome, nova_senha, impressao=None, expected_version=None):
+        """UPDATE - Atualiza uma senha do usuário e devolve o documento alterado (ver MongoDBManager.update_password)"""
+        try:
+            await self._ensure_document_migrated(ObjectId(password_id))
+            documento = await self.collection.find_one_and_update(
+                MongoDBManager._owned_filter(usuario, password_id, expected_version),
+                MongoDBManager._update_operation(novo_nome, nova_senha, impressao),
+                return_document=ReturnDocument.AFTER
+            )
+
+            if documento:
+                logger.debug("✅ Senha atualizada com sucesso!")
+                AUDIT.record('update_password', usuario, password_id=password_id, versao=documento.get(CAMPOS['versao']))
+                return decode_document(documento)
+
+            await self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi modificada (ID pode não existir)")
+            return None
+
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except Exception as e:
+            logger.error("❌ Erro ao atualizar senha: %s", e)
+            return None
+
+    async def delete_password(self, usuario, password_id, expected_version=None):
+        """DELETE - Transforma a senha do usuário em lápide e a devolve (ver MongoDBManager.delete_password)"""
+        try:
+            await self._ensure_document_migrated(ObjectId(password_id))
+            documento = await self.collection.find_one_and_update(
+                MongoDBManager._owned_filter(usuario, password_id, expected_version),
+                MongoDBManager._tombstone_update(),
+                return_document=ReturnDocument.AFTER
+            )
+
+            if documento:
+                logger.debug("✅ Senha excluída com sucesso!")
+                AUDIT.record('delete_password', usuario, password_id=password_id, versao=documento.get(CAMPOS['versao']))
+                return decode_document(documento)
+
+            await self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi excluída (ID pode não existir)")
+            return None
+
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except Exception as e:
+            logger.error("❌ Erro ao excluir senha: %s", e)
+            return None
+
+    async def changes_since(self, usuario, checkpoint=None, limit=500, settle_seconds=2):
+        """SYNC - Alterações após um checkpoint (ver MongoDBManager.changes_since)"""
+        try:
+            await self._ensure_migrated(usuario)
+            filtro, ultima_data = MongoDBManager._changes_filter(usuario, checkpoint, settle_seconds)
+
+            if ultima_data:
+                horizonte = await self.db['sincronizacao'].find_one({'_id': 'lapides'})
+                if horizonte and ultima_data < horizonte['horizonte']:
+                    return {'changes': [], 'checkpoint': None, 'has_more': False, 'reset': True}
+
+            documentos = await (
+                self.collection.find(filtro, {CAMPOS['nome_busca']: 0})
+                .sort(INDICE_USUARIO_ATUALIZACAO[1:])
+                .to_list(limit + 1)
+            )
+
+            return MongoDBManager._changes_result(documentos, checkpoint, limit)
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar alterações: %s", e)
+            return {'changes': [], 'checkpoint': checkpoint, 'has_more': False, 'reset': False}
+
+    def close_connection(self):
+        """Fecha o pool de conexões com o MongoDB"""
+        try:
+            self.client.close()
+            logger.info("✅ Conexão com MongoDB fechada")
+        except Exception as e:
+            logger.error("❌ Erro ao fechar conexão: %s", e)
@@ -0,0 +1,403 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import redis
+from pymongo.errors import BulkWriteError
+
+from observability import REGISTRY, configure_logging, get_logger, start_metrics_server
+from resilience import backoff_delays
+
+logger = get_logger(__name__)
+
+# Stream do Redis que recebe os eventos e grupo de consumidores que os persiste
+STREAM_AUDITORIA = os.getenv('AUDIT_STREAM', 'audit:events')
+GRUPO_AUDITORIA = os.getenv('AUDIT_GROUP', 'audit-writers')
+
+
+class AuditTrail:
+    def __init__(self, max_queue=None, batch_size=None, flush_interval=None, attempts=3, registry=REGISTRY):
+        """
+        Trilha de auditoria que não bloqueia as operações
+
+        record() só coloca o evento em uma fila em memória; uma thread em
+        segundo plano grava os eventos em lotes no destino (sink). Com a fila
+        cheia o evento é descartado e contado, sem esperar: a profundidade da
+        fila e os descartes ficam nas métricas (vault_audit_*).
+
+        Args:
+            max_queue (int): Eventos na fila (padrão: AUDIT_QUEUE_SIZE ou 10000)
+            batch_size (int): Eventos por gravação (padrão: AUDIT_BATCH_SIZE ou 500)
+            flush_interval (float): Espera máxima por novos eventos, em segundos (padrão: AUDIT_FLUSH_INTERVAL ou 0.5)
+            attempts (int): Tentativas de gravar um lote antes de descartá-lo
+            registry (MetricsRegistry): Registro das métricas
+        """
+        self.max_queue = max_queue or int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+        self.batch_size = batch_size or int(os.getenv('AUDIT_BATCH_SIZE', 500))
+        self.flush_interval = flush_interval or float(os.getenv('AUDIT_FLUSH_INTERVAL', 0.5))
+        self.attempts = attempts
+        self.registry = registry
+
+        self.sink = None
+        self._fila = queue.Queue(self.max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._dropped_logged = 0
+
+        registry.register_reading('vault_audit_queue_depth', "Eventos de auditoria aguardando gravação", self._fila.qsize)
+        registry.register_reading('vault_audit_queue_capacity', "Capacidade da fila de auditoria", lambda: self.max_queue)
+        registry.register_reading(
+            'vault_audit_events_dropped_total', "Eventos descartados com a fila cheia", lambda: self.dropped, 'counter'
+        )
+        registry.register_reading(
+            'vault_audit_events_written_total', "Eventos gravados no destino", lambda: self.written, 'counter'
+        )
+        registry.register_reading(
+            'vault_audit_events_failed_total', "Eventos descartados após falhas de gravação", lambda: self.failed, 'counter'
+        )
+
+    @property
+    def enabled(self):
+        return self.sink is not None
+
+    def record(self, acao, usuario, **detalhes):
+        """
+        Enfileira um evento (sem E/S; sem destino configurado, não faz nada)
+
+        Args:
+            acao (str): Operação auditada (ex.: 'login', 'update_password')
+            usuario (str): Usuário da operação
+            **detalhes: Campos extras (ex.: password_id, cliente); None é omitido
+
+        Returns:
+            bool: True se o evento foi enfileirado
+        """
+        if self.sink is None:
+            return False
+
+        evento = {'ts': datetime.now(timezone.utc).isoformat(), 'acao': acao, 'usuario': usuario}
+        evento.update((campo, valor) for campo, valor in detalhes.items() if valor is not None)
+        try:
+            self._fila.put_nowait(evento)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def start(self, sink):
+        """
+        Começa a gravar os eventos no destino em segundo plano
+
+        Args:
+            sink: Objeto com write(eventos) que grava uma lista de eventos (ex.: RedisStreamSink)
+
+        Returns:
+            AuditTrail: A própria trilha
+        """
+        with self._lock:
+            if self._thread is None:
+                self.sink = sink
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                lote = [self._fila.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stop.is_set():
+                    break
+                continue
+
+            while len(lote) < self.batch_size:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            self.write_batch(lote)
+            for _ in lote:
+                self._fila.task_done()
+
+            if self.dropped != self._dropped_logged:
+                logger.warning("⚠️ Fila de auditoria cheia: %s evento(s) descartado(s) até agora", self.dropped)
+                self._dropped_logged = self.dropped
+
+    def write_batch(self, lote):
+        """
+        Grava um lote no destino, com novas tentativas e backoff
+
+        Args:
+            lote (list): Eventos a gravar
+
+        Returns:
+            bool: True se o lote foi gravado
+        """
+        esperas = backoff_delays(self.attempts) + [None]
+        for espera in esperas:
+            inicio = time.perf_counter()
+            try:
+                self.sink.write(lote)
+                self.registry.observe('audit', 'write_batch', time.perf_counter() - inicio)
+                self.written += len(lote)
+                return True
+            except Exception as e:
+                if espera is None:
+                    logger.error("❌ Erro ao gravar auditoria, %s evento(s) descartado(s): %s", len(lote), e)
+                    self.failed += len(lote)
+                    return False
+                logger.warning("⚠️ Falha ao gravar auditoria (%s); nova tentativa em %.1fs", e, espera)
+                time.sleep(espera)
+
+    def flush(self, timeout=5):
+        """
+        Espera a fila esvaziar
+
+        Args:
+            timeout (float): Espera máxima, em segundos
+
+        Returns:
+            bool: True se todos os eventos enfileirados foram processados
+        """
+        limite = time.monotonic() + timeout
+        while self._fila.unfinished_tasks:
+            if self._thread is None or time.monotonic() > limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5):
+        """Grava os eventos pendentes e encerra a thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self.sink = None
+
+
+# Trilha padrão do processo (inativa até start_audit)
+AUDIT = AuditTrail()
+
+
+class RedisStreamSink:
+    def __init__(self, redis_client, stream=STREAM_AUDITORIA, maxlen=None):
+        """
+        Destino dos eventos: um Redis Stream de tamanho limitado
+
+        Cada lote é enviado em um único pipeline (uma ida ao Redis). O stream
+        é aparado (MAXLEN aproximado) para não crescer sem limite se o
+        AuditWorker parar; o atraso do grupo aparece nas métricas do worker.
+
+        Args:
+            redis_client (redis.Redis): Cliente Redis
+            stream (str): Chave do stream
+            maxlen (int): Tamanho máximo aproximado (padrão: AUDIT_STREAM_MAXLEN ou 1000000)
+        """
+        self.redis_client = redis_client
+        self.stream = stream
+        self.maxlen = maxlen or int(os.getenv('AUDIT_STREAM_MAXLEN', 1000000))
+
+    def write(self, eventos):
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for evento in eventos:
+            pipeline.xadd(
+                self.stream, {'evento': json.dumps(evento, ensure_ascii=False)},
+                maxlen=self.maxlen, approximate=True
+            )
+        pipeline.execute()
+
+
+def start_audit(backend=None, trail=AUDIT):
+    """
+    Liga a trilha de auditoria, se configurada (AUDIT_ENABLED)
+
+    No backend 'mongo' os eventos vão para o Redis Stream e o AuditWorker
+    os persiste no MongoDB; no 'sqlite', direto para a tabela auditoria.
+
+    Args:
+        backend (str): Nome do backend (padrão: STORAGE_BACKEND ou 'mongo')
+        trail (AuditTrail): Trilha a ligar
+
+    Returns:
+        AuditTrail: Trilha ligada ou None se a auditoria está desativada
+    """
+    if os.getenv('AUDIT_ENABLED', '').lower() not in ('1', 'true', 'yes', 'sim'):
+        return None
+
+    from storage import backend_name
+    if backend_name(backend) == 'sqlite':
+        from sqlite_store import SQLiteAuditSink
+        sink = SQLiteAuditSink()
+    else:
+        from auth import redis_from_env
+        sink = RedisStreamSink(redis_from_env())
+
+    logger.info("✅ Auditoria ativa (%s)", type(sink).__name__)
+    return trail.start(sink)
+
+
+class AuditWorker:
+    def __init__(self, redis_client, collection, stream=STREAM_AUDITORIA, group=GRUPO_AUDITORIA,
+                 consumer=None, batch_size=None, block_ms=5000, claim_idle_ms=60000, registry=REGISTRY):
+        """
+        Consumidor do stream de auditoria: persiste os eventos no MongoDB
+
+        Lê lotes pelo grupo de consumidores, grava com insert_many e só então
+        confirma (XACK). O _id de cada documento é o ID da entrada no stream,
+        então reentregas (após uma falha antes do XACK) não duplicam eventos.
+        Entradas pendentes de consumidores que pararam são assumidas após
+        claim_idle_ms (XAUTOCLAIM). Vários workers podem rodar em paralelo.
+
+        Args:
+            redis_client (redis.Redis): Cliente Redis
+            collection: Coleção do MongoDB que recebe os eventos
+            stream (str): Chave do stream
+            group (str): Grupo de consumidores
+            consumer (str): Nome deste consumidor (padrão: host-pid)
+            batch_size (int): Eventos por lote (padrão: AUDIT_BATCH_SIZE ou 500)
+            block_ms (int): Espera por novos eventos a cada leitura, em ms
+            claim_idle_ms (int): Tempo sem confirmação após o qual uma entrada é assumida
+            registry (MetricsRegistry): Registro das métricas
+        """
+        self.redis_client = redis_client
+        self.collection = collection
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or int(os.getenv('AUDIT_BATCH_SIZE', 500))
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.registry = registry
+
+        self.persisted = 0
+        self.stream_length = 0
+        self.pending = 0
+
+        registry.register_reading('vault_audit_stream_length', "Entradas no stream de auditoria", lambda: self.stream_length)
+        registry.register_reading(
+            'vault_audit_stream_pending', "Entradas entregues ao grupo e ainda não confirmadas", lambda: self.pending
+        )
+        registry.register_reading(
+            'vault_audit_events_persisted_total', "Eventos persistidos no MongoDB", lambda: self.persisted, 'counter'
+        )
+
+    def ensure_group(self):
+        """Cria o grupo de consumidores (e o stream), se ainda não existirem"""
+        try:
+            self.redis_client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self.collection.create_index([('usuario', 1), ('ts', -1)], name='usuario_ts')
+
+    def _next_entries(self):
+        """Entradas abandonadas por outros consumidores ou, sem elas, novas entradas"""
+        resposta = self.redis_client.xautoclaim(
+            self.stream, self.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id='0-0', count=self.batch_size
+        )
+        entradas = resposta[1]
+        if entradas:
+            return entradas
+
+        resposta = self.redis_client.xreadgroup(
+            self.group, self.consumer, {self.stream: '>'}, count=self.batch_size, block=self.block_ms
+        )
+        return resposta[0][1] if resposta else []
+
+    @staticmethod
+    def _document(entrada_id, campos):
+        """Documento do MongoDB de uma entrada do stream"""
+        documento = json.loads(campos['evento'])
+        documento['_id'] = entrada_id
+        documento['ts'] = datetime.fromisoformat(documento['ts'])
+        return documento
+
+    def persist_batch(self):
+        """
+        Lê, persiste e confirma um lote de eventos
+
+        Returns:
+            int: Eventos persistidos
+        """
+        entradas = self._next_entries()
+        if entradas:
+            # Entradas aparadas do stream antes da leitura vêm sem campos (Redis 6.2)
+            documentos = [self._document(entrada_id, campos) for entrada_id, campos in entradas if campos]
+            if documentos:
+                inicio = time.perf_counter()
+                try:
+                    self.collection.insert_many(documentos, ordered=False)
+                except BulkWriteError as e:
+                    # Eventos já gravados (reentrega) não são erro
+                    if any(erro['code'] != 11000 for erro in e.details['writeErrors']):
+                        raise
+                self.registry.observe('audit', 'persist_batch', time.perf_counter() - inicio)
+            self.redis_client.xack(self.stream, self.group, *[entrada_id for entrada_id, _ in entradas])
+            self.persisted += len(documentos)
+
+        self.stream_length = self.redis_client.xlen(self.stream)
+        self.pending = self.redis_client.xpending(self.stream, self.group)['pending']
+        return len(entradas)
+
+    def run(self, stop=None):
+        """
+        Processa o stream até `stop` ser sinalizado (ou para sempre)
+
+        Args:
+            stop (threading.Event): Evento de parada
+        """
+        self.ensure_group()
+        logger.info("✅ Worker de auditoria '%s' consumindo %s", self.consumer, self.stream)
+        falhas = 0
+        while not (stop and stop.is_set()):
+            try:
+                self.persist_batch()
+                falhas = 0
+            except Exception as e:
+                falhas += 1
+                espera = backoff_delays(min(falhas, 6) + 1)[-1]
+                logger.error("❌ Erro ao persistir auditoria: %s (nova tentativa em %.1fs)", e, espera)
+                time.sleep(espera)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker que persiste no MongoDB os eventos do stream de auditoria")
+    parser.add_argument('--consumer', default=None, help="Nome do consumidor (padrão: host-pid)")
+    parser.add_argument('--batch-size', type=int, default=None, help="Eventos por lote")
+    args = parser.parse_args()
+
+    configure_logging()
+    start_metrics_server()
+
+    from auth import redis_from_env
+    from database import MongoDBManager
+
+    mongo = MongoDBManager()
+    worker = AuditWorker(redis_from_env(), mongo.db['auditoria'], consumer=args.consumer, batch_size=args.batch_size)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mongo.close_connection()
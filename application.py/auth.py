@@ -4,39 +4,322 @@ load_dotenv()
 import redis
 import hashlib
 import os
+import secrets
+from datetime import datetime
 
-class RedisAuth:
+from crypto import new_salt
+from hashing import PasswordHasher, HashingQueueFull, split_hash, join_hash
+from ratelimit import CHECK_FUNCTION, LoginRateLimiter, LoginThrottled
+
+from audit import AUDIT
+from observability import get_logger, instrumented
+from storage import AuthStore
+
+logger = get_logger(__name__)
+
+# Índice de usuários: sorted set com score 0, ordenado lexicograficamente
+USER_INDEX_KEY = "users:index"
+
+# Cria o registro (hash) do usuário somente se a chave ainda não existir
+# e o inclui no índice de usuários
+REGISTER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('ZADD', KEYS[2], 0, ARGV[1])
+return 1
+"""
+
+# Lê o registro do usuário garantindo que exista um salt do cofre.
+# Registros antigos (string com o hash) são devolvidos como 'legacy_hash'.
+FETCH_USER_FUNCTION = """
+local function ler_usuario()
+    local tipo = redis.call('TYPE', KEYS[1])['ok']
+    if tipo == 'hash' then
+        redis.call('HSETNX', KEYS[1], 'vault_salt', ARGV[1])
+        return redis.call('HGETALL', KEYS[1])
+    elseif tipo == 'string' then
+        redis.call('SET', KEYS[2], ARGV[1], 'NX')
+        return {'legacy_hash', redis.call('GET', KEYS[1]), 'vault_salt', redis.call('GET', KEYS[2])}
+    end
+    return {}
+end
+"""
+
+FETCH_USER_SCRIPT = FETCH_USER_FUNCTION + """
+return ler_usuario()
+"""
+
+# Início do login em uma única ida: consome a tentativa no limitador e, se
+# liberada, lê o registro. Avisa se há falhas anteriores a zerar (KEYS[3] e
+# KEYS[4]), para que o login só volte ao Redis quando houver o que gravar.
+# KEYS: usuário, salt do cofre, falhas e nível do usuário, pares do limitador
+# ARGV: novo salt do cofre, pares do limitador
+# Retorno: {'retry_after_ms', espera} se recusado, senão o registro (como ler_usuario)
+LOGIN_FETCH_SCRIPT = CHECK_FUNCTION + FETCH_USER_FUNCTION + """
+local espera = consumir(5, 2)
+if espera > 0 then
+    return {'retry_after_ms', espera}
+end
+local registro = ler_usuario()
+if #registro > 0 and redis.call('EXISTS', KEYS[3], KEYS[4]) > 0 then
+    table.insert(registro, 'failures_pending')
+    table.insert(registro, 1)
+end
+return registro
+"""
+
+# Conclui o login quando há o que gravar: regrava o registro (novo hash ou
+# conversão do formato string antigo para hash) e apaga as chaves a partir de
+# KEYS[4] (contadores do limitador de tentativas). A regravação é um
+# compare-and-set: só acontece se o hash guardado ainda for o conferido
+# (ARGV[2]), para não desfazer uma troca de senha concorrente. Um registro
+# string antigo cujo hash mudou no meio não é tocado.
+# ARGV: usuário, hash conferido, campos a regravar (pares, opcionais)
+TOUCH_LOGIN_SCRIPT = """
+local tipo = redis.call('TYPE', KEYS[1])['ok']
+if tipo == 'none' then
+    return 0
+end
+if #ARGV > 2 then
+    local atual
+    if tipo == 'string' then
+        atual = redis.call('GET', KEYS[1])
+    else
+        atual = redis.call('HGET', KEYS[1], 'password_hash')
+    end
+    if atual == ARGV[2] then
+        if tipo == 'string' then
+            redis.call('DEL', KEYS[1])
+            redis.call('ZADD', KEYS[3], 0, ARGV[1])
+        end
+        redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+        redis.call('DEL', KEYS[2])
+        tipo = 'hash'
+    end
+end
+if tipo ~= 'hash' then
+    return 0
+end
+for i = 4, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+return 1
+"""
+
+# Cria a sessão, inclui no índice do usuário e registra o login (último
+# acesso e contagem) no registro, se ele estiver no formato hash.
+# KEYS: sessão, índice de sessões do usuário, usuário
+# ARGV: TTL (s), ID da sessão, data do login, campos da sessão (pares)
+CREATE_SESSION_SCRIPT = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+if redis.call('TYPE', KEYS[3])['ok'] == 'hash' then
+    redis.call('HSET', KEYS[3], 'last_login', ARGV[3])
+    redis.call('HINCRBY', KEYS[3], 'login_count', 1)
+end
+return 1
+"""
+
+# Reserva (se ainda não houver) o salt da próxima chave do cofre e o devolve.
+# Só registros no formato hash: o formato antigo é convertido no login.
+# ARGV: salt candidato
+BEGIN_ROTATION_SCRIPT = """
+if redis.call('TYPE', KEYS[1])['ok'] ~= 'hash' then
+    return false
+end
+redis.call('HSETNX', KEYS[1], 'pending_vault_salt', ARGV[1])
+return redis.call('HGET', KEYS[1], 'pending_vault_salt')
+"""
+
+# Grava a nova senha mestra e o salt do cofre e descarta o salt reservado,
+# sem recriar um usuário removido no meio da troca
+# ARGV: campos do registro (pares)
+CHANGE_PASSWORD_SCRIPT = """
+if redis.call('TYPE', KEYS[1])['ok'] ~= 'hash' then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+redis.call('HDEL', KEYS[1], 'pending_vault_salt')
+return 1
+"""
+
+# Lê a sessão e renova seu TTL (expiração deslizante) em uma única ida. Os
+# scripts só tocam chaves declaradas em KEYS (exigência do Redis Cluster): o
+# índice "sessions:<usuário>" é renovado fora do script, já com o usuário lido.
+RESOLVE_SESSION_SCRIPT = """
+local dados = redis.call('HGETALL', KEYS[1])
+if #dados == 0 then
+    return {}
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return dados
+"""
+
+def _pairs(bruto):
+    """Converte a lista [campo, valor, ...] devolvida pelos scripts em dict"""
+    return dict(zip(bruto[::2], bruto[1::2]))
+
+def _flatten(campos):
+    """Converte um dict na lista [campo, valor, ...] usada como ARGV dos scripts"""
+    return [item for campo in campos.items() for item in campo]
+
+def _stored_hash(registro):
+    """
+    Extrai o hash armazenado do registro lido por FETCH_USER_SCRIPT
+    
+    Returns:
+        tuple: (True se o registro está no formato string antigo, hash codificado)
+    """
+    if 'legacy_hash' in registro:
+        return True, registro['legacy_hash']
+    return False, join_hash(registro)
+
+def _login_update(registro, legado, stored_hash, novo_hash):
+    """
+    Campos a regravar no registro após um login bem-sucedido
+    
+    Args:
+        registro (dict): Registro lido do Redis
+        legado (bool): Registro no formato string antigo
+        stored_hash (str): Hash que conferiu com a senha
+        novo_hash (str): Hash recalculado (None se não precisou)
+        
+    Returns:
+        dict: Campos a gravar (vazio se nada mudou)
+    """
+    atualizacao = {}
+    if novo_hash:
+        atualizacao = split_hash(novo_hash)
+    elif legado:
+        atualizacao = split_hash(stored_hash)
+    if legado:
+        atualizacao['vault_salt'] = registro['vault_salt']
+        atualizacao['created_at'] = datetime.now().isoformat()
+    return atualizacao
+
+def _lex_range(prefix, cursor):
+    """Intervalo lexicográfico do ZRANGEBYLEX: [prefixo, prefixo + 0xFF] em bytes"""
+    if cursor:
+        minimo = b"(" + cursor.encode()
+    elif prefix:
+        minimo = b"[" + prefix.encode()
+    else:
+        minimo = b"-"
+    maximo = b"[" + prefix.encode() + b"\xff" if prefix else b"+"
+    return minimo, maximo
+
+def _verified_hash(registro):
+    """Valor guardado do hash conferido no login (comparado por TOUCH_LOGIN_SCRIPT)"""
+    return registro.get('legacy_hash') or registro['password_hash']
+
+def _login_fetch_call(rate_limiter, username, client_id):
+    """Chaves e argumentos de LOGIN_FETCH_SCRIPT"""
+    verificacao = rate_limiter.check_call(username, client_id)
+    return {
+        'keys': [f"user:{username}", f"vault_salt:{username}"]
+                + rate_limiter.reset_keys(username) + verificacao['keys'],
+        'args': [new_salt()] + verificacao['args']
+    }
+
+def _login_fetched(bruto):
+    """
+    Interpreta a resposta de LOGIN_FETCH_SCRIPT
+    
+    Returns:
+        tuple: (registro, True se há falhas anteriores a zerar)
+        
+    Raises:
+        LoginThrottled: Se a tentativa foi recusada pelo limitador
+    """
+    registro = _pairs(bruto)
+    LoginRateLimiter.raise_if_throttled(int(registro.pop('retry_after_ms', 0)))
+    return registro, registro.pop('failures_pending', None) is not None
+
+def _login_result(username, registro, atualizacao):
+    """Dados da sessão devolvidos por login"""
+    return {
+        'username': username,
+        'vault_salt': registro['vault_salt'],
+        'created_at': registro.get('created_at') or atualizacao.get('created_at'),
+        'last_login': registro.get('last_login')
+    }
+
+def redis_settings(max_connections=None):
+    """
+    Parâmetros de conexão com o Redis vindos das variáveis de ambiente
+    
+    Compartilhados pelos clientes síncrono (redis_from_env) e assíncrono
+    (AsyncRedisAuth), para que timeouts e pool sejam configurados em um só lugar.
+    
+    Args:
+        max_connections (int): Tamanho máximo do pool (padrão: REDIS_MAX_CONNECTIONS ou 50)
+        
+    Returns:
+        dict: Argumentos de redis.Redis / redis.asyncio.ConnectionPool
+    """
+    return {
+        'host': os.getenv('REDIS_HOST', 'localhost'),
+        'port': int(os.getenv('REDIS_PORT', 6379)),
+        'password': os.getenv('REDIS_PASSWORD', None),
+        'decode_responses': True,
+        'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', 5)),
+        'socket_connect_timeout': float(os.getenv('REDIS_CONNECT_TIMEOUT', 5)),
+        'max_connections': max_connections or int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+    }
+
+def redis_from_env():
+    """
+    Cliente Redis configurado pelas variáveis de ambiente (ver redis_settings)
+    
+    Para Redis local use: host='localhost', port=6379; para Redis
+    Cloud/Upstash, os dados fornecidos pelo serviço.
+    
+    Returns:
+        redis.Redis: Cliente (a conexão só é aberta no primeiro comando)
+    """
+    return redis.Redis(**redis_settings())
+
+@instrumented('redis')
+class RedisAuth(AuthStore):
     def __init__(self):
         """Inicializa a conexão com Redis"""
-        # Configuração do Redis
-        # Para Redis local use: host='localhost', port=6379
-        # Para Redis Cloud/Upstash use a URL fornecida
-        
-        redis_host = os.getenv('REDIS_HOST', 'localhost')
-        redis_port = int(os.getenv('REDIS_PORT', 6379))
-        redis_password = os.getenv('REDIS_PASSWORD', None)
-        
-        try:
-            self.redis_client = redis.Redis(
-                host=redis_host,
-                port=redis_port,
-                password=redis_password,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5
-            )
+        try:
+            self.redis_client = redis_from_env()
             
             # Testar conexão
             self.redis_client.ping()
-            print("✅ Conectado ao Redis com sucesso!")
+            logger.info("✅ Conectado ao Redis com sucesso!")
+            
+            # Hash das senhas roda em um pool limitado, fora da thread do script
+            self.hasher = PasswordHasher.from_env()
+            
+            # Operações quentes rodam como scripts no servidor (uma ida cada)
+            self._register_script = self.redis_client.register_script(REGISTER_SCRIPT)
+            self._fetch_user_script = self.redis_client.register_script(FETCH_USER_SCRIPT)
+            self._login_fetch_script = self.redis_client.register_script(LOGIN_FETCH_SCRIPT)
+            self._touch_login_script = self.redis_client.register_script(TOUCH_LOGIN_SCRIPT)
+            self._create_session_script = self.redis_client.register_script(CREATE_SESSION_SCRIPT)
+            self._begin_rotation_script = self.redis_client.register_script(BEGIN_ROTATION_SCRIPT)
+            self._change_password_script = self.redis_client.register_script(CHANGE_PASSWORD_SCRIPT)
+            self._resolve_session_script = self.redis_client.register_script(RESOLVE_SESSION_SCRIPT)
+            
+            # Limite de tentativas de login por usuário e por cliente
+            self.rate_limiter = LoginRateLimiter.from_env(self.redis_client)
+            
+            # Tempo (em segundos) sem uso após o qual a sessão expira
+            self.session_ttl = int(os.getenv('SESSION_TTL', 1800))
             
         except Exception as e:
-            print(f"❌ Erro ao conectar ao Redis: {e}")
+            logger.error("❌ Erro ao conectar ao Redis: %s", e)
             raise
     
     def _hash_password(self, password):
         """
-        Gera hash SHA256 da senha
+        Gera hash scrypt (com salt) da senha no pool de hashing
         
         Args:
             password (str): Senha em texto plano
@@ -44,12 +327,16 @@ class RedisAuth:
         Returns:
             str: Hash da senha
         """
-        return hashlib.sha256(password.encode()).hexdigest()
+        return self.hasher.hash(password)
     
     def register(self, username, password):
         """
         Registra um novo usuário no Redis
         
+        O registro é um hash "user:username" com o hash da senha, salt, parâmetros
+        do KDF, salt do cofre e metadados, gravado de forma atômica somente se o
+        usuário ainda não existir.
+        
         Args:
             username (str): Nome de usuário
             password (str): Senha do usuário
@@ -58,56 +345,302 @@ class RedisAuth:
             bool: True se registrado com sucesso, False se usuário já existe
         """
         try:
-            # Verificar se usuário já existe
-            if self.redis_client.exists(f"user:{username}"):
-                print(f"⚠️ Usuário '{username}' já existe")
-                return False
+            registro = split_hash(self._hash_password(password))
+            registro['vault_salt'] = new_salt()
+            registro['created_at'] = datetime.now().isoformat()
+            
+            argumentos = [username] + _flatten(registro)
             
-            # Hash da senha
-            password_hash = self._hash_password(password)
+            if not self._register_script(keys=[f"user:{username}", USER_INDEX_KEY], args=argumentos):
+                logger.warning("⚠️ Usuário '%s' já existe", username)
+                return False
             
-            # Salvar no Redis com chave "user:username"
-            self.redis_client.set(f"user:{username}", password_hash)
-            print(f"✅ Usuário '{username}' registrado com sucesso!")
+            logger.debug("✅ Usuário '%s' registrado com sucesso!", username)
             return True
             
         except Exception as e:
-            print(f"❌ Erro ao registrar usuário: {e}")
+            logger.error("❌ Erro ao registrar usuário: %s", e)
             return False
     
-    def authenticate(self, username, password):
+    def login(self, username, password, client_id=None):
+        """
+        Autentica um usuário e devolve os dados necessários para a sessão
+        
+        Uma única ida ao Redis consome a tentativa no limitador e, se ela
+        for liberada, lê o registro (já com o salt do cofre); a senha é
+        conferida no pool de hashing. Só se houver o que gravar (hash a
+        recalcular, registro no formato antigo ou falhas anteriores a zerar)
+        uma segunda ida conclui o login. O último acesso é registrado por
+        create_session.
+        
+        Args:
+            username (str): Nome de usuário
+            password (str): Senha do usuário
+            client_id (str): Identificador do cliente (ex.: IP) para o limitador
+            
+        Returns:
+            dict: {'username', 'vault_salt', 'created_at', 'last_login'} ou None
+            
+        Raises:
+            LoginThrottled: Se a tentativa foi recusada pelo limitador
+        """
+        try:
+            registro, falhas_pendentes = _login_fetched(
+                self._login_fetch_script(**_login_fetch_call(self.rate_limiter, username, client_id))
+            )
+            
+            if not registro:
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                self.rate_limiter.record_failure(username, client_id)
+                return None
+            
+            legado, stored_hash = _stored_hash(registro)
+            
+            # Comparar senha fornecida com o hash armazenado
+            if not self.hasher.verify(password, stored_hash):
+                logger.warning("❌ Senha incorreta para usuário '%s'", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                self.rate_limiter.record_failure(username, client_id)
+                return None
+            
+            # Hashes antigos (SHA256) ou com custo desatualizado são regravados,
+            # e registros no formato string antigo viram hash
+            novo_hash = None
+            if self.hasher.needs_rehash(stored_hash):
+                novo_hash = self._hash_password(password)
+            atualizacao = _login_update(registro, legado, stored_hash, novo_hash)
+            
+            if atualizacao or falhas_pendentes:
+                self._touch_login_script(
+                    keys=[f"user:{username}", f"vault_salt:{username}", USER_INDEX_KEY]
+                         + self.rate_limiter.reset_keys(username),
+                    args=[username, _verified_hash(registro)] + _flatten(atualizacao)
+                )
+            
+            logger.debug("✅ Usuário '%s' autenticado com sucesso!", username)
+            AUDIT.record('login', username, cliente=client_id)
+            return _login_result(username, registro, atualizacao)
+            
+        except LoginThrottled as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            AUDIT.record('login_throttled', username, cliente=client_id)
+            raise
+            
+        except HashingQueueFull as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            return None
+            
+        except Exception as e:
+            logger.error("❌ Erro ao autenticar usuário: %s", e)
+            return None
+    
+    def authenticate(self, username, password, client_id=None):
         """
         Autentica um usuário
         
         Args:
             username (str): Nome de usuário
             password (str): Senha do usuário
+            client_id (str): Identificador do cliente (ex.: IP) para o limitador
             
         Returns:
-            bool: True se autenticado, False caso contrário
+            bool: True se autenticado, False caso contrário (inclusive se limitado)
         """
         try:
-            # Buscar hash da senha armazenado
-            stored_hash = self.redis_client.get(f"user:{username}")
+            return self.login(username, password, client_id) is not None
+        except LoginThrottled:
+            return False
+    
+    def get_vault_salt(self, username):
+        """
+        Retorna o salt usado para derivar a chave do cofre do usuário,
+        criando-o no primeiro acesso
+        
+        Args:
+            username (str): Nome de usuário
             
-            if not stored_hash:
-                print(f"⚠️ Usuário '{username}' não encontrado")
-                return False
+        Returns:
+            str: Salt em base64 ou None em caso de erro
+        """
+        try:
+            bruto = self._fetch_user_script(
+                keys=[f"user:{username}", f"vault_salt:{username}"],
+                args=[new_salt()]
+            )
+            return _pairs(bruto).get('vault_salt')
+            
+        except Exception as e:
+            logger.error("❌ Erro ao obter salt do cofre: %s", e)
+            return None
+    
+    def begin_key_rotation(self, username):
+        """
+        Reserva o salt da nova chave do cofre para uma troca de senha mestra
+        
+        O salt fica no registro até change_password: repetir uma troca
+        interrompida com a mesma nova senha deriva a mesma chave, e a rotação
+        continua do checkpoint.
+        
+        Args:
+            username (str): Nome de usuário
             
-            # Comparar hash da senha fornecida com o armazenado
-            password_hash = self._hash_password(password)
+        Returns:
+            str: Salt da nova chave em base64 ou None em caso de erro
+        """
+        try:
+            return self._begin_rotation_script(keys=[f"user:{username}"], args=[new_salt()])
             
-            if password_hash == stored_hash:
-                print(f"✅ Usuário '{username}' autenticado com sucesso!")
-                return True
-            else:
-                print(f"❌ Senha incorreta para usuário '{username}'")
+        except Exception as e:
+            logger.error("❌ Erro ao reservar salt do cofre: %s", e)
+            return None
+    
+    def change_password(self, username, new_password, vault_salt):
+        """
+        Troca a senha mestra e o salt do cofre, revogando todas as sessões
+        
+        Deve ser chamado depois que a rotação para a chave derivada de
+        (new_password, vault_salt) terminou.
+        
+        Args:
+            username (str): Nome de usuário
+            new_password (str): Nova senha
+            vault_salt (str): Salt da nova chave (de begin_key_rotation)
+            
+        Returns:
+            bool: True se a senha foi trocada
+        """
+        try:
+            registro = split_hash(self._hash_password(new_password))
+            registro['vault_salt'] = vault_salt
+            
+            if not self._change_password_script(keys=[f"user:{username}"], args=_flatten(registro)):
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
                 return False
-                
+            self.revoke_user_sessions(username)
+            
+            logger.info("✅ Senha de '%s' alterada com sucesso!", username)
+            return True
+            
+        except Exception as e:
+            logger.error("❌ Erro ao alterar senha: %s", e)
+            return False
+    
+    @staticmethod
+    def _session_id(token):
+        """ID da sessão no Redis: hash do token, que nunca é armazenado"""
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def create_session(self, username, seal=None):
+        """
+        Cria uma sessão e devolve o token opaco que a identifica
+        
+        Na mesma ida ao Redis registra o login do usuário (último acesso e
+        contagem de logins).
+        
+        Args:
+            username (str): Nome de usuário autenticado
+            seal (callable): Opcional; recebe o token e devolve um texto guardado
+                na sessão como 'sealed_key' (ex.: chave do cofre selada com o token)
+            
+        Returns:
+            str: Token de sessão ou None em caso de erro
+        """
+        try:
+            token = secrets.token_urlsafe(32)
+            session_id = self._session_id(token)
+            
+            dados = {'username': username, 'created_at': datetime.now().isoformat()}
+            if seal:
+                dados['sealed_key'] = seal(token)
+            
+            self._create_session_script(
+                keys=[f"session:{session_id}", f"sessions:{username}", f"user:{username}"],
+                args=[self.session_ttl, session_id, dados['created_at']] + _flatten(dados)
+            )
+            
+            return token
+            
+        except Exception as e:
+            logger.error("❌ Erro ao criar sessão: %s", e)
+            return None
+    
+    def resolve_session(self, token):
+        """
+        Busca a sessão de um token e renova sua expiração
+        
+        Args:
+            token (str): Token de sessão
+            
+        Returns:
+            dict: {'username', 'created_at', 'sealed_key'?} ou None se inválida/expirada
+        """
+        try:
+            sessao = _pairs(self._resolve_session_script(
+                keys=[f"session:{self._session_id(token)}"],
+                args=[self.session_ttl]
+            ))
+            if not sessao:
+                return None
+            
+            # O índice de sessões do usuário vive tanto quanto a sessão mais recente
+            self.redis_client.expire(f"sessions:{sessao['username']}", self.session_ttl)
+            return sessao
+            
+        except Exception as e:
+            logger.error("❌ Erro ao buscar sessão: %s", e)
+            return None
+    
+    def revoke_session(self, token):
+        """
+        Revoga uma sessão (logout)
+        
+        Args:
+            token (str): Token de sessão
+            
+        Returns:
+            bool: True se a sessão existia
+        """
+        try:
+            session_id = self._session_id(token)
+            username = self.redis_client.hget(f"session:{session_id}", "username")
+            
+            pipe = self.redis_client.pipeline()
+            pipe.delete(f"session:{session_id}")
+            if username:
+                pipe.srem(f"sessions:{username}", session_id)
+            return pipe.execute()[0] > 0
+            
         except Exception as e:
-            print(f"❌ Erro ao autenticar usuário: {e}")
+            logger.error("❌ Erro ao revogar sessão: %s", e)
             return False
     
+    def revoke_user_sessions(self, username):
+        """
+        Revoga todas as sessões de um usuário
+        
+        Args:
+            username (str): Nome de usuário
+            
+        Returns:
+            int: Quantidade de sessões revogadas
+        """
+        try:
+            # Remove só os IDs lidos: uma sessão criada no meio continua no índice
+            chave = f"sessions:{username}"
+            ids = self.redis_client.smembers(chave)
+            if not ids:
+                return 0
+            pipe = self.redis_client.pipeline(transaction=False)
+            for session_id in ids:
+                pipe.delete(f"session:{session_id}")
+            pipe.srem(chave, *ids)
+            pipe.execute()
+            return len(ids)
+        except Exception as e:
+            logger.error("❌ Erro ao revogar sessões: %s", e)
+            return 0
+    
     def delete_user(self, username):
         """
         Remove um usuário do Redis
@@ -119,17 +652,21 @@ class RedisAuth:
             bool: True se removido, False caso contrário
         """
         try:
-            result = self.redis_client.delete(f"user:{username}")
+            pipe = self.redis_client.pipeline()
+            pipe.delete(f"user:{username}", f"vault_salt:{username}")
+            pipe.zrem(USER_INDEX_KEY, username)
+            result = pipe.execute()[0]
+            self.revoke_user_sessions(username)
             
             if result > 0:
-                print(f"✅ Usuário '{username}' removido com sucesso!")
+                logger.debug("✅ Usuário '%s' removido com sucesso!", username)
                 return True
             else:
-                print(f"⚠️ Usuário '{username}' não encontrado")
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
                 return False
                 
         except Exception as e:
-            print(f"❌ Erro ao remover usuário: {e}")
+            logger.error("❌ Erro ao remover usuário: %s", e)
             return False
     
     def user_exists(self, username):
@@ -145,34 +682,123 @@ class RedisAuth:
         try:
             return self.redis_client.exists(f"user:{username}") > 0
         except Exception as e:
-            print(f"❌ Erro ao verificar usuário: {e}")
+            logger.error("❌ Erro ao verificar usuário: %s", e)
             return False
     
-    def list_users(self):
+    def list_users_page(self, prefix="", cursor=None, page_size=100):
+        """
+        Lista uma página de usuários a partir do índice (sorted set)
+        
+        Args:
+            prefix (str): Retorna apenas usernames que começam com este prefixo
+            cursor (str): Último username da página anterior (None = início)
+            page_size (int): Quantidade máxima de usernames na página
+            
+        Returns:
+            tuple: (lista de usernames, cursor da próxima página ou None)
+        """
+        try:
+            minimo, maximo = _lex_range(prefix, cursor)
+            
+            # Busca um username a mais para saber se existe próxima página
+            usernames = self.redis_client.zrangebylex(
+                USER_INDEX_KEY, minimo, maximo, start=0, num=page_size + 1
+            )
+            
+            if len(usernames) > page_size:
+                usernames = usernames[:page_size]
+                return usernames, usernames[-1]
+            return usernames, None
+            
+        except Exception as e:
+            logger.error("❌ Erro ao listar usuários: %s", e)
+            return [], None
+    
+    def iter_users(self, prefix="", page_size=1000):
+        """
+        Percorre os usuários cadastrados, página por página
+        
+        Args:
+            prefix (str): Filtra usernames por prefixo
+            page_size (int): Usernames buscados por ida ao Redis
+            
+        Yields:
+            str: Username
+        """
+        cursor = None
+        while True:
+            usernames, cursor = self.list_users_page(prefix, cursor, page_size)
+            yield from usernames
+            if not cursor:
+                break
+    
+    def list_users(self, prefix=""):
         """
         Lista todos os usuários cadastrados
         
+        Args:
+            prefix (str): Filtra usernames por prefixo
+            
         Returns:
             list: Lista de usernames
         """
+        usernames = list(self.iter_users(prefix))
+        logger.debug("✅ %s usuário(s) encontrado(s)", len(usernames))
+        return usernames
+    
+    def backfill_user_index(self, batch_size=1000):
+        """
+        Popula o índice de usuários a partir das chaves "user:*" existentes
+        
+        Usa SCAN (incremental, sem bloquear o Redis) e deve ser executado uma
+        vez em instalações anteriores ao índice. Pode ser repetido sem efeitos
+        colaterais.
+        
+        Args:
+            batch_size (int): Chaves por iteração do SCAN / por ZADD
+            
+        Returns:
+            int: Quantidade de usuários indexados
+        """
         try:
-            # Buscar todas as chaves que começam com "user:"
-            keys = self.redis_client.keys("user:*")
-            # Extrair usernames removendo o prefixo "user:"
-            usernames = [key.replace("user:", "") for key in keys]
-            print(f"✅ {len(usernames)} usuário(s) encontrado(s)")
-            return usernames
+            total = 0
+            lote = []
+            
+            for key in self.redis_client.scan_iter(match="user:*", count=batch_size):
+                lote.append(key[len("user:"):])
+                if len(lote) >= batch_size:
+                    self.redis_client.zadd(USER_INDEX_KEY, dict.fromkeys(lote, 0))
+                    total += len(lote)
+                    lote = []
+            
+            if lote:
+                self.redis_client.zadd(USER_INDEX_KEY, dict.fromkeys(lote, 0))
+                total += len(lote)
+            
+            logger.info("✅ %s usuário(s) indexado(s)", total)
+            return total
+            
         except Exception as e:
-            print(f"❌ Erro ao listar usuários: {e}")
-            return []
+            logger.error("❌ Erro ao indexar usuários: %s", e)
+            return 0
+    
+    def hash_stats(self):
+        """
+        Estatísticas de latência do hashing de senhas
+        
+        Returns:
+            dict: Ver PasswordHasher.stats
+        """
+        return self.hasher.stats()
     
     def close_connection(self):
         """Fecha a conexão com Redis"""
         try:
             self.redis_client.close()
-            print("✅ Conexão com Redis fechada")
+            self.hasher.shutdown()
+            logger.info("✅ Conexão com Redis fechada")
         except Exception as e:
-            print(f"❌ Erro ao fechar conexão: {e}")
+            logger.error("❌ Erro ao fechar conexão: %s", e)
     
     def __del__(self):
         """Destrutor para garantir que a conexão seja fechada"""
@@ -0,0 +1,364 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+
+from cryptography.fernet import Fernet
+
+import auth
+import database
+from bulk import import_entries
+from crypto import VaultCrypto
+from observability import configure_logging
+
+# Tamanhos de cofre medidos por padrão
+TAMANHOS = (100, 10_000, 100_000)
+
+# Variação aceita em relação ao baseline antes de acusar regressão
+TOLERANCIA = 0.2
+
+# Prefixo dos usuários criados pelo benchmark (removidos ao final)
+PREFIXO = 'bench-'
+
+# Senhas por lote nas medições de criptografia
+LOTE_CRIPTOGRAFIA = 1000
+
+
+def percentile(amostras, q):
+    """
+    Percentil de uma lista de amostras (interpolação linear)
+
+    Args:
+        amostras (list): Valores medidos
+        q (float): Percentil entre 0 e 1
+
+    Returns:
+        float: Valor do percentil
+    """
+    ordenadas = sorted(amostras)
+    posicao = (len(ordenadas) - 1) * q
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicao - inferior)
+
+
+def summarize(amostras, itens=1):
+    """
+    Resume as durações de uma medição
+
+    Args:
+        amostras (list): Duração (em segundos) de cada execução
+        itens (int): Itens processados por execução (ex.: entradas de um lote)
+
+    Returns:
+        dict: 'n', 'ops_per_sec' (itens por segundo), 'mean_ms', 'p50_ms', 'p95_ms' e 'p99_ms'
+    """
+    total = sum(amostras)
+    return {
+        'n': len(amostras),
+        'ops_per_sec': len(amostras) * itens / total if total else None,
+        'mean_ms': total / len(amostras) * 1000,
+        'p50_ms': percentile(amostras, 0.5) * 1000,
+        'p95_ms': percentile(amostras, 0.95) * 1000,
+        'p99_ms': percentile(amostras, 0.99) * 1000
+    }
+
+
+def measure(func, repeat, warmup=1):
+    """Executa func `warmup` vezes sem medir e depois `repeat` vezes, medindo cada uma"""
+    for _ in range(warmup):
+        func()
+
+    amostras = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        func()
+        amostras.append(time.perf_counter() - inicio)
+    return amostras
+
+
+@contextmanager
+def memory_backends():
+    """
+    Substitui MongoDB e Redis por mongomock e fakeredis enquanto ativo
+
+    Os números servem para comparar versões do código entre si, não para
+    estimar a latência de um servidor real.
+    """
+    try:
+        import fakeredis
+        import mongomock
+    except ImportError as e:
+        raise SystemExit(f"O backend em memória requer mongomock e fakeredis: {e}")
+
+    servidor = fakeredis.FakeServer()
+    with mock.patch.object(database, 'MongoClient', lambda *args, **kwargs: mongomock.MongoClient()), \
+            mock.patch.object(auth.redis, 'Redis', functools.partial(fakeredis.FakeRedis, server=servidor)):
+        yield
+
+
+def compare(resultados, baseline, tolerancia=TOLERANCIA):
+    """
+    Compara resultados com um baseline salvo
+
+    Uma medição regride se a vazão cair ou o p99 subir mais que a tolerância.
+    Medições que não existem nos dois lados são ignoradas.
+
+    Args:
+        resultados (dict): Seção 'results' da execução atual
+        baseline (dict): Seção 'results' do baseline
+        tolerancia (float): Variação relativa aceita (0.2 = 20%)
+
+    Returns:
+        list: Descrição de cada regressão encontrada
+    """
+    regressoes = []
+    for nome, atual in sorted(resultados.items()):
+        base = baseline.get(nome)
+        if not base:
+            continue
+
+        if base.get('ops_per_sec') and atual['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {atual['ops_per_sec']:.1f}/s (baseline {base['ops_per_sec']:.1f}/s)")
+        if base.get('p99_ms') and atual['p99_ms'] > base['p99_ms'] * (1 + tolerancia):
+            regressoes.append(f"{nome}: p99 {atual['p99_ms']:.2f} ms (baseline {base['p99_ms']:.2f} ms)")
+    return regressoes
+
+
+class BenchmarkSuite:
+    def __init__(self, mongo, redis_auth, sizes=TAMANHOS, repeat=20, seed=42):
+        """
+        Medições dos caminhos de autenticação e do cofre
+
+        Cada execução usa usuários próprios (PREFIXO + ID da execução), então
+        pode rodar contra instâncias locais com outros dados; cleanup() os remove.
+
+        Args:
+            mongo (MongoDBManager): Gerenciador do MongoDB
+            redis_auth (RedisAuth): Autenticação Redis
+            sizes (tuple): Tamanhos de cofre das medições de listagem, busca e importação
+            repeat (int): Execuções medidas por operação
+            seed (int): Semente dos dados gerados
+        """
+        self.mongo = mongo
+        self.redis_auth = redis_auth
+        self.sizes = sizes
+        self.repeat = repeat
+        self.random = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.crypto = VaultCrypto(Fernet.generate_key())
+        self.usuarios_redis = []
+        self.usuarios_cofre = set()
+        self.resultados = {}
+
+    def _user(self, nome):
+        usuario = f"{PREFIXO}{self.run_id}-{nome}"
+        self.usuarios_cofre.add(usuario)
+        return usuario
+
+    def _name(self):
+        return ''.join(self.random.choices(string.ascii_lowercase, k=10))
+
+    def _record(self, nome, amostras, itens=1):
+        self.resultados[nome] = summarize(amostras, itens)
+        print(f"  {nome}: {self.resultados[nome]['ops_per_sec']:.1f}/s, p99 {self.resultados[nome]['p99_ms']:.2f} ms",
+              file=sys.stderr)
+
+    def _seed(self, usuario, tamanho, lote=1000):
+        """Cria um cofre de `tamanho` entradas (mesmo texto cifrado em todas)"""
+        token = self.crypto.encrypt('senha-de-benchmark')
+        for inicio in range(0, tamanho, lote):
+            self.mongo.bulk_create_passwords(
+                usuario,
+                [(self._name(), token) for _ in range(min(lote, tamanho - inicio))]
+            )
+
+    def bench_auth(self):
+        """Vazão de register e authenticate (dominada pelo hash scrypt)"""
+        usuarios = iter(self._user(f"auth{i}") for i in range(self.repeat + 1))
+
+        def registrar():
+            usuario = next(usuarios)
+            self.redis_auth.register(usuario, 'senha-mestra')
+            self.usuarios_redis.append(usuario)
+
+        self._record('auth.register', measure(registrar, self.repeat))
+
+        # Um usuário por execução: repetir o mesmo esgotaria o balde do limitador
+        # (LOGIN_USER_BURST) e a medição passaria a contar recusas em vez de logins
+        autenticaveis = iter(list(self.usuarios_redis))
+
+        def autenticar():
+            usuario = next(autenticaveis)
+            if not self.redis_auth.authenticate(usuario, 'senha-mestra'):
+                raise RuntimeError(f"Autenticação de {usuario} falhou durante o benchmark")
+
+        self._record('auth.authenticate', measure(autenticar, self.repeat))
+
+    def bench_create(self):
+        """Latência de create_password"""
+        usuario = self._user('create')
+        token = self.crypto.encrypt('senha-de-benchmark')
+        self._record(
+            'vault.create_password',
+            measure(lambda: self.mongo.create_password(usuario, self._name(), token), self.repeat * 5)
+        )
+
+    def bench_vault(self, tamanho):
+        """Listagem completa, primeira página e busca por prefixo em um cofre de `tamanho` entradas"""
+        usuario = self._user(f"vault{tamanho}")
+        self._seed(usuario, tamanho)
+        # Cofres grandes: menos repetições da listagem completa
+        repeticoes = max(3, min(self.repeat, self.repeat * 1000 // tamanho))
+
+        self._record(f"vault.list_passwords[{tamanho}]", measure(lambda: self.mongo.list_passwords(usuario), repeticoes))
+        self._record(
+            f"vault.list_passwords_page[{tamanho}]",
+            measure(lambda: self.mongo.list_passwords_page(usuario, limit=50), self.repeat)
+        )
+        self._record(
+            f"vault.search_passwords[{tamanho}]",
+            measure(lambda: self.mongo.search_passwords(usuario, self._name()[:2]), self.repeat)
+        )
+
+    def bench_import(self, tamanho):
+        """Vazão (entradas/s) da importação em lote com criptografia"""
+        execucoes = iter(range(self.repeat + 1))
+        repeticoes = max(1, min(3, 100_000 // tamanho))
+
+        def importar():
+            usuario = self._user(f"import{tamanho}-{next(execucoes)}")
+            entradas = ((i, self._name(), f"senha{i}") for i in range(tamanho))
+            import_entries(self.mongo, usuario, entradas, self.crypto.encrypt_many)
+
+        self._record(f"vault.bulk_import[{tamanho}]", measure(importar, repeticoes, warmup=0), tamanho)
+
+    def bench_crypto(self):
+        """Vazão (senhas/s) de encrypt_many e decrypt_many em lotes"""
+        senhas = [f"senha{i}" for i in range(LOTE_CRIPTOGRAFIA)]
+        tokens = self.crypto.encrypt_many(senhas)
+
+        self._record(
+            f"crypto.encrypt_many[{LOTE_CRIPTOGRAFIA}]",
+            measure(lambda: self.crypto.encrypt_many(senhas), self.repeat),
+            LOTE_CRIPTOGRAFIA
+        )
+        self._record(
+            f"crypto.decrypt_many[{LOTE_CRIPTOGRAFIA}]",
+            measure(lambda: self.crypto.decrypt_many(tokens), self.repeat),
+            LOTE_CRIPTOGRAFIA
+        )
+
+    def run(self):
+        """
+        Executa todas as medições
+
+        Returns:
+            dict: Nome da medição -> resumo (ver summarize)
+        """
+        try:
+            self.bench_crypto()
+            self.bench_auth()
+            self.bench_create()
+            for tamanho in self.sizes:
+                self.bench_vault(tamanho)
+                self.bench_import(tamanho)
+            return self.resultados
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        """Remove os dados criados por esta execução"""
+        for usuario in self.usuarios_cofre:
+            self.mongo.delete_user_passwords(usuario)
+        for usuario in self.usuarios_redis:
+            self.redis_auth.delete_user(usuario)
+
+
+def run_benchmarks(backend='memory', sizes=TAMANHOS, repeat=20, seed=42):
+    """
+    Executa a suíte e devolve o documento de resultados
+
+    Args:
+        backend (str): 'memory' (mongomock/fakeredis), 'sqlite' (arquivo temporário)
+            ou 'local' (MONGODB_URI e REDIS_*)
+        sizes (tuple): Tamanhos de cofre
+        repeat (int): Execuções medidas por operação
+        seed (int): Semente dos dados gerados
+
+    Returns:
+        dict: {'meta': ambiente da execução, 'results': medições}
+    """
+    def executar(mongo, redis_auth):
+        try:
+            return BenchmarkSuite(mongo, redis_auth, sizes, repeat, seed).run()
+        finally:
+            mongo.close_connection()
+            redis_auth.close_connection()
+
+    if backend == 'memory':
+        with memory_backends():
+            resultados = executar(database.MongoDBManager(), auth.RedisAuth())
+    elif backend == 'sqlite':
+        from sqlite_store import SQLiteAuthStore, SQLiteVaultStore
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'benchmark.db')
+            resultados = executar(SQLiteVaultStore(caminho), SQLiteAuthStore(caminho))
+    else:
+        resultados = executar(database.MongoDBManager(), auth.RedisAuth())
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'backend': backend,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sizes': list(sizes),
+            'repeat': repeat
+        },
+        'results': resultados
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos de autenticação e do cofre")
+    parser.add_argument('--backend', choices=['memory', 'sqlite', 'local'], default='memory',
+                        help="memory: mongomock/fakeredis; sqlite: arquivo SQLite temporário; "
+                             "local: MONGODB_URI e REDIS_HOST/REDIS_PORT")
+    parser.add_argument('--sizes', default=','.join(map(str, TAMANHOS)), help="Tamanhos de cofre, separados por vírgula")
+    parser.add_argument('--repeat', type=int, default=20, help="Execuções medidas por operação")
+    parser.add_argument('--seed', type=int, default=42, help="Semente dos dados gerados")
+    parser.add_argument('--output', help="Arquivo JSON de resultados (padrão: saída padrão)")
+    parser.add_argument('--baseline', help="Arquivo JSON de uma execução anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCIA, help="Variação aceita em relação ao baseline")
+    args = parser.parse_args()
+
+    configure_logging('WARNING')
+    documento = run_benchmarks(args.backend, tuple(int(t) for t in args.sizes.split(',')), args.repeat, args.seed)
+
+    saida = json.dumps(documento, indent=2)
+    if args.output:
+        with open(args.output, 'w') as arquivo:
+            arquivo.write(saida + "\n")
+    else:
+        print(saida)
+
+    if args.baseline:
+        with open(args.baseline) as arquivo:
+            regressoes = compare(documento['results'], json.load(arquivo)['results'], args.tolerance)
+        for regressao in regressoes:
+            print(f"❌ Regressão: {regressao}", file=sys.stderr)
+        if regressoes:
+            sys.exit(1)
+        print("✅ Nenhuma regressão em relação ao baseline", file=sys.stderr)
@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import struct
+from itertools import islice
+
+from observability import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+# Cabeçalho do arquivo: assinatura, versão, bits (m), funções de hash (k) e itens (n)
+ASSINATURA = b'VBLM'
+VERSAO = 1
+CABECALHO = struct.Struct('<4sB3xQIQ')
+
+# Taxa de falsos positivos padrão do filtro
+TAXA_FALSO_POSITIVO = 1e-6
+
+
+def _digest(linha, plaintext):
+    """SHA-1 de uma linha do corpus ('HASH' ou 'HASH:contagem', ou a senha em texto)"""
+    if plaintext:
+        return hashlib.sha1(linha.encode()).digest()
+    return bytes.fromhex(linha.split(':', 1)[0][:40])
+
+
+def _positions(digest, m, k):
+    """
+    Bits do filtro para um SHA-1 (hash duplo sobre o próprio digest)
+
+    O SHA-1 já é uniforme, então duas fatias de 64 bits dele geram as k
+    posições sem calcular outros hashes.
+    """
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:16], 'little') | 1
+    return [(h1 + i * h2) % m for i in range(k)]
+
+
+def filter_size(n, fp_rate=TAXA_FALSO_POSITIVO):
+    """
+    Dimensiona o filtro de Bloom
+
+    Args:
+        n (int): Quantidade de itens
+        fp_rate (float): Taxa de falsos positivos desejada
+
+    Returns:
+        tuple: (bits m, funções de hash k)
+    """
+    m = max(8, math.ceil(-n * math.log(fp_rate) / math.log(2) ** 2))
+    k = max(1, round(m / max(n, 1) * math.log(2)))
+    return m, k
+
+
+def build_filter(corpus, destino, expected_items=None, fp_rate=TAXA_FALSO_POSITIVO, plaintext=False):
+    """
+    Compila um corpus de senhas vazadas em um filtro de Bloom
+
+    O corpus é lido linha a linha e os bits são gravados direto no arquivo
+    mapeado em memória, então nem o corpus nem o filtro precisam caber na RAM.
+
+    Args:
+        corpus (str): Arquivo texto com um SHA-1 em hexadecimal por linha
+            (formato 'HASH:contagem' do Have I Been Pwned) ou senhas em texto
+        destino (str): Arquivo do filtro a gerar
+        expected_items (int): Quantidade de itens (padrão: conta as linhas do corpus)
+        fp_rate (float): Taxa de falsos positivos desejada
+        plaintext (bool): Se True, o corpus tem senhas em texto plano
+
+    Returns:
+        dict: 'items', 'bits', 'hashes' e 'bytes' do filtro gerado
+    """
+    if expected_items is None:
+        with open(corpus, 'rb') as arquivo:
+            expected_items = sum(1 for linha in arquivo if linha.strip())
+
+    m, k = filter_size(expected_items, fp_rate)
+    tamanho = CABECALHO.size + (m + 7) // 8
+
+    with open(destino, 'wb') as saida:
+        saida.truncate(tamanho)
+
+    n = 0
+    with open(destino, 'r+b') as saida, open(corpus, encoding='utf-8', errors='replace') as entrada:
+        with mmap.mmap(saida.fileno(), tamanho) as bits:
+            for linha in entrada:
+                linha = linha.rstrip('\r\n') if plaintext else linha.strip()
+                if not linha:
+                    continue
+                try:
+                    digest = _digest(linha, plaintext)
+                except ValueError:
+                    continue
+
+                for posicao in _positions(digest, m, k):
+                    indice = CABECALHO.size + (posicao >> 3)
+                    bits[indice] |= 1 << (posicao & 7)
+                n += 1
+
+            bits[:CABECALHO.size] = CABECALHO.pack(ASSINATURA, VERSAO, m, k, n)
+            bits.flush()
+
+    logger.info("✅ Filtro de vazamentos gerado: %s senha(s), %s bytes, k=%s", n, tamanho, k)
+    return {'items': n, 'bits': m, 'hashes': k, 'bytes': tamanho}
+
+
+class BreachChecker:
+    def __init__(self, caminho):
+        """
+        Consulta local de senhas vazadas em um filtro de Bloom mapeado em memória
+
+        O arquivo não é carregado: cada consulta lê só as k páginas dos seus
+        bits, e o sistema operacional mantém em cache as mais usadas. Um
+        resultado negativo é definitivo; um positivo tem a taxa de falsos
+        positivos escolhida na geração.
+
+        Args:
+            caminho (str): Arquivo gerado por build_filter
+
+        Raises:
+            ValueError: Se o arquivo não é um filtro válido
+        """
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'rb')
+        self._bits = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+        assinatura, versao, self.m, self.k, self.n = CABECALHO.unpack_from(self._bits)
+        if assinatura != ASSINATURA or versao != VERSAO:
+            self.close()
+            raise ValueError(f"Arquivo de filtro inválido: {caminho}")
+
+    @classmethod
+    def from_env(cls):
+        """
+        Abre o filtro indicado em BREACH_FILTER_PATH
+
+        Returns:
+            BreachChecker: Verificador ou None se não configurado/indisponível
+        """
+        caminho = os.getenv('BREACH_FILTER_PATH')
+        if not caminho:
+            return None
+        try:
+            return cls(caminho)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Filtro de vazamentos indisponível: %s", e)
+            return None
+
+    def _contains(self, digest):
+        for posicao in _positions(digest, self.m, self.k):
+            if not self._bits[CABECALHO.size + (posicao >> 3)] & (1 << (posicao & 7)):
+                return False
+        return True
+
+    def is_breached(self, password):
+        """
+        Verifica se uma senha consta no corpus de vazamentos
+
+        Args:
+            password (str): Senha em texto plano
+
+        Returns:
+            bool: True se a senha (provavelmente) vazou
+        """
+        return self._contains(hashlib.sha1(password.encode()).digest())
+
+    def check_many(self, passwords):
+        """
+        Verifica uma lista de senhas
+
+        Args:
+            passwords (list): Senhas em texto plano (None é ignorado)
+
+        Returns:
+            list: Booleanos, na mesma ordem
+        """
+        return [password is not None and self.is_breached(password) for password in passwords]
+
+    def audit_vault(self, manager, usuario, decrypt_many, batch_size=1000):
+        """
+        Verifica todas as senhas de um cofre, descriptografando em lotes
+
+        Args:
+            manager (MongoDBManager): Gerenciador do MongoDB
+            usuario (str): Dono do cofre
+            decrypt_many (callable): Recebe uma lista de textos cifrados e devolve as senhas
+            batch_size (int): Senhas descriptografadas por lote
+
+        Returns:
+            list: Documentos (sem 'senha') das entradas vazadas
+        """
+        vazadas = []
+        documentos = manager.iter_passwords(usuario, batch_size=batch_size)
+
+        while True:
+            lote = list(islice(documentos, batch_size))
+            if not lote:
+                break
+
+            resultado = self.check_many(decrypt_many([senha['senha'] for senha in lote]))
+            vazadas += [
+                {k: v for k, v in senha.items() if k != 'senha'}
+                for senha, vazada in zip(lote, resultado) if vazada
+            ]
+
+        return vazadas
+
+    def close(self):
+        """Libera o mapeamento e o arquivo"""
+        self._bits.close()
+        self._arquivo.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera o filtro de senhas vazadas usado por BreachChecker")
+    parser.add_argument('corpus', help="Arquivo com um SHA-1 por linha (HASH ou HASH:contagem)")
+    parser.add_argument('destino', help="Arquivo do filtro a gerar")
+    parser.add_argument('--fp-rate', type=float, default=TAXA_FALSO_POSITIVO, help="Taxa de falsos positivos")
+    parser.add_argument('--items', type=int, default=None, help="Quantidade de itens (padrão: contar linhas)")
+    parser.add_argument('--plaintext', action='store_true', help="O corpus tem senhas em texto plano")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    build_filter(args.corpus, args.destino, args.items, args.fp_rate, args.plaintext)
@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+from itertools import islice
+
+# Nomes de coluna usados por exportações de outros gerenciadores de senhas
+# (Chrome, Firefox, Bitwarden, LastPass, 1Password, KeePass e este próprio app)
+COLUNAS_NOME = ('nome', 'name', 'title', 'url', 'login_uri', 'origin')
+COLUNAS_SENHA = ('senha', 'password', 'login_password')
+
+# Tamanho padrão de cada lote de criptografia + bulk_write
+TAMANHO_LOTE = 1000
+
+
+def _primeiro_campo(registro, colunas):
+    """Retorna o primeiro campo não vazio de registro entre as colunas dadas"""
+    for coluna in colunas:
+        valor = registro.get(coluna)
+        if valor:
+            return valor
+    return None
+
+
+def read_csv_entries(arquivo):
+    """
+    Lê entradas de um CSV linha a linha
+
+    Args:
+        arquivo (file): Arquivo texto aberto com cabeçalho na primeira linha
+
+    Yields:
+        tuple: (número da linha, nome, senha em texto plano)
+    """
+    leitor = csv.DictReader(arquivo)
+    for linha, registro in enumerate(leitor, 2):
+        registro = {(k or '').strip().lower(): v for k, v in registro.items()}
+        yield linha, _primeiro_campo(registro, COLUNAS_NOME), _primeiro_campo(registro, COLUNAS_SENHA)
+
+
+def read_json_entries(arquivo):
+    """
+    Lê entradas de uma exportação JSON
+
+    JSON Lines (um objeto por linha) é lido de forma incremental. Um documento
+    JSON único (lista de objetos ou exportação do Bitwarden com 'items')
+    precisa ser decodificado por inteiro, pois o módulo json não faz streaming.
+
+    Args:
+        arquivo (file): Arquivo texto aberto
+
+    Yields:
+        tuple: (número da entrada, nome, senha em texto plano)
+    """
+    primeira = arquivo.readline()
+    while primeira and not primeira.strip():
+        primeira = arquivo.readline()
+
+    # Uma primeira linha que já é um objeto completo indica JSON Lines
+    registros = None
+    if primeira.lstrip().startswith('{'):
+        try:
+            objeto = json.loads(primeira)
+        except ValueError:
+            objeto = None
+        if isinstance(objeto, dict) and 'items' not in objeto:
+            registros = _json_lines(objeto, arquivo)
+
+    if registros is None:
+        dados = json.loads(primeira + arquivo.read()) if primeira else []
+        registros = dados.get('items', []) if isinstance(dados, dict) else dados
+
+    for numero, registro in enumerate(registros, 1):
+        if not isinstance(registro, dict):
+            yield numero, None, None
+            continue
+
+        # Bitwarden guarda a senha dentro de 'login'
+        login = registro.get('login') if isinstance(registro.get('login'), dict) else {}
+        registro = {k.lower(): v for k, v in {**login, **registro}.items() if isinstance(v, str)}
+        yield numero, _primeiro_campo(registro, COLUNAS_NOME), _primeiro_campo(registro, COLUNAS_SENHA)
+
+
+def _json_lines(primeiro, arquivo):
+    """Decodifica um objeto JSON por linha, ignorando linhas em branco"""
+    yield primeiro
+    for linha in arquivo:
+        linha = linha.strip()
+        if linha:
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                yield None
+
+
+def import_entries(manager, usuario, entradas, encrypt_many, batch_size=TAMANHO_LOTE, ordered=False,
+                   fingerprint_many=None):
+    """
+    Importa entradas em lotes: criptografa cada lote de uma vez e grava com bulk_write
+
+    Args:
+        manager (MongoDBManager): Gerenciador do MongoDB
+        usuario (str): Usuário dono das senhas importadas
+        entradas (iterable): Tuplas (linha, nome, senha) de read_csv_entries/read_json_entries
+        encrypt_many (callable): Recebe uma lista de senhas e devolve a lista criptografada
+        batch_size (int): Quantidade de entradas por lote
+        ordered (bool): Se True, para a importação no primeiro erro de gravação
+        fingerprint_many (callable): Recebe uma lista de senhas e devolve suas
+            impressões digitais (opcional)
+
+    Returns:
+        dict: {'inseridas': int, 'erros': lista de (linha, mensagem)}
+    """
+    relatorio = {'inseridas': 0, 'erros': []}
+    entradas = iter(entradas)
+
+    while True:
+        lote = list(islice(entradas, batch_size))
+        if not lote:
+            break
+
+        validas = []
+        for linha, nome, senha in lote:
+            if nome and senha:
+                validas.append((linha, nome, senha))
+            else:
+                relatorio['erros'].append((linha, 'nome ou senha ausente'))
+
+        if not validas:
+            continue
+
+        senhas = [senha for _, _, senha in validas]
+        documentos = [(nome, cifrada) for (_, nome, _), cifrada in zip(validas, encrypt_many(senhas))]
+        if fingerprint_many:
+            documentos = [documento + (impressao,) for documento, impressao in zip(documentos, fingerprint_many(senhas))]
+
+        inseridas, erros = manager.bulk_create_passwords(usuario, documentos, ordered=ordered)
+
+        relatorio['inseridas'] += inseridas
+        relatorio['erros'] += [(validas[indice][0], mensagem) for indice, mensagem in erros]
+
+        if ordered and erros:
+            break
+
+    return relatorio
+
+
+def iter_export(manager, usuario, decrypt_many, formato='csv', batch_size=TAMANHO_LOTE):
+    """
+    Gera a exportação das senhas de um usuário em pedaços, um por lote do cursor
+
+    Só um lote fica descriptografado e formatado em memória por vez; quem
+    consome decide para onde vai cada pedaço (arquivo, resposta HTTP etc.).
+
+    Args:
+        manager (MongoDBManager): Gerenciador do MongoDB
+        usuario (str): Usuário dono das senhas
+        decrypt_many (callable): Recebe uma lista de textos cifrados e devolve as senhas
+        formato (str): 'csv' ou 'jsonl'
+        batch_size (int): Documentos descriptografados e formatados por pedaço
+
+    Yields:
+        tuple: (quantidade de entradas no pedaço, texto do pedaço)
+    """
+    if formato == 'csv':
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(['nome', 'senha'])
+        yield 0, buffer.getvalue()
+
+    documentos = manager.iter_passwords(usuario, batch_size=batch_size)
+
+    while True:
+        lote = list(islice(documentos, batch_size))
+        if not lote:
+            break
+
+        textos = decrypt_many([senha['senha'] for senha in lote])
+
+        if formato == 'csv':
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerows([senha['nome'], texto] for senha, texto in zip(lote, textos))
+            yield len(lote), buffer.getvalue()
+        else:
+            yield len(lote), ''.join(
+                json.dumps({'nome': senha['nome'], 'senha': texto}, ensure_ascii=False) + '\n'
+                for senha, texto in zip(lote, textos)
+            )
+
+
+def export_entries(manager, usuario, arquivo, decrypt_many, formato='csv', batch_size=TAMANHO_LOTE):
+    """
+    Exporta as senhas de um usuário percorrendo o cursor, sem materializar o cofre
+
+    Args:
+        manager (MongoDBManager): Gerenciador do MongoDB
+        usuario (str): Usuário dono das senhas
+        arquivo (file): Arquivo texto de saída
+        decrypt_many (callable): Recebe uma lista de textos cifrados e devolve as senhas
+        formato (str): 'csv' ou 'jsonl'
+        batch_size (int): Documentos descriptografados e gravados por lote
+
+    Returns:
+        int: Quantidade de entradas exportadas
+    """
+    total = 0
+    for quantidade, texto in iter_export(manager, usuario, decrypt_many, formato, batch_size):
+        arquivo.write(texto)
+        total += quantidade
+    return total
@@ -0,0 +1,284 @@
+import threading
+import time
+from collections import OrderedDict
+
+from database import CAMPOS_OMITIDOS, search_key
+from observability import REGISTRY
+from storage import VersionConflict
+
+
+class VaultCache:
+    def __init__(self, max_users=1000, ttl=60, registry=REGISTRY):
+        """
+        Cache em memória (LRU com TTL) das páginas e buscas de cada usuário
+
+        Guarda só o que o banco devolveu para a página ou busca pedida
+        (metadados, sem o texto cifrado), nunca o cofre inteiro. As entradas
+        em cache são imutáveis: alterações montam novas tuplas e trocam a
+        referência com o lock adquirido, e quem lê recebe cópias.
+
+        Args:
+            max_users (int): Quantidade máxima de usuários mantidos em cache
+            ttl (int): Tempo de vida de cada página/busca, em segundos
+            registry (MetricsRegistry): Registro que expõe acertos/falhas (vault_cache_*)
+        """
+        self.max_users = max_users
+        self.ttl = ttl
+
+        # usuario -> {chave da consulta: (expira_em, tupla de documentos, próximo cursor)}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        registry.register_reading('vault_cache_hits_total', "Consultas servidas pelo cache", lambda: self.hits, 'counter')
+        registry.register_reading('vault_cache_misses_total', "Consultas que foram ao banco", lambda: self.misses, 'counter')
+        registry.register_reading(
+            'vault_cache_evictions_total', "Usuários removidos do cache por LRU", lambda: self.evictions, 'counter'
+        )
+        registry.register_reading('vault_cache_users', "Usuários com consultas em cache", lambda: len(self._entries))
+
+    def get(self, usuario, chave):
+        """
+        Busca uma consulta em cache
+
+        Args:
+            usuario (str): Nome do usuário
+            chave (tuple): Identificação da consulta (ex.: ('pagina', cursor, limite))
+
+        Returns:
+            tuple: (cópia dos documentos, próximo cursor) ou None se ausente/expirada
+        """
+        with self._lock:
+            consultas = self._entries.get(usuario)
+            entrada = consultas.get(chave) if consultas else None
+
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del consultas[chave]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(usuario)
+            self.hits += 1
+            documentos, proximo = entrada[1], entrada[2]
+
+        return [dict(documento) for documento in documentos], proximo
+
+    def set(self, usuario, chave, documentos, proximo=None):
+        """
+        Armazena o resultado de uma consulta
+
+        Args:
+            usuario (str): Nome do usuário
+            chave (tuple): Identificação da consulta
+            documentos (list): Documentos devolvidos pelo banco
+            proximo (str): Cursor da página seguinte, se houver
+        """
+        entrada = (time.monotonic() + self.ttl, tuple(dict(d) for d in documentos), proximo)
+        with self._lock:
+            consultas = self._entries.setdefault(usuario, {})
+            consultas[chave] = entrada
+            self._entries.move_to_end(usuario)
+
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, usuario):
+        """Descarta as consultas em cache de um usuário"""
+        with self._lock:
+            self._entries.pop(usuario, None)
+
+    def _rewrite(self, usuario, alterar):
+        """
+        Reescreve as consultas do usuário que contêm um documento
+
+        Args:
+            usuario (str): Nome do usuário
+            alterar (callable): Recebe a tupla de documentos e devolve a nova
+                (ou None se a consulta não pode ser corrigida localmente)
+
+        Returns:
+            bool: False se alguma consulta não pôde ser corrigida (o usuário foi invalidado)
+        """
+        with self._lock:
+            consultas = self._entries.get(usuario)
+            if not consultas:
+                return True
+
+            novas = {}
+            for chave, (expira_em, documentos, proximo) in consultas.items():
+                alterados = alterar(documentos)
+                if alterados is None:
+                    del self._entries[usuario]
+                    return False
+                novas[chave] = (expira_em, alterados, proximo)
+            self._entries[usuario] = novas
+            return True
+
+    def replace(self, usuario, documento):
+        """
+        Substitui em cache um documento pela versão gravada
+
+        Sem mudança de nome, a posição nas páginas e buscas é a mesma e o
+        documento é trocado no lugar; um nome novo muda a ordenação, então as
+        consultas do usuário são descartadas.
+
+        Args:
+            usuario (str): Nome do usuário
+            documento (dict): Documento devolvido pelo banco após a alteração
+        """
+        metadados = _metadata(documento)
+
+        def alterar(documentos):
+            for i, atual in enumerate(documentos):
+                if atual['_id'] == metadados['_id']:
+                    if atual['nome'] != metadados['nome']:
+                        return None
+                    return documentos[:i] + (metadados,) + documentos[i + 1:]
+            return documentos
+
+        self._rewrite(usuario, alterar)
+
+    def remove(self, usuario, password_id):
+        """
+        Remove um documento das consultas em cache
+
+        A página fica com uma entrada a menos; os cursores são (nome, _id),
+        então as páginas seguintes continuam válidas.
+        """
+        self._rewrite(usuario, lambda documentos: tuple(d for d in documentos if d['_id'] != password_id))
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Estatísticas de uso do cache
+
+        Returns:
+            dict: Acertos, falhas, remoções por LRU, usuários em cache e taxa de acerto
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'users': len(self._entries),
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+def _metadata(senha):
+    """Cópia do documento sem os campos omitidos pela projeção de metadados"""
+    return {k: v for k, v in senha.items() if k not in CAMPOS_OMITIDOS}
+
+
+class CachedMongoDBManager:
+    def __init__(self, manager, cache=None):
+        """
+        Camada de cache na frente do MongoDBManager
+
+        Páginas da listagem e buscas por prefixo são servidas da memória; cada
+        falha no cache custa a mesma consulta paginada e projetada (sem o
+        texto cifrado) que iria ao banco. create/update/delete passam direto
+        ao banco e invalidam ou corrigem as consultas em cache do usuário.
+        Métodos não tratados aqui são repassados ao gerenciador original.
+
+        Args:
+            manager (MongoDBManager): Gerenciador a ser envolvido
+            cache (VaultCache): Cache a utilizar (cria um padrão se None)
+        """
+        self.manager = manager
+        self.cache = cache if cache is not None else VaultCache()
+
+    def __getattr__(self, name):
+        return getattr(self.manager, name)
+
+    def list_passwords_page(self, usuario, limit=50, cursor=None):
+        """READ - Página de senhas sem o texto cifrado (via cache)"""
+        chave = ('pagina', cursor, limit)
+        em_cache = self.cache.get(usuario, chave)
+        if em_cache is not None:
+            return em_cache
+
+        pagina, proximo_cursor = self.manager.list_passwords_page(usuario, limit, cursor)
+        # Resultado vazio não é guardado: também é o que o gerenciador devolve em caso de erro
+        if pagina:
+            self.cache.set(usuario, chave, pagina, proximo_cursor)
+        return pagina, proximo_cursor
+
+    def search_passwords(self, usuario, query, limit=20):
+        """READ - Busca por prefixo do nome (via cache)"""
+        chave = ('busca', search_key(query or ''), limit)
+        em_cache = self.cache.get(usuario, chave)
+        if em_cache is not None:
+            return em_cache[0]
+
+        encontradas = self.manager.search_passwords(usuario, query, limit)
+        if encontradas:
+            self.cache.set(usuario, chave, encontradas)
+        return encontradas
+
+    def create_password(self, usuario, nome, senha, impressao=None):
+        """CREATE - Insere uma senha e invalida as consultas do usuário"""
+        resultado = self.manager.create_password(usuario, nome, senha, impressao)
+        if resultado:
+            self.cache.invalidate(usuario)
+        return resultado
+
+    def bulk_create_passwords(self, usuario, entradas, ordered=False):
+        """CREATE (em lote) - Insere várias senhas e invalida as consultas do usuário"""
+        resultado = self.manager.bulk_create_passwords(usuario, entradas, ordered)
+        if resultado[0]:
+            self.cache.invalidate(usuario)
+        return resultado
+
+    def update_password(self, usuario, password_id, novo_nome, nova_senha, impressao=None, expected_version=None):
+        """UPDATE - Atualiza uma senha e grava em cache o documento devolvido pelo banco"""
+        try:
+            resultado = self.manager.update_password(
+                usuario, password_id, novo_nome, nova_senha, impressao, expected_version
+            )
+        except VersionConflict:
+            # As consultas em cache também estão desatualizadas
+            self.cache.invalidate(usuario)
+            raise
+        if resultado:
+            self.cache.replace(usuario, resultado)
+        return resultado
+
+    def delete_password(self, usuario, password_id, expected_version=None):
+        """DELETE - Remove uma senha e retira-a das consultas em cache"""
+        try:
+            resultado = self.manager.delete_password(usuario, password_id, expected_version)
+        except VersionConflict:
+            self.cache.invalidate(usuario)
+            raise
+        if resultado:
+            self.cache.remove(usuario, password_id)
+        return resultado
+
+    def apply_rotation(self, usuario, resultados, key_id):
+        """ROTAÇÃO - Grava um lote re-cifrado e invalida as consultas do usuário"""
+        gravadas = self.manager.apply_rotation(usuario, resultados, key_id)
+        if gravadas:
+            self.cache.invalidate(usuario)
+        return gravadas
+
+    def set_fingerprints(self, usuario, impressoes):
+        """Grava impressões digitais e invalida as consultas do usuário"""
+        gravadas = self.manager.set_fingerprints(usuario, impressoes)
+        if gravadas:
+            self.cache.invalidate(usuario)
+        return gravadas
+
+    def cache_stats(self):
+        """Estatísticas do cache de consultas (acertos/falhas)"""
+        return self.cache.stats()
@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import hmac
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+# Parâmetros do scrypt usado para derivar a chave do cofre a partir da senha mestra
+KDF_N = int(os.getenv('VAULT_KDF_N', 2 ** 15))
+KDF_R = int(os.getenv('VAULT_KDF_R', 8))
+KDF_P = int(os.getenv('VAULT_KDF_P', 1))
+
+# Tamanho (em bytes) do salt gerado para cada usuário
+SALT_BYTES = 16
+
+# Tamanho (em bytes) da impressão digital HMAC gravada com cada senha
+FINGERPRINT_BYTES = 16
+
+
+def new_salt():
+    """
+    Gera um salt aleatório para a derivação da chave do cofre
+
+    Returns:
+        str: Salt codificado em base64
+    """
+    return base64.b64encode(os.urandom(SALT_BYTES)).decode()
+
+
+def derive_key(master_password, salt, n=KDF_N, r=KDF_R, p=KDF_P):
+    """
+    Deriva a chave Fernet do cofre a partir da senha mestra do usuário
+
+    Args:
+        master_password (str): Senha mestra (a mesma do login)
+        salt (str): Salt do usuário em base64
+        n, r, p (int): Parâmetros de custo do scrypt
+
+    Returns:
+        bytes: Chave Fernet (32 bytes em base64 url-safe)
+    """
+    kdf = Scrypt(salt=base64.b64decode(salt), length=32, n=n, r=r, p=p)
+    return base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
+
+
+def _session_fernet(session_token):
+    """Cifrador derivado (HKDF) do token de sessão, usado para selar a chave do cofre"""
+    kdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'vault-session-seal')
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(session_token.encode())))
+
+
+def seal_key(key, session_token):
+    """
+    Cifra a chave do cofre com uma chave derivada do token de sessão
+
+    O Redis guarda apenas o resultado e um hash do token; sem o token, que só
+    existe no cookie de sessão do navegador (nunca na URL), a chave do cofre
+    não pode ser recuperada.
+
+    Args:
+        key (bytes): Chave Fernet do cofre
+        session_token (str): Token de sessão em texto plano
+
+    Returns:
+        str: Chave selada
+    """
+    return _session_fernet(session_token).encrypt(key).decode()
+
+
+def open_key(sealed_key, session_token):
+    """
+    Recupera a chave do cofre selada por seal_key
+
+    Args:
+        sealed_key (str): Chave selada
+        session_token (str): Token de sessão em texto plano
+
+    Returns:
+        bytes: Chave Fernet do cofre
+
+    Raises:
+        InvalidToken: Se o token não corresponde à chave selada
+    """
+    return _session_fernet(session_token).decrypt(sealed_key.encode())
+
+
+class VaultCrypto:
+    def __init__(self, key):
+        """
+        Cifrador do cofre de um usuário
+
+        A instância Fernet é criada uma única vez e reaproveitada em todas as
+        operações da sessão.
+
+        Args:
+            key (bytes): Chave Fernet do cofre
+        """
+        self.key = key
+        self._fernet = Fernet(key)
+
+        # Chave das impressões digitais, separada da chave de cifragem
+        kdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b'vault-fingerprint')
+        self._fingerprint_key = kdf.derive(key)
+
+    @property
+    def key_id(self):
+        """
+        Identificador da chave, gravado nos documentos re-cifrados por ela
+
+        Derivado da chave por HMAC: identifica a versão sem revelar a chave.
+
+        Returns:
+            str: 16 caracteres hexadecimais
+        """
+        return hmac.new(self.key, b'vault-key-id', hashlib.sha256).hexdigest()[:16]
+
+    @classmethod
+    def from_password(cls, master_password, salt):
+        """
+        Cria o cifrador derivando a chave da senha mestra (uma vez por login)
+
+        Args:
+            master_password (str): Senha mestra do usuário
+            salt (str): Salt do usuário em base64
+
+        Returns:
+            VaultCrypto: Cifrador pronto para uso
+        """
+        return cls(derive_key(master_password, salt))
+
+    def encrypt(self, password):
+        """
+        Criptografa uma senha
+
+        Args:
+            password (str): Senha em texto plano
+
+        Returns:
+            str: Token Fernet
+        """
+        return self._fernet.encrypt(password.encode()).decode()
+
+    def decrypt(self, encrypted_password):
+        """
+        Descriptografa uma senha
+
+        Args:
+            encrypted_password (str): Token Fernet
+
+        Returns:
+            str: Senha em texto plano
+
+        Raises:
+            InvalidToken: Se o token não foi gerado com esta chave
+        """
+        return self._fernet.decrypt(encrypted_password.encode()).decode()
+
+    def encrypt_many(self, passwords):
+        """
+        Criptografa uma lista de senhas
+
+        Args:
+            passwords (list): Senhas em texto plano
+
+        Returns:
+            list: Tokens Fernet, na mesma ordem
+        """
+        return [self.encrypt(password) for password in passwords]
+
+    def decrypt_many(self, encrypted_passwords, default=None):
+        """
+        Descriptografa uma lista de senhas
+
+        Args:
+            encrypted_passwords (list): Tokens Fernet
+            default: Valor usado para tokens que não podem ser descriptografados
+
+        Returns:
+            list: Senhas em texto plano, na mesma ordem
+        """
+        senhas = []
+        for encrypted_password in encrypted_passwords:
+            try:
+                senhas.append(self.decrypt(encrypted_password))
+            except InvalidToken:
+                senhas.append(default)
+        return senhas
+
+    def fingerprint(self, password):
+        """
+        Impressão digital (HMAC-SHA256 truncado) de uma senha
+
+        Senhas iguais no mesmo cofre têm a mesma impressão, o que permite achar
+        senhas repetidas no servidor sem descriptografar nada; sem a chave do
+        usuário a impressão não serve para testar senhas candidatas.
+
+        Args:
+            password (str): Senha em texto plano
+
+        Returns:
+            bytes: Impressão digital
+        """
+        return hmac.new(self._fingerprint_key, password.encode(), hashlib.sha256).digest()[:FINGERPRINT_BYTES]
+
+    def fingerprint_many(self, passwords):
+        """
+        Impressões digitais de uma lista de senhas
+
+        Args:
+            passwords (list): Senhas em texto plano
+
+        Returns:
+            list: Impressões digitais, na mesma ordem
+        """
+        return [self.fingerprint(password) for password in passwords]
+
+    def decrypt_entries(self, entries, default=None):
+        """
+        Descriptografa o campo 'senha' de uma lista de documentos
+
+        Args:
+            entries (list): Documentos retornados pelo MongoDBManager
+            default: Valor usado para entradas que não podem ser descriptografadas
+
+        Returns:
+            list: Cópias dos documentos com 'senha' em texto plano
+        """
+        senhas = self.decrypt_many([entry['senha'] for entry in entries], default)
+        return [{**entry, 'senha': senha} for entry, senha in zip(entries, senhas)]
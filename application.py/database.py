@@ -1,13 +1,274 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from datetime import datetime
-from pymongo import MongoClient
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient, ASCENDING, InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson.objectid import ObjectId
+import base64
+import binascii
 import os
+import re
+import threading
 from datetime import datetime
 
-class MongoDBManager:
+from audit import AUDIT
+from observability import get_logger, instrumented
+from storage import VaultStore, VersionConflict
+
+logger = get_logger(__name__)
+
+# Versão do formato compacto dos documentos de senha (documentos sem o campo
+# 'v' estão no formato antigo, com nomes de campo longos e texto cifrado em base64)
+VERSAO_DOCUMENTO = 2
+
+# Chaves curtas do formato compacto. O nome de cada campo é repetido em todo
+# documento, então chaves de uma letra reduzem o tamanho em disco, o working
+# set em RAM e o tráfego. A data de criação vem do próprio ObjectId; 'c' só é
+# gravado quando ela difere (documentos migrados do formato antigo). 'k'
+# identifica a chave que cifrou 's' após uma rotação de chave; 'f' é a
+# impressão digital (HMAC) da senha, usada para achar senhas repetidas; 'r' é
+# a versão do documento, incrementada a cada alteração (ausente = versão 0).
+CAMPOS = {
+    'usuario': 'u',
+    'nome': 'n',
+    'nome_busca': 'b',
+    'senha': 's',
+    'data_criacao': 'c',
+    'data_atualizacao': 't',
+    'excluido': 'x',
+    'versao_chave': 'k',
+    'impressao': 'f',
+    'versao': 'r'
+}
+CAMPO_VERSAO = 'v'
+
+# Campos omitidos nas listagens: o texto cifrado, o nome normalizado e a impressão digital
+CAMPOS_OMITIDOS = ('senha', 'nome_busca', 'impressao')
+
+# Projeção usada nas listagens: apenas metadados, sem o texto cifrado
+PROJECAO_METADADOS = {CAMPOS[campo]: 0 for campo in CAMPOS_OMITIDOS}
+
+# Chave do índice composto que atende listagem e paginação por usuário
+INDICE_USUARIO_NOME = [(CAMPOS['usuario'], ASCENDING), (CAMPOS['nome'], ASCENDING), ('_id', ASCENDING)]
+
+# Índice da busca por prefixo (nome normalizado, sem diferenciar maiúsculas)
+INDICE_USUARIO_BUSCA = [(CAMPOS['usuario'], ASCENDING), (CAMPOS['nome_busca'], ASCENDING)]
+
+
+# Índice da sincronização incremental (alterações por data de atualização)
+INDICE_USUARIO_ATUALIZACAO = [(CAMPOS['usuario'], ASCENDING), (CAMPOS['data_atualizacao'], ASCENDING), ('_id', ASCENDING)]
+
+# Índice das impressões digitais, que agrupa as senhas repetidas de cada usuário
+INDICE_USUARIO_IMPRESSAO = [(CAMPOS['usuario'], ASCENDING), (CAMPOS['impressao'], ASCENDING)]
+
+# Documentos excluídos viram "lápides" ({'x': True}) para a sincronização;
+# todas as leituras normais as ignoram com este filtro
+FILTRO_ATIVO = {CAMPOS['excluido']: {'$ne': True}}
+
+# Documentos ainda no formato antigo
+FILTRO_LEGADO = {CAMPO_VERSAO: {'$exists': False}}
+
+# Índices usados pelas consultas, como (chaves, opções de create_index):
+# criados pelo MongoDBManager e pelo AsyncMongoDBManager. O de lápides atende
+# a compactação (compact_tombstones)
+INDICES = [
+    (INDICE_USUARIO_NOME, {'name': 'usuario_nome_id_v2'}),
+    (INDICE_USUARIO_BUSCA, {'name': 'usuario_nome_busca_v2'}),
+    (INDICE_USUARIO_ATUALIZACAO, {'name': 'usuario_atualizacao_id_v2'}),
+    (
+        [(CAMPOS['data_atualizacao'], ASCENDING)],
+        {'name': 'lapides_v2', 'partialFilterExpression': {CAMPOS['excluido']: True}}
+    ),
+    (
+        INDICE_USUARIO_IMPRESSAO,
+        {'name': 'usuario_impressao', 'partialFilterExpression': {CAMPOS['impressao']: {'$exists': True}}}
+    )
+]
+
+# Índices do formato antigo, removidos quando a migração termina
+INDICES_LEGADOS = ('usuario_nome_id', 'usuario_nome_busca', 'usuario_atualizacao_id', 'lapides')
+
+
+def search_key(nome):
+    """
+    Normaliza o nome para a busca por prefixo sem diferenciar maiúsculas
+    
+    Args:
+        nome (str): Nome/serviço
+    
+    Returns:
+        str: Nome normalizado (gravado no campo 'nome_busca')
+    """
+    return nome.casefold()
+
+
+def encode_ciphertext(token):
+    """
+    Converte o token Fernet (texto base64) nos bytes que ele representa
+    
+    Gravado como binário BSON, o texto cifrado ocupa 3/4 do tamanho do token.
+    
+    Args:
+        token (str): Token Fernet
+    
+    Returns:
+        bytes: Bytes do token (ou o próprio texto, se não for base64 canônico)
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(token)
+    except (binascii.Error, ValueError):
+        return token
+    
+    # Só converte se a volta reproduzir exatamente o mesmo texto
+    if base64.urlsafe_b64encode(bruto).decode() != token:
+        return token
+    return bruto
+
+
+def decode_ciphertext(valor):
+    """
+    Inverso de encode_ciphertext
+    
+    Args:
+        valor (bytes | str): Texto cifrado como gravado no documento
+    
+    Returns:
+        str: Token Fernet
+    """
+    if isinstance(valor, bytes):
+        return base64.urlsafe_b64encode(valor).decode()
+    return valor
+
+
+def creation_time(password_id):
+    """Data de criação (UTC, sem fuso) embutida em um ObjectId"""
+    return password_id.generation_time.replace(tzinfo=None)
+
+
+def utc_now():
+    """
+    Hora atual em UTC, sem fuso (como o pymongo devolve), truncada ao
+    milissegundo: é o que o BSON guarda, então a data gravada e a lida são iguais
+    """
+    agora = datetime.now(timezone.utc).replace(tzinfo=None)
+    return agora.replace(microsecond=agora.microsecond // 1000 * 1000)
+
+
+# Última data entregue por write_time neste processo
+_ultima_escrita = datetime.min
+_relogio = threading.Lock()
+
+
+def write_time():
+    """
+    Data de uma escrita no cofre (data_atualizacao)
+
+    UTC em milissegundos e estritamente crescente no processo: duas escritas
+    no mesmo milissegundo recebem datas distintas, então uma alteração feita
+    depois de um checkpoint (data, _id) de changes_since sempre fica depois
+    dele, mesmo com um _id menor.
+
+    Returns:
+        datetime: Data da escrita
+    """
+    global _ultima_escrita
+    agora = utc_now()
+    with _relogio:
+        _ultima_escrita = max(agora, _ultima_escrita + timedelta(milliseconds=1))
+        return _ultima_escrita
+
+
+def read_time():
+    """Agora para as leituras de changes_since: nunca antes da última data entregue por write_time"""
+    agora = utc_now()
+    with _relogio:
+        return max(agora, _ultima_escrita)
+
+
+def decode_document(documento):
+    """
+    Converte um documento de senha (formato compacto ou antigo) para os nomes de campo do app
+    
+    Args:
+        documento (dict): Documento como lido do MongoDB
+    
+    Returns:
+        dict: Documento com 'usuario', 'nome', 'senha', 'data_criacao' etc. e '_id' como string
+    """
+    if CAMPO_VERSAO not in documento:
+        legado = dict(documento)
+        legado['_id'] = str(legado['_id'])
+        return legado
+    
+    senha = {'_id': str(documento['_id'])}
+    for campo, chave in CAMPOS.items():
+        if chave in documento:
+            senha[campo] = documento[chave]
+    
+    if 'senha' in senha:
+        senha['senha'] = decode_ciphertext(senha['senha'])
+    if 'data_criacao' not in senha:
+        senha['data_criacao'] = creation_time(documento['_id'])
+    return senha
+
+
+def compact_document(legado):
+    """
+    Converte um documento do formato antigo para o formato compacto
+    
+    Args:
+        legado (dict): Documento no formato antigo
+    
+    Returns:
+        dict: Documento compacto, com o mesmo '_id'
+    """
+    documento = {'_id': legado['_id'], CAMPO_VERSAO: VERSAO_DOCUMENTO}
+    
+    for campo in ('usuario', 'nome', 'data_atualizacao', 'excluido'):
+        if campo in legado:
+            documento[CAMPOS[campo]] = legado[campo]
+    
+    if legado.get('senha') is not None:
+        documento[CAMPOS['senha']] = encode_ciphertext(legado['senha'])
+    if legado.get('nome') is not None and not legado.get('excluido'):
+        documento[CAMPOS['nome_busca']] = search_key(legado['nome'])
+    
+    # Guarda a data de criação só quando o ObjectId não a reproduz (o formato
+    # antigo gravava a hora local)
+    data_criacao = legado.get('data_criacao')
+    gerado_em = legado['_id'].generation_time.astimezone().replace(tzinfo=None)
+    if data_criacao and abs(data_criacao - gerado_em) > timedelta(seconds=1):
+        documento[CAMPOS['data_criacao']] = data_criacao
+    
+    return documento
+
+def mongo_settings(max_pool_size=None, min_pool_size=None):
+    """
+    Parâmetros de conexão com o MongoDB vindos das variáveis de ambiente
+    
+    Compartilhados pelos clientes síncrono (MongoDBManager) e assíncrono
+    (AsyncMongoDBManager), para que pool e timeouts sejam configurados em um
+    só lugar: sem os timeouts, uma falha do Atlas prende cada chamada pelos
+    30s padrão de seleção de servidor.
+    
+    Args:
+        max_pool_size (int): Conexões máximas no pool (padrão: MONGO_MAX_POOL_SIZE ou 100)
+        min_pool_size (int): Conexões mantidas abertas (padrão: MONGO_MIN_POOL_SIZE ou 0)
+        
+    Returns:
+        dict: Argumentos nomeados de MongoClient / AsyncIOMotorClient
+    """
+    return {
+        'maxPoolSize': max_pool_size or int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+        'minPoolSize': min_pool_size or int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000))
+    }
+
+@instrumented('mongodb')
+class MongoDBManager(VaultStore):
     def __init__(self):
         """Inicializa a conexão com MongoDB Atlas"""
         # URL de conexão do MongoDB Atlas
@@ -18,19 +279,547 @@ class MongoDBManager:
         )
         
         try:
-            self.client = MongoClient(self.connection_string)
+            # Pool e timeouts configuráveis (ver mongo_settings)
+            self.client = MongoClient(self.connection_string, **mongo_settings())
             self.db = self.client['gerenciador_senhas']
             self.collection = self.collection = self.db['senhas']
             
             # Testar conexão
             self.client.server_info()
-            print("✅ Conectado ao MongoDB Atlas com sucesso!")
+            logger.info("✅ Conectado ao MongoDB Atlas com sucesso!")
+            
+            self._ensure_indexes()
             
+            # Documentos no formato antigo são convertidos em segundo plano; até
+            # lá, os de cada usuário são convertidos no primeiro acesso
+            self._migrated_users = set()
+            self._migrated = self.db['migracoes'].find_one({'_id': 'documentos_compactos'}) is not None
+            if not self._migrated:
+                threading.Thread(target=self.migrate_documents, daemon=True).start()
+            
+            # Lápides mais antigas que a retenção são removidas periodicamente
+            self.tombstone_retention = timedelta(days=int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30)))
+            self._compaction_stop = threading.Event()
+            threading.Thread(
+                target=self._compaction_loop,
+                args=(int(os.getenv('TOMBSTONE_COMPACT_INTERVAL', 3600)),),
+                daemon=True
+            ).start()
+        
         except Exception as e:
-            print(f"❌ Erro ao conectar ao MongoDB: {e}")
+            logger.error("❌ Erro ao conectar ao MongoDB: %s", e)
             raise
     
-    def create_password(self, usuario, nome, senha):
+    def _ensure_indexes(self):
+        """Cria (se ainda não existirem) os índices usados pelas consultas"""
+        for chaves, opcoes in INDICES:
+            self.collection.create_index(chaves, **opcoes)
+    
+    @staticmethod
+    def _migration_filter(filtro, ultimo_id):
+        """Filtro do próximo lote de documentos antigos, em ordem de _id"""
+        consulta = {**filtro, **FILTRO_LEGADO}
+        if ultimo_id is not None:
+            consulta['_id'] = {'$gt': ultimo_id}
+        return consulta
+    
+    @staticmethod
+    def _migration_operations(lote):
+        """
+        Substituições que convertem um lote para o formato compacto
+        
+        Cada substituição só é aplicada se o documento não mudou desde a
+        leitura, então migrações concorrentes (réplicas, acesso do usuário e
+        tarefa em segundo plano) não sobrescrevem escritas umas das outras.
+        """
+        return [
+            ReplaceOne(
+                {'_id': legado['_id'], **FILTRO_LEGADO, 'data_atualizacao': legado.get('data_atualizacao')},
+                compact_document(legado)
+            )
+            for legado in lote
+        ]
+    
+    def _migrate(self, filtro, batch_size=500):
+        """
+        Converte para o formato compacto os documentos antigos que casam com o filtro
+        
+        Args:
+            filtro (dict): Filtro sobre os campos antigos (ex.: {'usuario': ...})
+            batch_size (int): Documentos convertidos por bulk_write
+        
+        Returns:
+            int: Quantidade de documentos convertidos
+        """
+        total = 0
+        ultimo_id = None
+        
+        while True:
+            lote = list(
+                self.collection.find(self._migration_filter(filtro, ultimo_id))
+                .sort('_id', ASCENDING)
+                .limit(batch_size)
+            )
+            if not lote:
+                break
+            
+            total += self.collection.bulk_write(self._migration_operations(lote), ordered=False).modified_count
+            ultimo_id = lote[-1]['_id']
+            
+            if len(lote) < batch_size:
+                break
+        
+        return total
+    
+    def _ensure_migrated(self, usuario):
+        """Converte os documentos antigos do usuário antes da primeira consulta"""
+        if self._migrated or usuario in self._migrated_users:
+            return
+        self._migrate({'usuario': usuario})
+        self._migrated_users.add(usuario)
+    
+    def _ensure_document_migrated(self, password_id):
+        """Converte um documento antigo antes de alterá-lo pelo ID"""
+        if not self._migrated:
+            self._migrate({'_id': password_id})
+    
+    def migrate_documents(self, batch_size=1000):
+        """
+        Converte todos os documentos do formato antigo para o formato compacto
+        
+        Ao terminar, registra a conclusão (as próximas inicializações não
+        procuram mais documentos antigos) e remove os índices antigos. Todas as
+        réplicas devem estar na versão atual antes, para não gravarem mais
+        documentos no formato antigo.
+        
+        Args:
+            batch_size (int): Documentos convertidos por bulk_write
+        
+        Returns:
+            int: Quantidade de documentos convertidos
+        """
+        try:
+            antes = self.storage_stats()
+            total = self._migrate({}, batch_size)
+            
+            self.db['migracoes'].update_one(
+                {'_id': 'documentos_compactos'},
+                {'$setOnInsert': {'versao': VERSAO_DOCUMENTO, 'concluida_em': utc_now()}},
+                upsert=True
+            )
+            self._migrated = True
+            
+            indices = self.collection.index_information()
+            for nome in INDICES_LEGADOS:
+                if nome in indices:
+                    self.collection.drop_index(nome)
+            
+            if total:
+                depois = self.storage_stats()
+                logger.info(
+                    "✅ %s senha(s) convertida(s) para o formato compacto (tamanho médio: %.0f → %.0f bytes)",
+                    total, antes.get('avg_obj_size', 0), depois.get('avg_obj_size', 0)
+                )
+            return total
+        
+        except Exception as e:
+            logger.error("❌ Erro ao converter senhas para o formato compacto: %s", e)
+            return 0
+    
+    def storage_stats(self):
+        """
+        Tamanho da coleção de senhas e de seus índices
+        
+        Returns:
+            dict: 'count', 'size', 'avg_obj_size' e 'total_index_size' (bytes)
+        """
+        try:
+            stats = self.db.command('collStats', self.collection.name)
+            return {
+                'count': stats.get('count', 0),
+                'size': stats.get('size', 0),
+                'avg_obj_size': stats.get('avgObjSize', 0),
+                'total_index_size': stats.get('totalIndexSize', 0)
+            }
+        except Exception as e:
+            logger.warning("⚠️ Estatísticas da coleção indisponíveis: %s", e)
+            return {}
+    
+    @staticmethod
+    def _decode_cursor(cursor):
+        """
+        Decodifica um cursor gerado por _encode_cursor
+        
+        Args:
+            cursor (str): Cursor codificado
+        
+        Returns:
+            tuple: (nome, ObjectId) da última entrada da página anterior
+        """
+        nome, password_id = VaultStore._decode_cursor(cursor)
+        return nome, ObjectId(password_id)
+    
+    @staticmethod
+    def _new_document(usuario, nome, senha, agora, impressao=None):
+        """Documento compacto de uma nova senha (compartilhado com AsyncMongoDBManager)"""
+        documento = {
+            '_id': ObjectId(),
+            CAMPO_VERSAO: VERSAO_DOCUMENTO,
+            CAMPOS['usuario']: usuario,
+            CAMPOS['nome']: nome,
+            CAMPOS['nome_busca']: search_key(nome),
+            CAMPOS['senha']: encode_ciphertext(senha),
+            CAMPOS['data_atualizacao']: agora,
+            CAMPOS['versao']: 1
+        }
+        if impressao:
+            documento[CAMPOS['impressao']] = impressao
+        return documento
+
+    @staticmethod
+    def _user_filter(usuario):
+        """Filtro das senhas ativas de um usuário"""
+        return {CAMPOS['usuario']: usuario, **FILTRO_ATIVO}
+    
+    @classmethod
+    def _page_filter(cls, usuario, cursor):
+        """Filtro keyset de list_passwords_page"""
+        filtro = cls._user_filter(usuario)
+        
+        if cursor:
+            ultimo_nome, ultimo_id = cls._decode_cursor(cursor)
+            filtro['$or'] = [
+                {CAMPOS['nome']: {'$gt': ultimo_nome}},
+                {CAMPOS['nome']: ultimo_nome, '_id': {'$gt': ultimo_id}}
+            ]
+        return filtro
+    
+    @classmethod
+    def _page_result(cls, documentos, limit):
+        """Corta a página (buscada com limit + 1) e calcula o próximo cursor"""
+        proximo_cursor = None
+        if len(documentos) > limit:
+            documentos = documentos[:limit]
+            ultimo = documentos[-1]
+            proximo_cursor = cls._encode_cursor(ultimo[CAMPOS['nome']], ultimo['_id'])
+        
+        return [decode_document(documento) for documento in documentos], proximo_cursor
+    
+    @classmethod
+    def _search_filter(cls, usuario, query):
+        """Filtro da busca por prefixo (expressão ancorada sobre o nome normalizado)"""
+        filtro = cls._user_filter(usuario)
+        if query:
+            filtro[CAMPOS['nome_busca']] = {'$regex': '^' + re.escape(search_key(query))}
+        return filtro
+    
+    @staticmethod
+    def _update_operation(novo_nome, nova_senha, impressao=None):
+        """
+        Atualização aplicada por update_password (sem impressão digital, a antiga é removida)
+        
+        A marca de chave é removida: o texto vem da sessão que gravou, que pode
+        ainda estar na chave anterior a uma rotação, e a rotação confere de novo
+        as senhas sem marca.
+        """
+        campos = {
+            CAMPOS['nome']: novo_nome,
+            CAMPOS['nome_busca']: search_key(novo_nome),
+            CAMPOS['senha']: encode_ciphertext(nova_senha),
+            CAMPOS['data_atualizacao']: write_time()
+        }
+        operacao = {'$set': campos, '$inc': {CAMPOS['versao']: 1}, '$unset': {CAMPOS['versao_chave']: ''}}
+        if impressao:
+            campos[CAMPOS['impressao']] = impressao
+        else:
+            operacao['$unset'][CAMPOS['impressao']] = ''
+        return operacao
+    
+    @staticmethod
+    def _tombstone_update():
+        """Atualização que transforma um documento em lápide"""
+        return {
+            '$set': {CAMPOS['excluido']: True, CAMPOS['data_atualizacao']: write_time()},
+            '$unset': {CAMPOS['senha']: '', CAMPOS['nome_busca']: '', CAMPOS['impressao']: ''},
+            '$inc': {CAMPOS['versao']: 1}
+        }
+    
+    @staticmethod
+    def _owned_filter(usuario, password_id, expected_version=None):
+        """Filtro das alterações: a senha ativa, do próprio usuário e, se informada, na versão lida"""
+        filtro = {'_id': ObjectId(password_id), CAMPOS['usuario']: usuario, **FILTRO_ATIVO}
+        if expected_version is not None:
+            # Versão 0: documento anterior ao controle de versão (sem o campo)
+            filtro[CAMPOS['versao']] = expected_version or None
+        return filtro
+    
+    def _raise_if_conflict(self, usuario, password_id, expected_version):
+        """
+        Depois de uma alteração que não casou com nada, distingue senha
+        inexistente (ou de outro usuário) de senha em outra versão
+        
+        Raises:
+            VersionConflict: Se a senha existe, mas não na versão esperada
+        """
+        if expected_version is None:
+            return
+        atual = self.collection.find_one(self._owned_filter(usuario, password_id), PROJECAO_METADADOS)
+        if atual:
+            raise VersionConflict(password_id, expected_version, decode_document(atual))
+    
+    @classmethod
+    def _changes_filter(cls, usuario, checkpoint, settle_seconds):
+        """
+        Filtro de changes_since
+        
+        Returns:
+            tuple: (filtro, data do checkpoint ou None)
+        """
+        limite_superior = read_time() - timedelta(seconds=settle_seconds)
+        atualizacao = CAMPOS['data_atualizacao']
+        
+        if not checkpoint:
+            return {CAMPOS['usuario']: usuario, atualizacao: {'$lte': limite_superior}}, None
+        
+        ultima_data, ultimo_id = cls._decode_cursor(checkpoint)
+        ultima_data = datetime.fromisoformat(ultima_data)
+        filtro = {
+            CAMPOS['usuario']: usuario,
+            '$or': [
+                {atualizacao: {'$gt': ultima_data, '$lte': limite_superior}},
+                {atualizacao: ultima_data, '_id': {'$gt': ultimo_id}}
+            ]
+        }
+        return filtro, ultima_data
+    
+    @classmethod
+    def _changes_result(cls, documentos, checkpoint, limit):
+        """Monta o retorno de changes_since a partir dos documentos (limit + 1)"""
+        has_more = len(documentos) > limit
+        documentos = documentos[:limit]
+        
+        novo_checkpoint = checkpoint
+        if documentos:
+            ultimo = documentos[-1]
+            novo_checkpoint = cls._encode_cursor(ultimo[CAMPOS['data_atualizacao']].isoformat(), ultimo['_id'])
+        
+        return {
+            'changes': [decode_document(documento) for documento in documentos],
+            'checkpoint': novo_checkpoint,
+            'has_more': has_more,
+            'reset': False
+        }
+    
+    @staticmethod
+    def _bulk_write_errors(details, ordered, total):
+        """Converte os detalhes de um BulkWriteError no retorno de bulk_create_passwords"""
+        erros = [(erro['index'], erro['errmsg']) for erro in details['writeErrors']]
+        
+        # Em lotes ordenados, tudo após o primeiro erro não é processado
+        if ordered and erros:
+            primeiro = erros[0][0]
+            erros += [(i, 'não processado') for i in range(primeiro + 1, total)]
+        
+        return details['nInserted'], erros
+    
+    def rotation_batch(self, usuario, key_id, cursor=None, limit=500):
+        """
+        ROTAÇÃO - Lote de senhas do usuário ainda não re-cifradas com a chave key_id
+        
+        Percorre o índice (usuario, nome, _id) com o mesmo cursor keyset de
+        list_passwords_page, trazendo apenas o texto cifrado.
+        
+        Args:
+            usuario (str): Nome do usuário
+            key_id (str): Identificador da nova chave (VaultCrypto.key_id)
+            cursor (str): Cursor devolvido pelo lote anterior (None = início)
+            limit (int): Quantidade máxima de senhas no lote
+            
+        Returns:
+            tuple: (lista de (ObjectId, token Fernet), cursor do próximo lote ou None)
+        """
+        self._ensure_migrated(usuario)
+        filtro = {**self._page_filter(usuario, cursor), CAMPOS['versao_chave']: {'$ne': key_id}}
+        
+        documentos = list(
+            self.collection.find(filtro, {CAMPOS['nome']: 1, CAMPOS['senha']: 1})
+            .sort(INDICE_USUARIO_NOME[1:])
+            .limit(limit)
+        )
+        
+        proximo_cursor = None
+        if len(documentos) == limit:
+            ultimo = documentos[-1]
+            proximo_cursor = self._encode_cursor(ultimo[CAMPOS['nome']], ultimo['_id'])
+        
+        return [(d['_id'], decode_ciphertext(d[CAMPOS['senha']])) for d in documentos], proximo_cursor
+    
+    def rotation_pending(self, usuario, key_id):
+        """
+        ROTAÇÃO - Quantidade de senhas do usuário ainda não re-cifradas com a chave key_id
+        
+        Args:
+            usuario (str): Nome do usuário
+            key_id (str): Identificador da nova chave (VaultCrypto.key_id)
+            
+        Returns:
+            int: Senhas ativas fora da nova chave
+        """
+        self._ensure_migrated(usuario)
+        return self.collection.count_documents({**self._user_filter(usuario), CAMPOS['versao_chave']: {'$ne': key_id}})
+    
+    def apply_rotation(self, usuario, resultados, key_id):
+        """
+        ROTAÇÃO - Grava um lote re-cifrado em um único bulk_write
+        
+        Cada escrita só é aplicada se o texto cifrado ainda é o que foi lido e
+        o documento ainda não está na nova chave; entradas alteradas nesse
+        meio-tempo ficam para a próxima passada da rotação. A impressão
+        digital depende da chave, então é regravada junto.
+        
+        Args:
+            usuario (str): Dono das senhas (escritas em senhas de outro usuário não se aplicam)
+            resultados (list): Tuplas (ObjectId, token lido, token re-cifrado, impressão digital)
+            key_id (str): Identificador da nova chave
+            
+        Returns:
+            int: Quantidade de documentos gravados
+        """
+        if not resultados:
+            return 0
+        
+        agora = write_time()
+        operacoes = [
+            UpdateOne(
+                {
+                    '_id': password_id,
+                    CAMPOS['usuario']: usuario,
+                    CAMPOS['senha']: encode_ciphertext(antigo),
+                    CAMPOS['versao_chave']: {'$ne': key_id}
+                },
+                {
+                    '$set': {
+                        CAMPOS['senha']: encode_ciphertext(novo),
+                        CAMPOS['versao_chave']: key_id,
+                        CAMPOS['impressao']: impressao,
+                        CAMPOS['data_atualizacao']: agora
+                    },
+                    '$inc': {CAMPOS['versao']: 1}
+                }
+            )
+            for password_id, antigo, novo, impressao in resultados
+        ]
+        return self.collection.bulk_write(operacoes, ordered=False).modified_count
+    
+    def fingerprint_backlog(self, usuario, limit=500):
+        """
+        Lote de senhas ativas do usuário ainda sem impressão digital
+        
+        Args:
+            usuario (str): Nome do usuário
+            limit (int): Quantidade máxima de senhas no lote
+            
+        Returns:
+            list: Tuplas (ObjectId, token Fernet)
+        """
+        self._ensure_migrated(usuario)
+        documentos = self.collection.find(
+            {**self._user_filter(usuario), CAMPOS['impressao']: {'$exists': False}},
+            {CAMPOS['senha']: 1}
+        ).limit(limit)
+        return [(d['_id'], decode_ciphertext(d[CAMPOS['senha']])) for d in documentos]
+    
+    def set_fingerprints(self, usuario, impressoes):
+        """
+        Grava as impressões digitais de senhas já existentes
+        
+        Cada escrita só é aplicada se o texto cifrado não mudou desde a leitura.
+        
+        Args:
+            usuario (str): Dono das senhas (escritas em senhas de outro usuário não se aplicam)
+            impressoes (list): Tuplas (ObjectId, token lido, impressão digital)
+            
+        Returns:
+            int: Quantidade de documentos gravados
+        """
+        if not impressoes:
+            return 0
+        
+        operacoes = [
+            UpdateOne(
+                {'_id': password_id, CAMPOS['usuario']: usuario, CAMPOS['senha']: encode_ciphertext(token)},
+                {'$set': {CAMPOS['impressao']: impressao}}
+            )
+            for password_id, token, impressao in impressoes
+        ]
+        return self.collection.bulk_write(operacoes, ordered=False).modified_count
+    
+    @staticmethod
+    def _reused_pipeline(usuario):
+        """Agregação de find_reused_passwords (compartilhada com AsyncMongoDBManager)"""
+        return [
+            {'$match': {CAMPOS['usuario']: usuario, CAMPOS['impressao']: {'$exists': True}, **FILTRO_ATIVO}},
+            {'$sort': {CAMPOS['impressao']: ASCENDING}},
+            {'$group': {
+                '_id': '$' + CAMPOS['impressao'],
+                'count': {'$sum': 1},
+                'entries': {'$push': {'_id': {'$toString': '$_id'}, 'nome': '$' + CAMPOS['nome']}}
+            }},
+            {'$match': {'count': {'$gt': 1}}},
+            {'$sort': {'count': -1}},
+            {'$project': {'_id': 0, 'count': 1, 'entries': 1}}
+        ]
+    
+    def find_reused_passwords(self, usuario):
+        """
+        READ - Grupos de senhas do usuário que usam a mesma senha
+        
+        O agrupamento é feito no servidor pela impressão digital (índice
+        usuario_impressao), sem trazer nem descriptografar o texto cifrado.
+        Senhas ainda sem impressão digital não entram no relatório.
+        
+        Args:
+            usuario (str): Nome do usuário
+            
+        Returns:
+            list: Grupos {'count', 'entries': [{'_id', 'nome'}]}, maiores primeiro
+        """
+        try:
+            self._ensure_migrated(usuario)
+            return list(self.collection.aggregate(self._reused_pipeline(usuario)))
+        
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senhas repetidas: %s", e)
+            return []
+    
+    def load_rotation_checkpoint(self, job_id):
+        """
+        ROTAÇÃO - Lê o checkpoint de uma rotação de chave
+        
+        Args:
+            job_id (str): Identificador da rotação
+            
+        Returns:
+            dict: Checkpoint gravado ou None
+        """
+        return self.db['rotacoes'].find_one({'_id': job_id})
+    
+    def save_rotation_checkpoint(self, job_id, campos):
+        """
+        ROTAÇÃO - Grava o checkpoint de uma rotação de chave
+        
+        Args:
+            job_id (str): Identificador da rotação
+            campos (dict): Campos a gravar (cursor, contadores, conclusão)
+        """
+        agora = utc_now()
+        self.db['rotacoes'].update_one(
+            {'_id': job_id},
+            {'$set': {**campos, 'atualizado_em': agora}, '$setOnInsert': {'iniciado_em': agora}},
+            upsert=True
+        )
+    
+    def create_password(self, usuario, nome, senha, impressao=None):
         """
         CREATE - Insere uma nova senha no banco
         
@@ -38,143 +827,390 @@ class MongoDBManager:
             usuario (str): Nome do usuário dono da senha
             nome (str): Nome/serviço da senha
             senha (str): Senha criptografada
-            
+            impressao (bytes): Impressão digital da senha (VaultCrypto.fingerprint)
+        
         Returns:
             str: ID do documento inserido ou None em caso de erro
         """
         try:
-            documento = {
-                'usuario': usuario,
-                'nome': nome,
-                'senha': senha,
-                'data_criacao': datetime.now(),
-                'data_atualizacao': datetime.now()
-            }
+            documento = self._new_document(usuario, nome, senha, write_time(), impressao)
             
             resultado = self.collection.insert_one(documento)
-            print(f"✅ Senha cadastrada com ID: {resultado.inserted_id}")
+            logger.debug("✅ Senha cadastrada com ID: %s", resultado.inserted_id)
+            AUDIT.record('create_password', usuario, password_id=str(resultado.inserted_id))
             return str(resultado.inserted_id)
-            
+        
         except Exception as e:
-            print(f"❌ Erro ao cadastrar senha: {e}")
+            logger.error("❌ Erro ao cadastrar senha: %s", e)
             return None
     
+    def bulk_create_passwords(self, usuario, entradas, ordered=False):
+        """
+        CREATE (em lote) - Insere várias senhas em um único bulk_write
+        
+        Args:
+            usuario (str): Nome do usuário dono das senhas
+            entradas (list): Tuplas (nome, senha criptografada[, impressão digital])
+            ordered (bool): Se True, interrompe o lote no primeiro erro
+        
+        Returns:
+            tuple: (quantidade inserida, lista de (índice no lote, mensagem) com erros)
+        """
+        if not entradas:
+            return 0, []
+        
+        agora = write_time()
+        operacoes = [
+            InsertOne(self._new_document(usuario, *entrada[:2], agora, *entrada[2:]))
+            for entrada in entradas
+        ]
+        
+        try:
+            resultado = self.collection.bulk_write(operacoes, ordered=ordered)
+            AUDIT.record('bulk_create_passwords', usuario, quantidade=resultado.inserted_count)
+            return resultado.inserted_count, []
+        
+        except BulkWriteError as e:
+            inseridas, erros = self._bulk_write_errors(e.details, ordered, len(operacoes))
+            if inseridas:
+                AUDIT.record('bulk_create_passwords', usuario, quantidade=inseridas)
+            return inseridas, erros
+        
+        except Exception as e:
+            logger.error("❌ Erro ao cadastrar senhas em lote: %s", e)
+            return 0, [(i, str(e)) for i in range(len(operacoes))]
+    
+    def iter_passwords(self, usuario, batch_size=1000):
+        """
+        READ - Percorre todas as senhas de um usuário sem carregá-las de uma vez
+        
+        Args:
+            usuario (str): Nome do usuário
+            batch_size (int): Documentos trazidos do servidor por lote do cursor
+        
+        Yields:
+            dict: Documento da senha (com '_id' como string)
+        """
+        self._ensure_migrated(usuario)
+        cursor = (
+            self.collection.find(self._user_filter(usuario))
+            .sort(INDICE_USUARIO_NOME[1:])
+            .batch_size(batch_size)
+        )
+        
+        with cursor:
+            for documento in cursor:
+                yield decode_document(documento)
+    
     def list_passwords(self, usuario):
         """
         READ - Lista todas as senhas de um usuário
         
         Args:
             usuario (str): Nome do usuário
-            
+        
         Returns:
             list: Lista de documentos (senhas)
         """
         try:
-            senhas = list(self.collection.find({'usuario': usuario}))
+            self._ensure_migrated(usuario)
+            senhas = [
+                decode_document(documento)
+                for documento in self.collection.find(self._user_filter(usuario)).sort(INDICE_USUARIO_NOME[1:])
+            ]
             
-            # Converter ObjectId para string para exibição
-            for senha in senhas:
-                senha['_id'] = str(senha['_id'])
-            
-            print(f"✅ {len(senhas)} senha(s) encontrada(s) para o usuário {usuario}")
+            logger.debug("✅ %s senha(s) encontrada(s) para o usuário %s", len(senhas), usuario)
             return senhas
+        
+        except Exception as e:
+            logger.error("❌ Erro ao listar senhas: %s", e)
+            return []
+    
+    def list_passwords_page(self, usuario, limit=50, cursor=None):
+        """
+        READ - Lista uma página das senhas de um usuário, sem o texto cifrado
+        
+        A paginação é feita por keyset sobre (usuario, nome, _id), de modo que
+        cada página corresponde a uma única varredura no índice composto.
+        
+        Args:
+            usuario (str): Nome do usuário
+            limit (int): Quantidade máxima de entradas na página
+            cursor (str): Cursor devolvido pela página anterior (None = início)
+        
+        Returns:
+            tuple: (lista de documentos sem 'senha', cursor da próxima página ou None)
+        """
+        try:
+            self._ensure_migrated(usuario)
+            
+            # Busca um documento a mais para saber se existe próxima página
+            documentos = list(
+                self.collection.find(self._page_filter(usuario, cursor), PROJECAO_METADADOS)
+                .sort(INDICE_USUARIO_NOME[1:])
+                .limit(limit + 1)
+            )
+            
+            return self._page_result(documentos, limit)
+        
+        except Exception as e:
+            logger.error("❌ Erro ao listar página de senhas: %s", e)
+            return [], None
+    
+    def search_passwords(self, usuario, query, limit=20):
+        """
+        READ - Busca senhas cujo nome começa com o texto informado
+        
+        A busca não diferencia maiúsculas/minúsculas e usa o índice
+        (usuario, nome_busca): a expressão ancorada vira um intervalo no índice.
+        
+        Args:
+            usuario (str): Nome do usuário
+            query (str): Início do nome/serviço
+            limit (int): Quantidade máxima de resultados
+        
+        Returns:
+            list: Documentos encontrados, sem o texto cifrado
+        """
+        try:
+            self._ensure_migrated(usuario)
+            documentos = (
+                self.collection.find(self._search_filter(usuario, query), PROJECAO_METADADOS)
+                .sort(INDICE_USUARIO_BUSCA[1:])
+                .limit(limit)
+            )
             
+            return [decode_document(documento) for documento in documentos]
+        
         except Exception as e:
-            print(f"❌ Erro ao listar senhas: {e}")
+            logger.error("❌ Erro ao buscar senhas: %s", e)
             return []
     
-    def get_password_by_id(self, password_id):
+    def get_password_by_id(self, usuario, password_id):
         """
-        READ - Busca uma senha específica por ID
+        READ - Busca uma senha específica do usuário por ID
         
         Args:
+            usuario (str): Dono da senha (senhas de outros usuários não são devolvidas)
             password_id (str): ID da senha
-            
+        
         Returns:
             dict: Documento da senha ou None
         """
         try:
-            senha = self.collection.find_one({'_id': ObjectId(password_id)})
+            # O documento pode ainda não ter sido convertido para o formato compacto
+            self._ensure_document_migrated(ObjectId(password_id))
+            documento = self.collection.find_one(self._owned_filter(usuario, password_id))
             
-            if senha:
-                senha['_id'] = str(senha['_id'])
-                print(f"✅ Senha encontrada: {senha['nome']}")
+            if documento:
+                senha = decode_document(documento)
+                logger.debug("✅ Senha encontrada: %s", senha['nome'])
                 return senha
             else:
-                print(f"⚠️ Senha com ID {password_id} não encontrada")
+                logger.warning("⚠️ Senha com ID %s não encontrada", password_id)
                 return None
-                
+        
         except Exception as e:
-            print(f"❌ Erro ao buscar senha: {e}")
+            logger.error("❌ Erro ao buscar senha: %s", e)
             return None
     
-    def update_password(self, password_id, novo_nome, nova_senha):
+    def update_password(self, usuario, password_id, novo_nome, nova_senha, impressao=None, expected_version=None):
         """
-        UPDATE - Atualiza uma senha existente
+        UPDATE - Atualiza uma senha do usuário e devolve o documento já alterado
+        
+        Uma única ida ao servidor (find_one_and_update) filtra pelo dono e,
+        se informada, pela versão lida pelo chamador, e incrementa a versão.
+        O retorno permite corrigir listagens locais sem nova consulta.
         
         Args:
+            usuario (str): Dono da senha
             password_id (str): ID da senha a ser atualizada
             novo_nome (str): Novo nome/serviço
             nova_senha (str): Nova senha criptografada
-            
+            impressao (bytes): Impressão digital da nova senha
+            expected_version (int): Versão lida pelo chamador (None = sem verificação)
+        
         Returns:
-            bool: True se atualizado com sucesso, False caso contrário
+            dict: Documento atualizado ou None se a senha não existe (ou é de outro usuário)
+        
+        Raises:
+            VersionConflict: Se a senha foi alterada desde a leitura
         """
         try:
-            resultado = self.collection.update_one(
-                {'_id': ObjectId(password_id)},
-                {
-                    '$set': {
-                        'nome': novo_nome,
-                        'senha': nova_senha,
-                        'data_atualizacao': datetime.now()
-                    }
-                }
+            self._ensure_document_migrated(ObjectId(password_id))
+            documento = self.collection.find_one_and_update(
+                self._owned_filter(usuario, password_id, expected_version),
+                self._update_operation(novo_nome, nova_senha, impressao),
+                return_document=ReturnDocument.AFTER
             )
             
-            if resultado.modified_count > 0:
-                print(f"✅ Senha atualizada com sucesso!")
-                return True
-            else:
-                print(f"⚠️ Nenhuma senha foi modificada (ID pode não existir)")
-                return False
-                
+            if documento:
+                logger.debug("✅ Senha atualizada com sucesso!")
+                AUDIT.record('update_password', usuario, password_id=password_id, versao=documento.get(CAMPOS['versao']))
+                return decode_document(documento)
+            
+            self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi modificada (ID pode não existir)")
+            return None
+        
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
         except Exception as e:
-            print(f"❌ Erro ao atualizar senha: {e}")
-            return False
+            logger.error("❌ Erro ao atualizar senha: %s", e)
+            return None
     
-    def delete_password(self, password_id):
+    def delete_password(self, usuario, password_id, expected_version=None):
         """
-        DELETE - Remove uma senha do banco
+        DELETE - Remove uma senha do usuário
+        
+        O documento vira uma lápide (sem o texto cifrado) para que a
+        sincronização incremental informe a exclusão, então a remoção é um
+        find_one_and_update (uma ida, filtrada pelo dono e pela versão) e
+        não um find_one_and_delete; lápides antigas são apagadas de vez por
+        compact_tombstones.
         
         Args:
+            usuario (str): Dono da senha
             password_id (str): ID da senha a ser removida
+            expected_version (int): Versão lida pelo chamador (None = sem verificação)
+        
+        Returns:
+            dict: Lápide ('_id', 'nome', 'excluido', 'versao'...) ou None se a senha não existe
+        
+        Raises:
+            VersionConflict: Se a senha foi alterada desde a leitura
+        """
+        try:
+            self._ensure_document_migrated(ObjectId(password_id))
+            documento = self.collection.find_one_and_update(
+                self._owned_filter(usuario, password_id, expected_version),
+                self._tombstone_update(),
+                return_document=ReturnDocument.AFTER
+            )
+            
+            if documento:
+                logger.debug("✅ Senha excluída com sucesso!")
+                AUDIT.record('delete_password', usuario, password_id=password_id, versao=documento.get(CAMPOS['versao']))
+                return decode_document(documento)
             
+            self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi excluída (ID pode não existir)")
+            return None
+        
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except Exception as e:
+            logger.error("❌ Erro ao excluir senha: %s", e)
+            return None
+    
+    def delete_user_passwords(self, usuario):
+        """
+        DELETE - Apaga definitivamente todas as entradas de um usuário (inclusive lápides)
+        
+        Args:
+            usuario (str): Nome do usuário
+        
         Returns:
-            bool: True se removido com sucesso, False caso contrário
+            int: Quantidade de documentos removidos
         """
         try:
-            resultado = self.collection.delete_one({'_id': ObjectId(password_id)})
+            resultado = self.collection.delete_many({'$or': [{CAMPOS['usuario']: usuario}, {'usuario': usuario}]})
+            return resultado.deleted_count
+        
+        except Exception as e:
+            logger.error("❌ Erro ao remover senhas do usuário: %s", e)
+            return 0
+    
+    def changes_since(self, usuario, checkpoint=None, limit=500, settle_seconds=2):
+        """
+        SYNC - Lista as entradas criadas, alteradas ou excluídas após um checkpoint
+        
+        Percorre o índice (usuario, data_atualizacao, _id) a partir do
+        checkpoint. Alterações dos últimos settle_seconds ficam para a próxima
+        chamada, para não pular escritas concorrentes ainda em andamento.
+        
+        Args:
+            usuario (str): Nome do usuário
+            checkpoint (str): Checkpoint devolvido pela chamada anterior (None = tudo)
+            limit (int): Quantidade máxima de alterações devolvidas
+            settle_seconds (int): Atraso aplicado às alterações mais recentes
+        
+        Returns:
+            dict: {'changes': documentos (lápides com 'excluido': True),
+                   'checkpoint': novo checkpoint, 'has_more': bool,
+                   'reset': True se o checkpoint é anterior às lápides retidas
+                   e o cliente precisa recarregar o cofre inteiro}
+        """
+        try:
+            self._ensure_migrated(usuario)
+            filtro, ultima_data = self._changes_filter(usuario, checkpoint, settle_seconds)
             
-            if resultado.deleted_count > 0:
-                print(f"✅ Senha excluída com sucesso!")
-                return True
-            else:
-                print(f"⚠️ Nenhuma senha foi excluída (ID pode não existir)")
-                return False
-                
+            # Lápides anteriores ao horizonte já foram compactadas
+            if ultima_data:
+                horizonte = self.db['sincronizacao'].find_one({'_id': 'lapides'})
+                if horizonte and ultima_data < horizonte['horizonte']:
+                    return {'changes': [], 'checkpoint': None, 'has_more': False, 'reset': True}
+            
+            documentos = list(
+                self.collection.find(filtro, {CAMPOS['nome_busca']: 0})
+                .sort(INDICE_USUARIO_ATUALIZACAO[1:])
+                .limit(limit + 1)
+            )
+            
+            return self._changes_result(documentos, checkpoint, limit)
+        
         except Exception as e:
-            print(f"❌ Erro ao excluir senha: {e}")
-            return False
+            logger.error("❌ Erro ao buscar alterações: %s", e)
+            return {'changes': [], 'checkpoint': checkpoint, 'has_more': False, 'reset': False}
+    
+    def compact_tombstones(self, retention=None):
+        """
+        Apaga definitivamente as lápides mais antigas que a retenção
+        
+        Args:
+            retention (timedelta): Retenção (padrão: TOMBSTONE_RETENTION_DAYS)
+        
+        Returns:
+            int: Quantidade de lápides removidas
+        """
+        try:
+            horizonte = utc_now() - (self.tombstone_retention if retention is None else retention)
+            
+            # O horizonte é gravado antes da remoção: checkpoints anteriores
+            # a ele passam a exigir recarga completa
+            self.db['sincronizacao'].update_one(
+                {'_id': 'lapides'},
+                {'$max': {'horizonte': horizonte}},
+                upsert=True
+            )
+            resultado = self.collection.delete_many(
+                {CAMPOS['excluido']: True, CAMPOS['data_atualizacao']: {'$lt': horizonte}}
+            )
+            
+            if resultado.deleted_count:
+                logger.info("✅ %s lápide(s) compactada(s)", resultado.deleted_count)
+            return resultado.deleted_count
+        
+        except Exception as e:
+            logger.error("❌ Erro ao compactar lápides: %s", e)
+            return 0
+    
+    def _compaction_loop(self, interval):
+        """Executa compact_tombstones a cada interval segundos até o fechamento"""
+        while not self._compaction_stop.wait(interval):
+            self.compact_tombstones()
     
     def close_connection(self):
         """Fecha a conexão com o MongoDB"""
         try:
             self.client.close()
-            print("✅ Conexão com MongoDB fechada")
+            self._compaction_stop.set()
+            logger.info("✅ Conexão com MongoDB fechada")
         except Exception as e:
-            print(f"❌ Erro ao fechar conexão: {e}")
+            logger.error("❌ Erro ao fechar conexão: %s", e)
     
     def __del__(self):
         """Destrutor para garantir que a conexão seja fechada"""
-        self.close_connection()
\ No newline at end of file
+        self.close_connection()
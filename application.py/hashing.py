@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def split_hash(stored_hash):
+    """
+    Separa um hash codificado nos campos guardados no registro do usuário
+
+    Args:
+        stored_hash (str): Hash no formato de PasswordHasher.hash (ou SHA256 antigo)
+
+    Returns:
+        dict: Campos 'kdf', 'kdf_params', 'salt' e 'password_hash'
+    """
+    if not stored_hash.startswith('scrypt$'):
+        return {'kdf': 'sha256', 'kdf_params': '', 'salt': '', 'password_hash': stored_hash}
+
+    _, n, r, p, salt, digest = stored_hash.split('$')
+    return {
+        'kdf': 'scrypt',
+        'kdf_params': f'n={n},r={r},p={p}',
+        'salt': salt,
+        'password_hash': digest
+    }
+
+
+def join_hash(fields):
+    """
+    Reconstrói o hash codificado a partir dos campos de split_hash
+
+    Args:
+        fields (dict): Campos do registro do usuário
+
+    Returns:
+        str: Hash no formato aceito por PasswordHasher.verify
+    """
+    if fields['kdf'] != 'scrypt':
+        return fields['password_hash']
+
+    params = dict(item.split('=') for item in fields['kdf_params'].split(','))
+    return '$'.join(['scrypt', params['n'], params['r'], params['p'], fields['salt'], fields['password_hash']])
+
+
+class HashingQueueFull(Exception):
+    """Fila do pool de hashing cheia: a requisição deve ser recusada"""
+
+
+class PasswordHasher:
+    def __init__(self, n=2 ** 14, r=8, p=1, max_workers=4, max_queue=64):
+        """
+        Hash de senhas de autenticação com scrypt em um pool de threads limitado
+
+        O scrypt do hashlib libera o GIL, então as threads do pool calculam
+        hashes em paralelo sem travar a thread do script do Streamlit. O número
+        de hashes em execução + aguardando é limitado; acima disso a chamada
+        falha na hora com HashingQueueFull em vez de acumular trabalho.
+
+        Args:
+            n, r, p (int): Parâmetros de custo do scrypt
+            max_workers (int): Hashes calculados em paralelo
+            max_queue (int): Hashes que podem aguardar por uma thread livre
+        """
+        self.n = n
+        self.r = r
+        self.p = p
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hash')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._in_flight = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Cria o hasher com parâmetros vindos das variáveis de ambiente"""
+        return cls(
+            n=int(os.getenv('AUTH_SCRYPT_N', 2 ** 14)),
+            r=int(os.getenv('AUTH_SCRYPT_R', 8)),
+            p=int(os.getenv('AUTH_SCRYPT_P', 1)),
+            max_workers=int(os.getenv('AUTH_HASH_WORKERS', 4)),
+            max_queue=int(os.getenv('AUTH_HASH_MAX_QUEUE', 64))
+        )
+
+    def _submit(self, func, *args):
+        """Envia func ao pool, respeitando o limite de fila, e mede a latência"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingQueueFull("Muitas requisições de autenticação simultâneas")
+
+        inicio = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+
+        def concluir(_):
+            self._slots.release()
+            with self._lock:
+                self._in_flight -= 1
+                self._latencies.append(time.perf_counter() - inicio)
+
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            concluir(None)
+            raise
+        future.add_done_callback(concluir)
+        return future
+
+    def _run(self, func, *args):
+        """Executa func no pool e aguarda o resultado (bloqueando a thread atual)"""
+        return self._submit(func, *args).result()
+
+    async def _run_async(self, func, *args):
+        """Executa func no pool e aguarda o resultado sem bloquear o event loop"""
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r + 1024 * 1024, dklen=32
+        )
+
+    @classmethod
+    def _hash_job(cls, password, n, r, p):
+        """Calcula o hash codificado (executado em uma thread do pool)"""
+        salt = os.urandom(16)
+        digest = cls._scrypt(password, salt, n, r, p)
+        return '$'.join([
+            'scrypt', str(n), str(r), str(p),
+            base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+        ])
+
+    @classmethod
+    def _verify_job(cls, password, stored_hash):
+        """Confere a senha com um hash scrypt (executado em uma thread do pool)"""
+        _, n, r, p, salt, digest = stored_hash.split('$')
+        calculado = cls._scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(calculado, base64.b64decode(digest))
+
+    @staticmethod
+    def _verify_legacy(password, stored_hash):
+        """Confere a senha com um hash SHA256 antigo (barato, sem usar o pool)"""
+        legado = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legado, stored_hash)
+
+    def hash(self, password):
+        """
+        Gera o hash de uma senha
+
+        Args:
+            password (str): Senha em texto plano
+
+        Returns:
+            str: Hash no formato 'scrypt$n$r$p$salt$hash' (salt e hash em base64)
+        """
+        return self._run(self._hash_job, password, self.n, self.r, self.p)
+
+    async def hash_async(self, password):
+        """Versão assíncrona de hash"""
+        return await self._run_async(self._hash_job, password, self.n, self.r, self.p)
+
+    def verify(self, password, stored_hash):
+        """
+        Confere uma senha com o hash armazenado
+
+        Aceita também o formato antigo (SHA256 sem salt, em hexadecimal).
+
+        Args:
+            password (str): Senha em texto plano
+            stored_hash (str): Hash armazenado
+
+        Returns:
+            bool: True se a senha confere
+        """
+        if not stored_hash.startswith('scrypt$'):
+            return self._verify_legacy(password, stored_hash)
+        return self._run(self._verify_job, password, stored_hash)
+
+    async def verify_async(self, password, stored_hash):
+        """Versão assíncrona de verify"""
+        if not stored_hash.startswith('scrypt$'):
+            return self._verify_legacy(password, stored_hash)
+        return await self._run_async(self._verify_job, password, stored_hash)
+
+    def needs_rehash(self, stored_hash):
+        """
+        Indica se o hash armazenado usa um formato ou custo diferente do atual
+
+        Args:
+            stored_hash (str): Hash armazenado
+
+        Returns:
+            bool: True se o hash deve ser regenerado no próximo login
+        """
+        if not stored_hash.startswith('scrypt$'):
+            return True
+        _, n, r, p, _, _ = stored_hash.split('$')
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    def stats(self):
+        """
+        Estatísticas de latência do hashing (espera na fila + cálculo)
+
+        Returns:
+            dict: Quantidade de amostras, p50/p95/p99/máximo em ms, em execução e recusados
+        """
+        with self._lock:
+            amostras = sorted(self._latencies)
+            in_flight = self._in_flight
+            rejected = self.rejected
+
+        def percentil(q):
+            if not amostras:
+                return 0.0
+            return amostras[min(len(amostras) - 1, int(q * len(amostras)))] * 1000
+
+        return {
+            'count': len(amostras),
+            'p50_ms': percentil(0.50),
+            'p95_ms': percentil(0.95),
+            'p99_ms': percentil(0.99),
+            'max_ms': amostras[-1] * 1000 if amostras else 0.0,
+            'in_flight': in_flight,
+            'rejected': rejected
+        }
+
+    def shutdown(self):
+        """Encerra as threads do pool"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import string
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.fernet import Fernet
+
+from benchmark import memory_backends, percentile
+from crypto import VaultCrypto
+from observability import configure_logging
+
+# Peso de cada operação na carga mista (a navegação predomina, como no uso real)
+MIX = {
+    'list_page': 40,
+    'search': 20,
+    'get': 15,
+    'create': 10,
+    'update': 8,
+    'authenticate': 5,
+    'delete': 2
+}
+
+# Prefixo dos usuários criados pelo teste de carga (removidos ao final)
+PREFIXO = 'load-'
+
+# Senha mestra dos usuários virtuais
+SENHA = 'senha-de-carga'
+
+# Loggers dos gerenciadores: um registro ERROR durante a chamada marca a chamada como falha
+LOGGERS = ('database', 'auth', 'async_database', 'async_auth')
+
+# Registros de erro da chamada em andamento (por thread/tarefa)
+_falhas = contextvars.ContextVar('falhas', default=None)
+
+
+class _CallErrors(logging.Filter):
+    """Anota os registros ERROR na lista da chamada em andamento"""
+
+    def filter(self, record):
+        falhas = _falhas.get()
+        if falhas is not None and record.levelno >= logging.ERROR:
+            falhas.append(record.getMessage())
+        return True
+
+
+def _watch_errors():
+    for nome in LOGGERS:
+        logger = logging.getLogger(nome)
+        if not any(isinstance(f, _CallErrors) for f in logger.filters):
+            logger.addFilter(_CallErrors())
+
+
+# Uma chamada dá certo se não registrou erro e o retorno não indica falha
+def _succeeded(operacao, resultado):
+    if operacao in ('list_page', 'search'):
+        return True
+    return bool(resultado)
+
+
+class VirtualUser:
+    def __init__(self, indice, run_id, vault_size, think_time, seed):
+        """
+        Estado de um usuário simulado: nome, senhas conhecidas e gerador aleatório
+
+        Args:
+            indice (int): Número do usuário na execução
+            run_id (str): ID da execução (isola os dados de execuções diferentes)
+            vault_size (int): Entradas criadas no cofre antes da carga
+            think_time (float): Pausa média entre operações, em segundos (distribuição exponencial)
+            seed (int): Semente da execução
+        """
+        self.usuario = f"{PREFIXO}{run_id}-{indice}"
+        self.vault_size = vault_size
+        self.think_time = think_time
+        self.random = random.Random(f"{seed}-{indice}")
+        self.crypto = VaultCrypto(Fernet.generate_key())
+        self.ids = []
+        self.amostras = []
+
+    def name(self):
+        return ''.join(self.random.choices(string.ascii_lowercase, k=10))
+
+    def seed_entries(self):
+        """Entradas do cofre inicial, como pares (nome, senha cifrada)"""
+        token = self.crypto.encrypt('senha')
+        return [(self.name(), token) for _ in range(self.vault_size)]
+
+    def next_operation(self):
+        """Sorteia a próxima operação segundo MIX (sem alterar entradas se não houver nenhuma)"""
+        operacao = self.random.choices(list(MIX), weights=list(MIX.values()))[0]
+        if operacao in ('get', 'update', 'delete') and not self.ids:
+            return 'create'
+        return operacao
+
+    def pause(self):
+        return self.random.expovariate(1 / self.think_time) if self.think_time else 0
+
+    def operations(self, mongo, redis_auth):
+        """
+        Chamadas de cada operação (funções ou corrotinas, conforme os gerenciadores)
+
+        Returns:
+            dict: Nome da operação -> função sem argumentos
+        """
+        def pick():
+            return self.random.choice(self.ids)
+
+        def remove():
+            return self.ids.pop(self.random.randrange(len(self.ids)))
+
+        return {
+            'list_page': lambda: mongo.list_passwords_page(self.usuario, limit=50),
+            'search': lambda: mongo.search_passwords(self.usuario, self.name()[:2]),
+            'get': lambda: mongo.get_password_by_id(self.usuario, pick()),
+            'create': lambda: mongo.create_password(self.usuario, self.name(), self.crypto.encrypt('nova')),
+            'update': lambda: mongo.update_password(self.usuario, pick(), self.name(), self.crypto.encrypt('alterada')),
+            'authenticate': lambda: redis_auth.authenticate(self.usuario, SENHA),
+            'delete': lambda: mongo.delete_password(self.usuario, remove())
+        }
+
+    def record(self, operacao, inicio, resultado, falhas):
+        ok = not falhas and _succeeded(operacao, resultado)
+        self.amostras.append((operacao, time.perf_counter() - inicio, ok))
+        if ok and operacao == 'create':
+            self.ids.append(resultado)
+
+
+def run_user_sync(usuario, mongo, redis_auth, inicio_em, fim_em):
+    """Executa um usuário virtual até fim_em (modelos thread e process)"""
+    time.sleep(max(0, inicio_em - time.monotonic()))
+    operacoes = usuario.operations(mongo, redis_auth)
+    operacoes['register'] = lambda: redis_auth.register(usuario.usuario, SENHA)
+
+    def chamar(operacao):
+        falhas = []
+        token = _falhas.set(falhas)
+        inicio = time.perf_counter()
+        try:
+            resultado = operacoes[operacao]()
+        except Exception as e:
+            falhas.append(str(e))
+            resultado = None
+        finally:
+            _falhas.reset(token)
+        usuario.record(operacao, inicio, resultado, falhas)
+
+    chamar('register')
+    mongo.bulk_create_passwords(usuario.usuario, usuario.seed_entries())
+    usuario.ids = [pwd['_id'] for pwd in mongo.list_passwords_page(usuario.usuario, limit=100)[0]]
+    chamar('authenticate')
+
+    while time.monotonic() < fim_em:
+        chamar(usuario.next_operation())
+        time.sleep(min(usuario.pause(), max(0, fim_em - time.monotonic())))
+
+
+async def run_user_async(usuario, mongo, redis_auth, inicio_em, fim_em):
+    """Executa um usuário virtual até fim_em (modelo asyncio)"""
+    await asyncio.sleep(max(0, inicio_em - time.monotonic()))
+    operacoes = usuario.operations(mongo, redis_auth)
+    operacoes['register'] = lambda: redis_auth.register(usuario.usuario, SENHA)
+
+    async def chamar(operacao):
+        falhas = []
+        token = _falhas.set(falhas)
+        inicio = time.perf_counter()
+        try:
+            resultado = await operacoes[operacao]()
+        except Exception as e:
+            falhas.append(str(e))
+            resultado = None
+        finally:
+            _falhas.reset(token)
+        usuario.record(operacao, inicio, resultado, falhas)
+
+    await chamar('register')
+    await mongo.bulk_create_passwords(usuario.usuario, usuario.seed_entries())
+    usuario.ids = [pwd['_id'] for pwd in (await mongo.list_passwords_page(usuario.usuario, limit=100))[0]]
+    await chamar('authenticate')
+
+    while time.monotonic() < fim_em:
+        await chamar(usuario.next_operation())
+        await asyncio.sleep(min(usuario.pause(), max(0, fim_em - time.monotonic())))
+
+
+def _cleanup_sync(mongo, redis_auth, usuarios):
+    for usuario in usuarios:
+        mongo.delete_user_passwords(usuario.usuario)
+        redis_auth.delete_user(usuario.usuario)
+
+
+def _run_threads(usuarios, ramp_up, duration):
+    """Um thread por usuário virtual, compartilhando os gerenciadores (do STORAGE_BACKEND)"""
+    from storage import create_stores
+
+    mongo, redis_auth = create_stores()
+    agora = time.monotonic()
+    fim_em = agora + ramp_up + duration
+    threads = [
+        threading.Thread(
+            target=run_user_sync,
+            args=(usuario, mongo, redis_auth, agora + ramp_up * i / len(usuarios), fim_em),
+            daemon=True
+        )
+        for i, usuario in enumerate(usuarios)
+    ]
+
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        _cleanup_sync(mongo, redis_auth, usuarios)
+        mongo.close_connection()
+        redis_auth.close_connection()
+
+    return [amostra for usuario in usuarios for amostra in usuario.amostras]
+
+
+def _process_worker(usuarios, ramp_up, duration, inicio_em):
+    """Executa em um processo do pool a sua parte dos usuários (em threads)"""
+    configure_logging('ERROR')
+    _watch_errors()
+    # Alinha o relógio do processo com o início comum da execução
+    time.sleep(max(0, inicio_em - time.time()))
+    return _run_threads(usuarios, ramp_up, duration)
+
+
+def _run_processes(usuarios, ramp_up, duration, processes):
+    """Usuários divididos entre processos; cada processo tem seus próprios gerenciadores"""
+    inicio_em = time.time() + 1
+    partes = [usuarios[i::processes] for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futuros = [pool.submit(_process_worker, parte, ramp_up, duration, inicio_em) for parte in partes if parte]
+        return [amostra for futuro in futuros for amostra in futuro.result()]
+
+
+async def _run_asyncio(usuarios, ramp_up, duration):
+    """Uma tarefa por usuário virtual em um único event loop"""
+    from async_auth import AsyncRedisAuth
+    from async_database import AsyncMongoDBManager
+
+    mongo = await AsyncMongoDBManager.create(max_pool_size=len(usuarios))
+    redis_auth = await AsyncRedisAuth.create(max_connections=len(usuarios) * 2)
+
+    agora = time.monotonic()
+    fim_em = agora + ramp_up + duration
+    try:
+        await asyncio.gather(*(
+            run_user_async(usuario, mongo, redis_auth, agora + ramp_up * i / len(usuarios), fim_em)
+            for i, usuario in enumerate(usuarios)
+        ))
+    finally:
+        from database import CAMPOS
+        await mongo.collection.delete_many({CAMPOS['usuario']: {'$in': [u.usuario for u in usuarios]}})
+        for usuario in usuarios:
+            await redis_auth.delete_user(usuario.usuario)
+        mongo.close_connection()
+        await redis_auth.close_connection()
+
+    return [amostra for usuario in usuarios for amostra in usuario.amostras]
+
+
+def report(amostras, duracao):
+    """
+    Resume as amostras por operação
+
+    Args:
+        amostras (list): Tuplas (operação, duração em segundos, sucesso)
+        duracao (float): Duração total da execução, em segundos
+
+    Returns:
+        dict: Operação (e 'total') -> count, errors, error_rate, ops_per_sec, p50_ms, p95_ms, p99_ms
+    """
+    por_operacao = {}
+    for operacao, segundos, ok in amostras:
+        por_operacao.setdefault(operacao, []).append((segundos, ok))
+    por_operacao['total'] = [(segundos, ok) for _, segundos, ok in amostras]
+
+    relatorio = {}
+    for operacao, valores in sorted(por_operacao.items()):
+        if not valores:
+            continue
+        latencias = [segundos for segundos, _ in valores]
+        erros = sum(1 for _, ok in valores if not ok)
+        relatorio[operacao] = {
+            'count': len(valores),
+            'errors': erros,
+            'error_rate': erros / len(valores),
+            'ops_per_sec': len(valores) / duracao,
+            'p50_ms': percentile(latencias, 0.5) * 1000,
+            'p95_ms': percentile(latencias, 0.95) * 1000,
+            'p99_ms': percentile(latencias, 0.99) * 1000
+        }
+    return relatorio
+
+
+def run_load(model='thread', users=100, duration=60, ramp_up=10, think_time=1.0, vault_size=100,
+             processes=None, backend='local', seed=42):
+    """
+    Executa uma carga mista de usuários virtuais
+
+    Cada usuário se registra, cria o cofre inicial, faz login e repete
+    operações sorteadas segundo MIX, com pausas entre elas, até o fim da
+    duração. Os dados criados são removidos ao final.
+
+    Args:
+        model (str): 'thread', 'process' ou 'asyncio'
+        users (int): Usuários virtuais
+        duration (float): Duração da carga após a rampa, em segundos
+        ramp_up (float): Intervalo em que os usuários vão sendo iniciados, em segundos
+        think_time (float): Pausa média entre operações de um usuário, em segundos
+        vault_size (int): Entradas no cofre de cada usuário antes da carga
+        processes (int): Processos do modelo 'process' (padrão: nº de CPUs)
+        backend (str): 'local' (STORAGE_BACKEND: MONGODB_URI e REDIS_*, ou SQLITE_PATH nos modelos
+            'thread' e 'process') ou 'memory' (só no modelo 'thread'; o mongomock não é
+            thread-safe, então serve para testar a ferramenta, não para medir)
+        seed (int): Semente dos sorteios
+
+    Returns:
+        dict: {'config': parâmetros, 'duration': segundos, 'results': ver report}
+    """
+    if backend == 'memory' and model != 'thread':
+        raise ValueError("O backend em memória só existe dentro de um processo: use o modelo 'thread'")
+
+    _watch_errors()
+    run_id = uuid.uuid4().hex[:8]
+    usuarios = [VirtualUser(i, run_id, vault_size, think_time, seed) for i in range(users)]
+
+    inicio = time.perf_counter()
+    if model == 'process':
+        amostras = _run_processes(usuarios, ramp_up, duration, processes or os.cpu_count() or 2)
+    elif model == 'asyncio':
+        amostras = asyncio.run(_run_asyncio(usuarios, ramp_up, duration))
+    elif backend == 'memory':
+        with memory_backends():
+            amostras = _run_threads(usuarios, ramp_up, duration)
+    else:
+        amostras = _run_threads(usuarios, ramp_up, duration)
+    duracao = time.perf_counter() - inicio
+
+    return {
+        'config': {
+            'model': model, 'users': users, 'duration': duration, 'ramp_up': ramp_up,
+            'think_time': think_time, 'vault_size': vault_size, 'backend': backend
+        },
+        'duration': duracao,
+        'results': report(amostras, duracao)
+    }
+
+
+def format_report(relatorio):
+    """Tabela de texto do relatório"""
+    linhas = [f"{'operação':<14}{'ops':>8}{'ops/s':>10}{'erros':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for operacao, r in relatorio.items():
+        linhas.append(
+            f"{operacao:<14}{r['count']:>8}{r['ops_per_sec']:>10.1f}{r['error_rate']:>8.1%}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+        )
+    return "\n".join(linhas)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teste de carga com usuários virtuais do gerenciador de senhas")
+    parser.add_argument('--model', choices=['thread', 'process', 'asyncio'], default='thread', help="Modelo de concorrência")
+    parser.add_argument('--users', type=int, default=100, help="Usuários virtuais")
+    parser.add_argument('--duration', type=float, default=60, help="Duração da carga (s), após a rampa")
+    parser.add_argument('--ramp-up', type=float, default=10, help="Tempo para iniciar todos os usuários (s)")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Pausa média entre operações (s)")
+    parser.add_argument('--vault-size', type=int, default=100, help="Entradas no cofre de cada usuário")
+    parser.add_argument('--processes', type=int, default=None, help="Processos do modelo 'process'")
+    parser.add_argument('--backend', choices=['local', 'memory'], default='local',
+                        help="local: MONGODB_URI e REDIS_HOST/REDIS_PORT; memory: mongomock/fakeredis (modelo thread, só para testes)")
+    parser.add_argument('--seed', type=int, default=42, help="Semente dos sorteios")
+    parser.add_argument('--json', help="Arquivo para gravar o relatório em JSON")
+    args = parser.parse_args()
+
+    configure_logging('ERROR')
+    try:
+        resultado = run_load(
+            args.model, args.users, args.duration, args.ramp_up, args.think_time,
+            args.vault_size, args.processes, args.backend, args.seed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"✅ {args.users} usuário(s), modelo {args.model}, {resultado['duration']:.1f} s")
+    print(format_report(resultado['results']))
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+    sys.exit(1 if resultado['results'].get('total', {}).get('error_rate') else 0)
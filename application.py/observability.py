@@ -0,0 +1,404 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Operação instrumentada em execução (componente, operação), para atribuir os erros registrados
+_operacao_atual = contextvars.ContextVar('operacao_atual', default=None)
+
+# Exceções tratadas e registradas como erro no bloco de captured_errors em curso
+_erros_capturados = contextvars.ContextVar('erros_capturados', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        """
+        Histograma de latências com buckets fixos (formato do Prometheus)
+
+        Registrar uma amostra custa uma busca binária e um incremento, sem
+        guardar as amostras; os percentis são estimados pelos buckets.
+
+        Args:
+            buckets (tuple): Limites superiores dos buckets, em ordem crescente
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, valor):
+        """Registra uma amostra (em segundos)"""
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            self.counts[indice] += 1
+            self.sum += valor
+            self.count += 1
+
+    def quantile(self, q):
+        """
+        Estima um percentil interpolando dentro do bucket (como histogram_quantile)
+
+        Args:
+            q (float): Percentil entre 0 e 1 (ex.: 0.99)
+
+        Returns:
+            float: Latência estimada em segundos, ou None sem amostras
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+
+        alvo = q * total
+        acumulado = 0
+        for indice, quantidade in enumerate(counts):
+            if acumulado + quantidade >= alvo and quantidade:
+                if indice == len(self.buckets):
+                    return self.buckets[-1]
+                inicio = self.buckets[indice - 1] if indice else 0.0
+                return inicio + (self.buckets[indice] - inicio) * (alvo - acumulado) / quantidade
+            acumulado += quantidade
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=BUCKETS):
+        """
+        Latências e erros por operação, rotulados por componente (mongodb, redis...)
+
+        Args:
+            buckets (tuple): Limites dos buckets dos histogramas
+        """
+        self.buckets = buckets
+        self._latencias = {}
+        self._erros = {}
+        self._leituras = {}
+        self._lock = threading.Lock()
+
+    def observe(self, componente, operacao, segundos):
+        """Registra a duração de uma chamada"""
+        chave = (componente, operacao)
+        histograma = self._latencias.get(chave)
+        if histograma is None:
+            with self._lock:
+                histograma = self._latencias.setdefault(chave, Histogram(self.buckets))
+        histograma.observe(segundos)
+
+    def record_error(self, componente, operacao):
+        """Conta um erro de uma operação"""
+        chave = (componente, operacao)
+        with self._lock:
+            self._erros[chave] = self._erros.get(chave, 0) + 1
+
+    def register_reading(self, nome, descricao, funcao, tipo='gauge'):
+        """
+        Registra uma métrica lida só na exposição (ex.: tamanho de uma fila)
+
+        O valor vem de `funcao` a cada coleta, sem custo no caminho das
+        operações; registrar o mesmo nome de novo substitui a leitura.
+
+        Args:
+            nome (str): Nome da métrica no Prometheus (ex.: vault_audit_queue_depth)
+            descricao (str): Texto do HELP
+            funcao (callable): Devolve o valor atual
+            tipo (str): 'gauge' ou 'counter'
+        """
+        with self._lock:
+            self._leituras[nome] = (descricao, tipo, funcao)
+
+    def readings(self):
+        """
+        Valores atuais das métricas registradas com register_reading
+
+        Returns:
+            dict: Nome -> valor (leituras que falharem ficam de fora)
+        """
+        with self._lock:
+            leituras = sorted(self._leituras.items())
+
+        valores = {}
+        for nome, (_, _, funcao) in leituras:
+            try:
+                valores[nome] = funcao()
+            except Exception:
+                continue
+        return valores
+
+    def snapshot(self):
+        """
+        Resumo das métricas por operação
+
+        Returns:
+            dict: (componente, operação) -> {'count', 'errors', 'avg', 'p50', 'p99'} (segundos)
+        """
+        with self._lock:
+            latencias = dict(self._latencias)
+            erros = dict(self._erros)
+
+        resumo = {}
+        for chave in set(latencias) | set(erros):
+            histograma = latencias.get(chave)
+            count = histograma.count if histograma else 0
+            resumo[chave] = {
+                'count': count,
+                'errors': erros.get(chave, 0),
+                'avg': histograma.sum / count if count else None,
+                'p50': histograma.quantile(0.5) if histograma else None,
+                'p99': histograma.quantile(0.99) if histograma else None
+            }
+        return resumo
+
+    def render_prometheus(self):
+        """
+        Exposição das métricas no formato texto do Prometheus
+
+        Returns:
+            str: Métricas vault_operation_duration_seconds e vault_operation_errors_total
+        """
+        with self._lock:
+            latencias = sorted(self._latencias.items())
+            erros = sorted(self._erros.items())
+
+        linhas = [
+            "# HELP vault_operation_duration_seconds Duração das operações instrumentadas",
+            "# TYPE vault_operation_duration_seconds histogram"
+        ]
+        for (componente, operacao), histograma in latencias:
+            rotulos = f'component="{componente}",operation="{operacao}"'
+            with histograma._lock:
+                counts, soma, total = list(histograma.counts), histograma.sum, histograma.count
+
+            acumulado = 0
+            for limite, quantidade in zip(histograma.buckets, counts):
+                acumulado += quantidade
+                linhas.append(f'vault_operation_duration_seconds_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'vault_operation_duration_seconds_bucket{{{rotulos},le="+Inf"}} {total}')
+            linhas.append(f'vault_operation_duration_seconds_sum{{{rotulos}}} {soma}')
+            linhas.append(f'vault_operation_duration_seconds_count{{{rotulos}}} {total}')
+
+        linhas += [
+            "# HELP vault_operation_errors_total Erros registrados pelas operações instrumentadas",
+            "# TYPE vault_operation_errors_total counter"
+        ]
+        for (componente, operacao), quantidade in erros:
+            linhas.append(f'vault_operation_errors_total{{component="{componente}",operation="{operacao}"}} {quantidade}')
+
+        valores = self.readings()
+        with self._lock:
+            leituras = dict(self._leituras)
+        for nome, valor in valores.items():
+            descricao, tipo, _ = leituras[nome]
+            linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} {tipo}", f"{nome} {valor}"]
+
+        return "\n".join(linhas) + "\n"
+
+
+# Registro padrão do processo
+REGISTRY = MetricsRegistry()
+
+
+class _ErrorCounter(logging.Filter):
+    """Conta os registros de nível ERROR na operação instrumentada em execução"""
+
+    def __init__(self, registry):
+        super().__init__()
+        self.registry = registry
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            componente, operacao = _operacao_atual.get() or (record.name, record.funcName)
+            self.registry.record_error(componente, operacao)
+
+            capturados = _erros_capturados.get()
+            if capturados is not None:
+                excecao = record.exc_info[1] if record.exc_info else sys.exc_info()[1]
+                if excecao is not None:
+                    capturados.append(excecao)
+        return True
+
+
+@contextmanager
+def captured_errors():
+    """
+    Coleta as exceções que os métodos tratam e registram como erro no bloco
+
+    Os gerenciadores não propagam as exceções dos drivers (registram o erro e
+    devolvem None/False/[]); dentro do bloco, a exceção em tratamento a cada
+    registro de nível ERROR é guardada para o chamador poder classificá-la.
+
+    Yields:
+        list: Exceções registradas durante o bloco
+    """
+    capturados = []
+    token = _erros_capturados.set(capturados)
+    try:
+        yield capturados
+    finally:
+        _erros_capturados.reset(token)
+
+
+def get_logger(nome, registry=REGISTRY):
+    """
+    Logger de um módulo, com contagem de erros por operação
+
+    Os métodos tratam as exceções e registram um erro em vez de propagá-las;
+    o filtro conta cada registro de nível ERROR como erro da operação em curso.
+
+    Args:
+        nome (str): Nome do logger (normalmente __name__)
+        registry (MetricsRegistry): Registro que recebe os erros
+
+    Returns:
+        logging.Logger: Logger configurado
+    """
+    logger = logging.getLogger(nome)
+    if not any(isinstance(f, _ErrorCounter) for f in logger.filters):
+        logger.addFilter(_ErrorCounter(registry))
+    return logger
+
+
+def _timed(func, componente, registry):
+    """Envolve uma função (ou corrotina) medindo a duração de cada chamada"""
+    operacao = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _operacao_atual.set((componente, operacao))
+            inicio = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                registry.observe(componente, operacao, time.perf_counter() - inicio)
+                _operacao_atual.reset(token)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _operacao_atual.set((componente, operacao))
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(componente, operacao, time.perf_counter() - inicio)
+                _operacao_atual.reset(token)
+
+    return wrapper
+
+
+def instrumented(componente, registry=REGISTRY):
+    """
+    Decorador de classe: mede a latência de todos os métodos públicos
+
+    Geradores (ex.: iter_passwords) não são medidos, pois a chamada só cria
+    o iterador; o tempo de cada lote aparece nos métodos que os consomem.
+
+    Args:
+        componente (str): Rótulo do componente (ex.: 'mongodb', 'redis')
+        registry (MetricsRegistry): Registro das métricas
+
+    Returns:
+        callable: Decorador que devolve a própria classe
+    """
+    def decorar(cls):
+        for nome, atributo in list(vars(cls).items()):
+            if (
+                nome.startswith('_')
+                or not inspect.isfunction(atributo)
+                or inspect.isgeneratorfunction(atributo)
+                or inspect.isasyncgenfunction(atributo)
+            ):
+                continue
+            setattr(cls, nome, _timed(atributo, componente, registry))
+        return cls
+
+    return decorar
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como um objeto JSON por linha"""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        operacao = _operacao_atual.get()
+        if operacao:
+            evento['component'], evento['operation'] = operacao
+        if record.exc_info:
+            evento['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False)
+
+
+def configure_logging(level=None, formato=None):
+    """
+    Configura o logging do processo
+
+    Args:
+        level (str): Nível mínimo (padrão: LOG_LEVEL ou INFO)
+        formato (str): 'text' ou 'json' (padrão: LOG_FORMAT ou text)
+    """
+    handler = logging.StreamHandler()
+    if (formato or os.getenv('LOG_FORMAT', 'text')) == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logging.basicConfig(level=(level or os.getenv('LOG_LEVEL', 'INFO')).upper(), handlers=[handler], force=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        corpo = self.registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None, host='0.0.0.0', registry=REGISTRY):
+    """
+    Serve /metrics (formato do Prometheus) em uma thread em segundo plano
+
+    Args:
+        port (int): Porta HTTP (padrão: METRICS_PORT; sem ela, nada é iniciado)
+        host (str): Endereço de escuta
+        registry (MetricsRegistry): Registro exposto
+
+    Returns:
+        ThreadingHTTPServer: Servidor iniciado ou None se não configurado
+    """
+    port = port or int(os.getenv('METRICS_PORT', 0))
+    if not port:
+        return None
+
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    servidor = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    logging.getLogger(__name__).info("✅ Métricas disponíveis em http://%s:%s/metrics", host, port)
+    return servidor
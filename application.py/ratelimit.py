@@ -0,0 +1,237 @@
+import os
+
+# Consome uma ficha do balde de cada identidade (usuário e cliente), a menos
+# que alguma esteja bloqueada ou sem fichas. Definida como função Lua para que
+# o login a execute no mesmo script que lê o usuário (ver auth.LOGIN_FETCH_SCRIPT).
+# consumir(k, a): KEYS a partir de k são pares (balde, bloqueio) por identidade;
+# ARGV a partir de a são pares (capacidade, fichas por segundo) por identidade
+# Retorno: 0 se liberado, senão milissegundos até a próxima tentativa
+CHECK_FUNCTION = """
+local function consumir(primeira_chave, primeiro_arg)
+    local agora = redis.call('TIME')
+    agora = tonumber(agora[1]) * 1000 + math.floor(tonumber(agora[2]) / 1000)
+
+    local espera = 0
+    local fichas = {}
+
+    for i = primeira_chave, #KEYS, 2 do
+        local bloqueio = redis.call('PTTL', KEYS[i + 1])
+        if bloqueio > espera then
+            espera = bloqueio
+        end
+
+        local j = primeiro_arg + i - primeira_chave
+        local capacidade = tonumber(ARGV[j])
+        local taxa = tonumber(ARGV[j + 1])
+        local balde = redis.call('HMGET', KEYS[i], 'fichas', 'ts')
+        local disponivel = tonumber(balde[1]) or capacidade
+        local ts = tonumber(balde[2]) or agora
+
+        disponivel = math.min(capacidade, disponivel + (agora - ts) * taxa / 1000)
+        if disponivel < 1 then
+            local falta = math.ceil((1 - disponivel) * 1000 / taxa)
+            if falta > espera then
+                espera = falta
+            end
+        end
+        fichas[i] = disponivel
+    end
+
+    if espera > 0 then
+        return espera
+    end
+
+    for i = primeira_chave, #KEYS, 2 do
+        local j = primeiro_arg + i - primeira_chave
+        local capacidade = tonumber(ARGV[j])
+        local taxa = tonumber(ARGV[j + 1])
+        redis.call('HSET', KEYS[i], 'fichas', fichas[i] - 1, 'ts', agora)
+        redis.call('PEXPIRE', KEYS[i], math.ceil(capacidade * 1000 / taxa))
+    end
+    return 0
+end
+"""
+
+# Verificação isolada: KEYS e ARGV são só os pares do limitador
+CHECK_SCRIPT = CHECK_FUNCTION + """
+return consumir(1, 1)
+"""
+
+# Registra uma falha de login; ao atingir o limite, bloqueia a identidade por
+# um tempo que dobra a cada novo bloqueio (lockout progressivo)
+# KEYS: trios (falhas, nível, bloqueio) por identidade
+# ARGV: limite, janela (s), bloqueio base (s), bloqueio máximo (s), memória do nível (s)
+# Retorno: maior bloqueio aplicado, em segundos (0 se nenhum)
+FAIL_SCRIPT = """
+local limite = tonumber(ARGV[1])
+local janela = tonumber(ARGV[2])
+local base = tonumber(ARGV[3])
+local maximo = tonumber(ARGV[4])
+local memoria = tonumber(ARGV[5])
+local aplicado = 0
+
+for i = 1, #KEYS, 3 do
+    local falhas = redis.call('INCR', KEYS[i])
+    if falhas == 1 then
+        redis.call('EXPIRE', KEYS[i], janela)
+    end
+
+    if falhas >= limite then
+        local nivel = redis.call('INCR', KEYS[i + 1])
+        redis.call('EXPIRE', KEYS[i + 1], memoria)
+        local duracao = math.min(maximo, base * 2 ^ (nivel - 1))
+        redis.call('SET', KEYS[i + 2], 1, 'EX', duracao)
+        redis.call('DEL', KEYS[i])
+        if duracao > aplicado then
+            aplicado = duracao
+        end
+    end
+end
+return aplicado
+"""
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        """
+        Tentativa de login recusada pelo limitador
+
+        Args:
+            retry_after (float): Segundos até a próxima tentativa ser aceita
+        """
+        super().__init__(f"Muitas tentativas de login. Tente novamente em {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class LoginRateLimiter:
+    def __init__(self, redis_client, user_capacity=10, user_rate=10 / 60,
+                 client_capacity=30, client_rate=30 / 60, max_failures=5,
+                 failure_window=900, lockout_base=30, lockout_max=3600):
+        """
+        Limitador de tentativas de login (token bucket + bloqueio progressivo)
+
+        Cada tentativa consome uma ficha do balde do usuário e do balde do
+        cliente (IP). Falhas consecutivas levam a bloqueios cada vez maiores.
+
+        Args:
+            redis_client (redis.Redis): Cliente Redis
+            user_capacity, client_capacity (int): Rajada máxima de tentativas
+            user_rate, client_rate (float): Fichas repostas por segundo
+            max_failures (int): Falhas dentro da janela que disparam um bloqueio
+            failure_window (int): Janela de contagem de falhas, em segundos
+            lockout_base (int): Duração do primeiro bloqueio, em segundos
+            lockout_max (int): Duração máxima de um bloqueio, em segundos
+        """
+        self.redis_client = redis_client
+        self.user_capacity = user_capacity
+        self.user_rate = user_rate
+        self.client_capacity = client_capacity
+        self.client_rate = client_rate
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self.lockout_base = lockout_base
+        self.lockout_max = lockout_max
+
+        self._check_script = redis_client.register_script(CHECK_SCRIPT)
+        self._fail_script = redis_client.register_script(FAIL_SCRIPT)
+
+    @staticmethod
+    def env_limits():
+        """Limites vindos das variáveis de ambiente (argumentos nomeados do construtor)"""
+        return {
+            'user_capacity': int(os.getenv('LOGIN_USER_BURST', 10)),
+            'user_rate': float(os.getenv('LOGIN_USER_PER_MINUTE', 10)) / 60,
+            'client_capacity': int(os.getenv('LOGIN_CLIENT_BURST', 30)),
+            'client_rate': float(os.getenv('LOGIN_CLIENT_PER_MINUTE', 30)) / 60,
+            'max_failures': int(os.getenv('LOGIN_MAX_FAILURES', 5)),
+            'failure_window': int(os.getenv('LOGIN_FAILURE_WINDOW', 900)),
+            'lockout_base': int(os.getenv('LOGIN_LOCKOUT_BASE', 30)),
+            'lockout_max': int(os.getenv('LOGIN_LOCKOUT_MAX', 3600))
+        }
+
+    @classmethod
+    def from_env(cls, redis_client):
+        """Cria o limitador com limites vindos das variáveis de ambiente"""
+        return cls(redis_client, **cls.env_limits())
+
+    @staticmethod
+    def _identities(username, client_id):
+        """Prefixos das chaves de cada identidade limitada"""
+        identidades = [f"ratelimit:user:{username}"]
+        if client_id:
+            identidades.append(f"ratelimit:client:{client_id}")
+        return identidades
+
+    def check_call(self, username, client_id):
+        """
+        Chaves e argumentos da verificação (CHECK_SCRIPT ou a função consumir
+        embutida em outro script, com as chaves e argumentos ao final)
+
+        Returns:
+            dict: {'keys': pares (balde, bloqueio), 'args': pares (capacidade, taxa)}
+        """
+        keys = []
+        args = []
+        for prefixo, (capacidade, taxa) in zip(
+            self._identities(username, client_id),
+            [(self.user_capacity, self.user_rate), (self.client_capacity, self.client_rate)]
+        ):
+            keys += [f"{prefixo}:bucket", f"{prefixo}:lock"]
+            args += [capacidade, taxa]
+        return {'keys': keys, 'args': args}
+
+    def _failure_call(self, username, client_id):
+        """Chaves e argumentos do script de registro de falha"""
+        keys = []
+        for prefixo in self._identities(username, client_id):
+            keys += [f"{prefixo}:failures", f"{prefixo}:level", f"{prefixo}:lock"]
+        args = [self.max_failures, self.failure_window, self.lockout_base,
+                self.lockout_max, self.lockout_max * 4]
+        return {'keys': keys, 'args': args}
+
+    @staticmethod
+    def raise_if_throttled(espera_ms):
+        """Levanta LoginThrottled se a verificação pediu espera (em milissegundos)"""
+        if espera_ms:
+            raise LoginThrottled(espera_ms / 1000)
+
+    def check(self, username, client_id=None):
+        """
+        Consome uma tentativa; recusa se a identidade estiver bloqueada ou sem fichas
+
+        Args:
+            username (str): Usuário da tentativa
+            client_id (str): Identificador do cliente (ex.: IP), se conhecido
+
+        Raises:
+            LoginThrottled: Se a tentativa deve ser recusada
+        """
+        self.raise_if_throttled(self._check_script(**self.check_call(username, client_id)))
+
+    async def check_async(self, username, client_id=None):
+        """Versão assíncrona de check (requer um cliente redis.asyncio)"""
+        self.raise_if_throttled(await self._check_script(**self.check_call(username, client_id)))
+
+    def record_failure(self, username, client_id=None):
+        """
+        Registra uma falha de login para o usuário e o cliente
+
+        Returns:
+            int: Duração do bloqueio aplicado, em segundos (0 se nenhum)
+        """
+        return self._fail_script(**self._failure_call(username, client_id))
+
+    async def record_failure_async(self, username, client_id=None):
+        """Versão assíncrona de record_failure (requer um cliente redis.asyncio)"""
+        return await self._fail_script(**self._failure_call(username, client_id))
+
+    def reset_keys(self, username):
+        """
+        Chaves a apagar após um login bem-sucedido (zera falhas e nível do usuário)
+
+        Devolvidas em vez de apagadas aqui para que o chamador as inclua nos
+        scripts do login: a leitura do usuário avisa se elas existem e só
+        então a conclusão do login as apaga.
+        """
+        prefixo = f"ratelimit:user:{username}"
+        return [f"{prefixo}:failures", f"{prefixo}:level"]
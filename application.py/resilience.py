@@ -0,0 +1,269 @@
+import functools
+import inspect
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import ConnectionFailure
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from observability import REGISTRY, captured_errors, get_logger
+
+logger = get_logger(__name__)
+
+# Exceções que indicam backend fora do ar (e não erro da operação em si)
+CONNECTION_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    ConnectionFailure,
+    RedisConnectionError,
+    RedisTimeoutError,
+    sqlite3.OperationalError
+)
+
+# Conexões iniciadas em segundo plano (uma thread por backend)
+_bootstrap_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='bootstrap')
+
+
+class ServiceUnavailable(Exception):
+    def __init__(self, nome, motivo):
+        """
+        Backend indisponível: a conexão não pôde ser estabelecida
+
+        Args:
+            nome (str): Nome do backend (ex.: 'mongodb')
+            motivo (str): Descrição do erro
+        """
+        super().__init__(f"{nome} indisponível: {motivo}")
+        self.nome = nome
+
+
+class CircuitOpen(ServiceUnavailable):
+    def __init__(self, nome, retry_after):
+        """
+        Circuito aberto: chamadas ao backend falham na hora, sem tentar conectar
+
+        Args:
+            nome (str): Nome do backend
+            retry_after (float): Segundos até a próxima tentativa ser permitida
+        """
+        super().__init__(nome, f"nova tentativa em {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, nome, failure_threshold=3, reset_timeout=30):
+        """
+        Disjuntor (fechado → aberto → meio-aberto) de um backend
+
+        Após `failure_threshold` falhas seguidas o circuito abre e recusa
+        chamadas por `reset_timeout` segundos; depois, uma única chamada de
+        teste é liberada (meio-aberto): sucesso fecha o circuito, falha o reabre.
+
+        Args:
+            nome (str): Nome do backend
+            failure_threshold (int): Falhas seguidas que abrem o circuito
+            reset_timeout (float): Segundos com o circuito aberto
+        """
+        self.nome = nome
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._testing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, nome):
+        """Cria o disjuntor com limites vindos das variáveis de ambiente"""
+        return cls(
+            nome,
+            failure_threshold=int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3)),
+            reset_timeout=float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+        )
+
+    @property
+    def state(self):
+        """'closed', 'open' ou 'half-open'"""
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def before_call(self):
+        """
+        Libera ou recusa uma chamada
+
+        Raises:
+            CircuitOpen: Se o circuito está aberto (ou a chamada de teste já está em andamento)
+        """
+        with self._lock:
+            estado = self.state
+            if estado == 'closed':
+                return
+            if estado == 'half-open' and not self._testing:
+                self._testing = True
+                return
+            restante = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        raise CircuitOpen(self.nome, restante)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._testing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._testing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._testing:
+                    logger.warning("⚠️ Circuito de %s aberto após %s falha(s)", self.nome, self.failures)
+                self.opened_at = time.monotonic()
+            self._testing = False
+
+
+def backoff_delays(attempts, base=0.5, maximum=8.0):
+    """
+    Esperas entre tentativas: exponenciais, com teto e jitter ("full jitter")
+
+    Args:
+        attempts (int): Total de tentativas
+        base (float): Espera base, em segundos
+        maximum (float): Espera máxima, em segundos
+
+    Returns:
+        list: attempts - 1 esperas, em segundos
+    """
+    return [random.uniform(0, min(maximum, base * 2 ** tentativa)) for tentativa in range(attempts - 1)]
+
+
+class LazyConnection:
+    def __init__(self, nome, factory, breaker=None, attempts=None, backoff_base=None, backoff_max=None,
+                 failure_types=CONNECTION_ERRORS):
+        """
+        Conexão com um backend, criada sob demanda ou em segundo plano
+
+        Repassa atributos ao objeto criado por `factory` (ex.: MongoDBManager),
+        então pode substituí-lo diretamente. A criação é tentada com backoff
+        exponencial; cada tentativa passa pelo disjuntor, e com o circuito
+        aberto o acesso falha na hora com CircuitOpen em vez de esperar os
+        timeouts de conexão. A duração de cada conexão vai para as métricas
+        (componente 'bootstrap').
+
+        Depois de conectado, os métodos repassados também passam pelo
+        disjuntor: uma chamada em que o backend falhou com um dos
+        `failure_types` (propagado ou registrado como erro pelo gerenciador)
+        conta como falha, e falhas seguidas abrem o circuito durante a queda.
+
+        Args:
+            nome (str): Nome do backend (rótulo das métricas e mensagens)
+            factory (callable): Cria o objeto conectado (levanta exceção se falhar)
+            breaker (CircuitBreaker): Disjuntor (padrão: CircuitBreaker.from_env)
+            attempts (int): Tentativas por conexão (padrão: BOOTSTRAP_ATTEMPTS ou 3)
+            backoff_base (float): Espera base entre tentativas (padrão: BOOTSTRAP_BACKOFF_BASE ou 0.5s)
+            backoff_max (float): Espera máxima entre tentativas (padrão: BOOTSTRAP_BACKOFF_MAX ou 8s)
+            failure_types (tuple): Exceções que contam como falha do backend (padrão: CONNECTION_ERRORS)
+        """
+        self._nome = nome
+        self._factory = factory
+        self._breaker = breaker or CircuitBreaker.from_env(nome)
+        self._attempts = attempts or int(os.getenv('BOOTSTRAP_ATTEMPTS', 3))
+        self._backoff_base = backoff_base if backoff_base is not None else float(os.getenv('BOOTSTRAP_BACKOFF_BASE', 0.5))
+        self._backoff_max = backoff_max if backoff_max is not None else float(os.getenv('BOOTSTRAP_BACKOFF_MAX', 8))
+        self._failure_types = failure_types
+        self._instance = None
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Cria o objeto, com novas tentativas e backoff"""
+        esperas = backoff_delays(self._attempts, self._backoff_base, self._backoff_max) + [None]
+        for tentativa, espera in enumerate(esperas, 1):
+            self._breaker.before_call()
+            inicio = time.perf_counter()
+            try:
+                instancia = self._factory()
+            except Exception as e:
+                self._breaker.record_failure()
+                REGISTRY.record_error('bootstrap', self._nome)
+                if espera is None or self._breaker.state != 'closed':
+                    raise ServiceUnavailable(self._nome, e) from e
+                logger.warning("⚠️ Tentativa %s de conectar a %s falhou (%s); nova tentativa em %.1fs",
+                               tentativa, self._nome, e, espera)
+                time.sleep(espera)
+                continue
+
+            duracao = time.perf_counter() - inicio
+            self._breaker.record_success()
+            REGISTRY.observe('bootstrap', self._nome, duracao)
+            logger.info("✅ %s conectado em %.2fs (tentativa %s)", self._nome, duracao, tentativa)
+            return instancia
+
+    def start(self):
+        """Começa a conectar em segundo plano (sem bloquear); devolve a própria conexão"""
+        with self._lock:
+            if self._instance is None and self._future is None:
+                self._future = _bootstrap_pool.submit(self._connect)
+        return self
+
+    def get(self):
+        """
+        Objeto conectado, esperando a conexão em andamento ou criando-a agora
+
+        Raises:
+            ServiceUnavailable: Se não foi possível conectar (CircuitOpen com o circuito aberto)
+        """
+        instancia = self._instance
+        if instancia is not None:
+            return instancia
+
+        with self._lock:
+            if self._instance is None:
+                futuro, self._future = self._future, None
+                self._instance = futuro.result() if futuro else self._connect()
+            return self._instance
+
+    @property
+    def connected(self):
+        return self._instance is not None
+
+    @property
+    def breaker(self):
+        return self._breaker
+
+    def _guarded(self, func, *args, **kwargs):
+        """
+        Executa um método do objeto conectado passando pelo disjuntor
+
+        Raises:
+            CircuitOpen: Se o circuito está aberto
+            ServiceUnavailable: Se a chamada propagou uma falha do backend
+        """
+        self._breaker.before_call()
+        with captured_errors() as registrados:
+            try:
+                resultado = func(*args, **kwargs)
+            except self._failure_types as e:
+                self._breaker.record_failure()
+                raise ServiceUnavailable(self._nome, e) from e
+            except Exception:
+                # O backend respondeu; o erro é da operação (ex.: VersionConflict)
+                self._breaker.record_success()
+                raise
+
+        if any(isinstance(erro, self._failure_types) for erro in registrados):
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return resultado
+
+    def __getattr__(self, name):
+        atributo = getattr(self.get(), name)
+        if not inspect.ismethod(atributo):
+            return atributo
+        return functools.partial(self._guarded, atributo)
@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.fernet import InvalidToken
+
+from crypto import VaultCrypto
+from observability import get_logger
+
+logger = get_logger(__name__)
+
+# Passadas completas antes de desistir de entradas que mudam durante a rotação
+MAX_PASSADAS = 5
+
+# Cifradores do processo trabalhador (criados uma vez pelo initializer do pool)
+_cifradores = {}
+
+
+def _init_worker(old_key, new_key):
+    """Cria os cifradores da chave antiga e da nova em cada processo do pool"""
+    _cifradores['antiga'] = VaultCrypto(old_key)
+    _cifradores['nova'] = VaultCrypto(new_key)
+
+
+def _reencrypt(lote):
+    """
+    Re-cifra um lote com a nova chave (executado em um processo do pool)
+
+    Entradas que já abrem com a nova chave (gravadas por uma sessão que já
+    usava a nova chave) mantêm o texto cifrado, só para serem marcadas. A
+    impressão digital de todas é recalculada com a nova chave.
+
+    Args:
+        lote (list): Tuplas (ObjectId, token Fernet)
+
+    Returns:
+        tuple: (lista de (ObjectId, token lido, token re-cifrado, impressão digital),
+                IDs que nenhuma chave abre)
+    """
+    resultados = []
+    erros = []
+    nova = _cifradores['nova']
+
+    for password_id, token in lote:
+        try:
+            texto = _cifradores['antiga'].decrypt(token)
+            novo_token = nova.encrypt(texto)
+        except InvalidToken:
+            try:
+                texto = nova.decrypt(token)
+                novo_token = token
+            except InvalidToken:
+                erros.append(password_id)
+                continue
+
+        resultados.append((password_id, token, novo_token, nova.fingerprint(texto)))
+
+    return resultados, erros
+
+
+class KeyRotationJob:
+    def __init__(self, manager, usuario, old_key, new_key, workers=None, batch_size=500):
+        """
+        Rotação da chave do cofre de um usuário: re-cifra todas as senhas com a nova chave
+
+        As senhas são lidas em lotes pelo índice do usuário, re-cifradas em um
+        pool de processos (a criptografia não libera o GIL) e gravadas com
+        bulk_write, marcando cada documento com o identificador da nova chave.
+        Após cada lote gravado o progresso vai para um checkpoint no MongoDB:
+        uma rotação interrompida continua de onde parou quando executada de
+        novo com as mesmas chaves. O checkpoint só indica onde retomar; o que
+        decide se há trabalho é a contagem de senhas ainda fora da nova chave.
+
+        Args:
+            manager (MongoDBManager): Gerenciador do MongoDB
+            usuario (str): Dono do cofre
+            old_key (bytes): Chave Fernet atual
+            new_key (bytes): Nova chave Fernet
+            workers (int): Processos do pool (padrão: ROTATION_WORKERS ou nº de CPUs)
+            batch_size (int): Senhas por lote de leitura/re-cifragem/gravação
+        """
+        self.manager = manager
+        self.usuario = usuario
+        self.old_key = old_key
+        self.new_key = new_key
+        self.key_id = VaultCrypto(new_key).key_id
+        self.job_id = f"{usuario}:{self.key_id}"
+        self.workers = workers or int(os.getenv('ROTATION_WORKERS', os.cpu_count() or 2))
+        self.batch_size = batch_size
+
+    def _apply(self, futuro, cursor, relatorio, erros):
+        """Grava um lote re-cifrado e registra o checkpoint; devolve os conflitos"""
+        resultados, ids_erro = futuro.result()
+        gravadas = self.manager.apply_rotation(self.usuario, resultados, self.key_id)
+
+        erros.update(ids_erro)
+        relatorio['regravadas'] += gravadas
+        self.manager.save_rotation_checkpoint(self.job_id, {
+            'usuario': self.usuario,
+            'cursor': cursor,
+            'regravadas': relatorio['regravadas'],
+            'concluida': False
+        })
+        return len(resultados) - gravadas
+
+    def _pass(self, pool, cursor, relatorio, erros, progress, total):
+        """
+        Percorre o cofre uma vez a partir do cursor
+
+        A leitura do próximo lote segue enquanto os anteriores são re-cifrados;
+        no máximo 2 lotes por processo ficam pendentes, e as gravações (com o
+        checkpoint) acontecem na ordem de leitura.
+
+        Returns:
+            int: Entradas não gravadas porque mudaram durante a passada
+        """
+        pendentes = deque()
+        conflitos = 0
+
+        while True:
+            lote, cursor = self.manager.rotation_batch(self.usuario, self.key_id, cursor, self.batch_size)
+            if lote:
+                pendentes.append((pool.submit(_reencrypt, lote), cursor))
+
+            while pendentes and (cursor is None or len(pendentes) > self.workers * 2):
+                futuro, cursor_lote = pendentes.popleft()
+                conflitos += self._apply(futuro, cursor_lote, relatorio, erros)
+                if progress:
+                    progress(relatorio['regravadas'], total)
+
+            if cursor is None:
+                return conflitos
+
+    def run(self, progress=None):
+        """
+        Executa (ou retoma) a rotação
+
+        Args:
+            progress (callable): Chamado após cada lote com (senhas regravadas, total a regravar)
+
+        Returns:
+            dict: {'regravadas': int, 'erros': IDs de senhas que nenhuma das chaves abre}
+        """
+        checkpoint = self.manager.load_rotation_checkpoint(self.job_id) or {}
+        relatorio = {'regravadas': checkpoint.get('regravadas', 0), 'erros': []}
+
+        # Uma rotação marcada como concluída ainda pode ter senhas na chave
+        # antiga (gravadas por uma sessão antiga depois dela): confere sempre
+        pendentes = self.manager.rotation_pending(self.usuario, self.key_id)
+        total = relatorio['regravadas'] + pendentes
+        erros = set()
+        conflitos = 0
+
+        if pendentes:
+            cursor = None if checkpoint.get('concluida') else checkpoint.get('cursor')
+            # 'fork' a partir do processo do Streamlit (com várias threads) pode
+            # herdar locks presos; 'spawn' inicia processos limpos que só importam
+            # este módulo para executar _reencrypt
+            contexto = multiprocessing.get_context(os.getenv('ROTATION_START_METHOD', 'spawn'))
+
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=contexto,
+                initializer=_init_worker,
+                initargs=(self.old_key, self.new_key)
+            ) as pool:
+                # Uma retomada (ou uma passada com conflitos) termina com uma passada
+                # completa, que só encontra o que ainda não está na nova chave
+                for _ in range(MAX_PASSADAS):
+                    conflitos = self._pass(pool, cursor, relatorio, erros, progress, total)
+                    if cursor is None and not conflitos:
+                        break
+                    cursor = None
+
+        relatorio['erros'] = [str(password_id) for password_id in erros]
+        self.manager.save_rotation_checkpoint(self.job_id, {
+            'usuario': self.usuario,
+            'cursor': None,
+            'regravadas': relatorio['regravadas'],
+            'erros': relatorio['erros'],
+            'concluida': not conflitos
+        })
+
+        logger.info("✅ Rotação de chave de '%s': %s senha(s) re-cifrada(s)", self.usuario, relatorio['regravadas'])
+        return relatorio
+
+    def _pending_besides(self, erros):
+        """Senhas ainda fora da nova chave, além das que nenhuma chave abre (erros)"""
+        ignoradas = set(erros)
+        lote, _ = self.manager.rotation_batch(self.usuario, self.key_id, None, len(ignoradas) + 1)
+        return [password_id for password_id, _ in lote if str(password_id) not in ignoradas]
+
+    def commit(self, switch, progress=None):
+        """
+        Executa a rotação e troca a chave do usuário quando nada ficou para trás
+
+        Sessões ainda na chave antiga podem gravar durante a rotação (as
+        escritas comuns removem a marca de chave da senha), então a troca só
+        é chamada depois de uma conferência sem pendências, e a rotação é
+        repetida até isso acontecer. A troca vive em outro armazenamento e não
+        pode ser atômica com a conferência: ela é refeita depois da troca, e o
+        que uma escrita em andamento deixou na chave antiga é re-cifrado (o job
+        ainda tem as duas chaves).
+
+        Args:
+            switch (callable): Troca a chave (ex.: grava a nova senha mestra); devolve True se trocou
+            progress (callable): Repassado a run
+
+        Returns:
+            dict: Relatório de run, com 'trocada' (True se switch foi chamado e trocou)
+        """
+        trocada = False
+        for _ in range(MAX_PASSADAS):
+            relatorio = self.run(progress)
+            if not self._pending_besides(relatorio['erros']):
+                trocada = bool(switch())
+                break
+        else:
+            logger.warning("⚠️ Rotação de '%s' sem troca de chave: senhas continuam mudando", self.usuario)
+
+        if trocada:
+            for _ in range(MAX_PASSADAS):
+                if not self._pending_besides(relatorio['erros']):
+                    break
+                relatorio = self.run(progress)
+            else:
+                logger.warning("⚠️ Rotação de '%s': senhas gravadas na chave antiga após a troca", self.usuario)
+
+        relatorio['trocada'] = trocada
+        return relatorio
@@ -0,0 +1,1450 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+from crypto import new_salt
+from database import search_key, encode_ciphertext, decode_ciphertext, utc_now, write_time, read_time
+from hashing import PasswordHasher, HashingQueueFull, split_hash, join_hash
+from ratelimit import LoginRateLimiter, LoginThrottled
+from audit import AUDIT
+from observability import get_logger, instrumented
+from storage import VaultStore, AuthStore, VersionConflict
+
+logger = get_logger(__name__)
+
+# Maior caractere Unicode: limite superior das buscas por prefixo em intervalos de texto
+FIM_PREFIXO = '\U0010ffff'
+
+# Tabelas e índices do cofre. Os índices parciais (excluido = 0) só guardam
+# as entradas ativas, e cada consulta repete a condição para poder usá-los.
+ESQUEMA_COFRE = """
+CREATE TABLE IF NOT EXISTS senhas (
+    id TEXT PRIMARY KEY,
+    usuario TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    nome_busca TEXT,
+    senha BLOB,
+    impressao BLOB,
+    versao_chave TEXT,
+    data_criacao TEXT NOT NULL,
+    data_atualizacao TEXT NOT NULL,
+    excluido INTEGER NOT NULL DEFAULT 0,
+    versao INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS senhas_usuario_nome ON senhas (usuario, nome, id) WHERE excluido = 0;
+CREATE INDEX IF NOT EXISTS senhas_usuario_busca ON senhas (usuario, nome_busca) WHERE excluido = 0;
+CREATE INDEX IF NOT EXISTS senhas_usuario_atualizacao ON senhas (usuario, data_atualizacao, id);
+CREATE INDEX IF NOT EXISTS senhas_usuario_impressao ON senhas (usuario, impressao) WHERE impressao IS NOT NULL;
+CREATE INDEX IF NOT EXISTS senhas_lapides ON senhas (data_atualizacao) WHERE excluido = 1;
+CREATE TABLE IF NOT EXISTS rotacoes (
+    id TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    iniciado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    id TEXT PRIMARY KEY,
+    horizonte TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Tabelas da autenticação: usuários (ordenados pela chave primária, o que
+# atende a listagem por prefixo), sessões e estado do limitador de tentativas
+ESQUEMA_AUTENTICACAO = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    username TEXT PRIMARY KEY,
+    kdf TEXT NOT NULL,
+    kdf_params TEXT NOT NULL,
+    salt TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    vault_salt TEXT NOT NULL,
+    pending_vault_salt TEXT,
+    created_at TEXT NOT NULL,
+    last_login TEXT,
+    login_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessoes (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    sealed_key TEXT,
+    created_at TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessoes_username ON sessoes (username);
+CREATE INDEX IF NOT EXISTS sessoes_expiracao ON sessoes (expires_at);
+CREATE TABLE IF NOT EXISTS limites_login (
+    identidade TEXT PRIMARY KEY,
+    fichas REAL,
+    ts REAL,
+    falhas INTEGER NOT NULL DEFAULT 0,
+    falhas_ate REAL,
+    nivel INTEGER NOT NULL DEFAULT 0,
+    nivel_ate REAL,
+    bloqueado_ate REAL
+) WITHOUT ROWID;
+"""
+
+# Trilha de auditoria (SQLiteAuditSink); campos extras do evento ficam em JSON
+ESQUEMA_AUDITORIA = """
+CREATE TABLE IF NOT EXISTS auditoria (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    acao TEXT NOT NULL,
+    usuario TEXT,
+    dados TEXT
+);
+CREATE INDEX IF NOT EXISTS auditoria_usuario_ts ON auditoria (usuario, ts);
+"""
+
+# Colunas das listagens (sem o texto cifrado) e dos documentos completos
+COLUNAS_METADADOS = "id, usuario, nome, versao_chave, versao, data_criacao, data_atualizacao"
+COLUNAS_DOCUMENTO = COLUNAS_METADADOS + ", nome_busca, senha, impressao"
+COLUNAS_ALTERACOES = COLUNAS_METADADOS + ", senha, impressao, excluido"
+
+# Inserção de uma senha (parâmetros de SQLiteVaultStore._new_row)
+INSERIR_SENHA = (
+    "INSERT INTO senhas (id, usuario, nome, nome_busca, senha, impressao, data_criacao, data_atualizacao) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Condição das senhas ativas de um usuário (a mesma dos índices parciais)
+FILTRO_USUARIO = "usuario = ? AND excluido = 0"
+
+# Condição das alterações: a senha ativa, do próprio usuário e, se o último
+# parâmetro não for NULL, na versão lida pelo chamador
+FILTRO_ALTERACAO = "id = ? AND usuario = ? AND excluido = 0 AND versao = coalesce(?, versao)"
+
+
+def _to_db(data):
+    """Data gravada no banco: texto ISO com largura fixa, que ordena como a própria data"""
+    return data.isoformat(sep=' ', timespec='microseconds')
+
+
+def decode_row(linha):
+    """
+    Converte uma linha da tabela senhas para os nomes de campo do app
+
+    Mesmo formato de database.decode_document: '_id' como string, token
+    Fernet em 'senha', datas como datetime e 'excluido' só nas lápides.
+
+    Args:
+        linha (sqlite3.Row): Linha lida do banco
+
+    Returns:
+        dict: Documento da senha
+    """
+    senha = {'_id': linha['id']}
+    for campo in linha.keys()[1:]:
+        valor = linha[campo]
+        if valor is None:
+            continue
+        if campo == 'senha':
+            valor = decode_ciphertext(valor)
+        elif campo.startswith('data_'):
+            valor = datetime.fromisoformat(valor)
+        elif campo == 'excluido':
+            if not valor:
+                continue
+            valor = True
+        senha[campo] = valor
+    return senha
+
+
+class SQLiteDatabase:
+    def __init__(self, path=None, busy_timeout=None, cached_statements=None):
+        """
+        Arquivo SQLite com uma conexão por thread
+
+        A conexão vive enquanto a thread que a abriu: o registro é indexado
+        pela thread com referência fraca e a conexão é fechada quando ela
+        termina, então as threads de cada execução do Streamlit não acumulam
+        conexões abertas.
+
+        As conexões usam WAL (leitores não bloqueiam o escritor) com
+        synchronous=NORMAL, e cada uma mantém em cache as instruções já
+        preparadas: as consultas usam SQL fixo com parâmetros, então cada
+        uma é compilada uma vez por conexão.
+
+        Args:
+            path (str): Arquivo do banco (padrão: SQLITE_PATH ou gerenciador_senhas.db)
+            busy_timeout (float): Espera por um lock de escrita, em segundos (padrão: SQLITE_BUSY_TIMEOUT ou 5)
+            cached_statements (int): Instruções preparadas por conexão (padrão: SQLITE_CACHED_STATEMENTS ou 256)
+        """
+        self.path = path or os.getenv('SQLITE_PATH', 'gerenciador_senhas.db')
+        self.busy_timeout = busy_timeout or float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+        self.cached_statements = cached_statements or int(os.getenv('SQLITE_CACHED_STATEMENTS', 256))
+        self._local = threading.local()
+        # thread -> conexão; a entrada some quando a thread é coletada
+        self._connections = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Conexão da thread atual (aberta e configurada no primeiro uso)"""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+                uri=self.path.startswith('file:')
+            )
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("PRAGMA temp_store=MEMORY")
+            self._local.conexao = conexao
+            thread = threading.current_thread()
+            with self._lock:
+                self._connections[thread] = conexao
+            weakref.finalize(thread, conexao.close)
+        return conexao
+
+    def execute(self, sql, parametros=()):
+        """Executa uma instrução (em autocommit) e devolve o cursor"""
+        return self.connection().execute(sql, parametros)
+
+    def executescript(self, sql):
+        """Executa um script (criação do esquema)"""
+        self.connection().executescript(sql)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transação de escrita (BEGIN IMMEDIATE): o lock é obtido no início,
+        então leituras seguidas de escritas dentro dela não conflitam
+        """
+        conexao = self.connection()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield conexao
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+        conexao.execute("COMMIT")
+
+    def close(self):
+        """Fecha as conexões de todas as threads"""
+        with self._lock:
+            conexoes = list(self._connections.values())
+            self._connections.clear()
+        for conexao in conexoes:
+            conexao.close()
+        self._local = threading.local()
+
+
+@instrumented('sqlite')
+class SQLiteVaultStore(VaultStore):
+    def __init__(self, path=None):
+        """
+        Cofre em um arquivo SQLite local, sem servidor
+
+        Para instalações de um único nó: cada operação é uma consulta no
+        próprio processo, sem ida à rede. Documentos, cursores e retornos
+        seguem o MongoDBManager.
+
+        Args:
+            path (str): Arquivo do banco (padrão: SQLITE_PATH)
+        """
+        try:
+            self.db = SQLiteDatabase(path)
+            self.db.executescript(ESQUEMA_COFRE)
+            # Bancos criados antes do controle de versão
+            colunas = {linha['name'] for linha in self.db.execute("PRAGMA table_info(senhas)")}
+            if 'versao' not in colunas:
+                self.db.execute("ALTER TABLE senhas ADD COLUMN versao INTEGER NOT NULL DEFAULT 1")
+            logger.info("✅ Cofre SQLite aberto em %s", self.db.path)
+
+            # Lápides mais antigas que a retenção são removidas periodicamente
+            self.tombstone_retention = timedelta(days=int(os.getenv('TOMBSTONE_RETENTION_DAYS', 30)))
+            self._compaction_stop = threading.Event()
+            threading.Thread(
+                target=self._compaction_loop,
+                args=(int(os.getenv('TOMBSTONE_COMPACT_INTERVAL', 3600)),),
+                daemon=True
+            ).start()
+
+        except Exception as e:
+            logger.error("❌ Erro ao abrir o banco SQLite: %s", e)
+            raise
+
+    @staticmethod
+    def _new_row(usuario, nome, senha, agora, impressao=None):
+        """Parâmetros do INSERT de uma nova senha"""
+        data = _to_db(agora)
+        return (str(ObjectId()), usuario, nome, search_key(nome), encode_ciphertext(senha), impressao, data, data)
+
+    def create_password(self, usuario, nome, senha, impressao=None):
+        """
+        CREATE - Insere uma nova senha no banco
+
+        Args:
+            usuario (str): Nome do usuário dono da senha
+            nome (str): Nome/serviço da senha
+            senha (str): Senha criptografada
+            impressao (bytes): Impressão digital da senha (VaultCrypto.fingerprint)
+
+        Returns:
+            str: ID da senha inserida ou None em caso de erro
+        """
+        try:
+            linha = self._new_row(usuario, nome, senha, write_time(), impressao)
+            self.db.execute(INSERIR_SENHA, linha)
+            logger.debug("✅ Senha cadastrada com ID: %s", linha[0])
+            AUDIT.record('create_password', usuario, password_id=linha[0])
+            return linha[0]
+
+        except Exception as e:
+            logger.error("❌ Erro ao cadastrar senha: %s", e)
+            return None
+
+    def bulk_create_passwords(self, usuario, entradas, ordered=False):
+        """
+        CREATE (em lote) - Insere várias senhas em uma única transação
+
+        Args:
+            usuario (str): Nome do usuário dono das senhas
+            entradas (list): Tuplas (nome, senha criptografada[, impressão digital])
+            ordered (bool): Se True, interrompe o lote no primeiro erro
+
+        Returns:
+            tuple: (quantidade inserida, lista de (índice no lote, mensagem) com erros)
+        """
+        if not entradas:
+            return 0, []
+
+        agora = write_time()
+        inseridas = 0
+        erros = []
+        try:
+            with self.db.transaction() as conexao:
+                for indice, entrada in enumerate(entradas):
+                    try:
+                        conexao.execute(INSERIR_SENHA, self._new_row(usuario, *entrada[:2], agora, *entrada[2:]))
+                        inseridas += 1
+                    except sqlite3.Error as e:
+                        erros.append((indice, str(e)))
+                        if ordered:
+                            erros += [(i, 'não processado') for i in range(indice + 1, len(entradas))]
+                            break
+            if inseridas:
+                AUDIT.record('bulk_create_passwords', usuario, quantidade=inseridas)
+            return inseridas, erros
+
+        except Exception as e:
+            logger.error("❌ Erro ao cadastrar senhas em lote: %s", e)
+            return 0, [(i, str(e)) for i in range(len(entradas))]
+
+    def iter_passwords(self, usuario, batch_size=1000):
+        """
+        READ - Percorre todas as senhas de um usuário sem carregá-las de uma vez
+
+        Args:
+            usuario (str): Nome do usuário
+            batch_size (int): Linhas lidas por vez
+
+        Yields:
+            dict: Documento da senha (com '_id' como string)
+        """
+        cursor = self.db.execute(
+            f"SELECT {COLUNAS_DOCUMENTO} FROM senhas WHERE {FILTRO_USUARIO} ORDER BY nome, id",
+            (usuario,)
+        )
+        while True:
+            linhas = cursor.fetchmany(batch_size)
+            if not linhas:
+                break
+            for linha in linhas:
+                yield decode_row(linha)
+
+    def list_passwords(self, usuario):
+        """
+        READ - Lista todas as senhas de um usuário
+
+        Args:
+            usuario (str): Nome do usuário
+
+        Returns:
+            list: Lista de documentos (senhas)
+        """
+        try:
+            senhas = [
+                decode_row(linha) for linha in self.db.execute(
+                    f"SELECT {COLUNAS_DOCUMENTO} FROM senhas WHERE {FILTRO_USUARIO} ORDER BY nome, id",
+                    (usuario,)
+                )
+            ]
+            logger.debug("✅ %s senha(s) encontrada(s) para o usuário %s", len(senhas), usuario)
+            return senhas
+
+        except Exception as e:
+            logger.error("❌ Erro ao listar senhas: %s", e)
+            return []
+
+    def list_passwords_page(self, usuario, limit=50, cursor=None):
+        """
+        READ - Lista uma página das senhas de um usuário, sem o texto cifrado
+
+        Paginação keyset sobre (usuario, nome, id) no índice senhas_usuario_nome.
+
+        Args:
+            usuario (str): Nome do usuário
+            limit (int): Quantidade máxima de entradas na página
+            cursor (str): Cursor devolvido pela página anterior (None = início)
+
+        Returns:
+            tuple: (lista de documentos sem 'senha', cursor da próxima página ou None)
+        """
+        try:
+            if cursor:
+                linhas = self.db.execute(
+                    f"SELECT {COLUNAS_METADADOS} FROM senhas WHERE {FILTRO_USUARIO} "
+                    "AND (nome, id) > (?, ?) ORDER BY nome, id LIMIT ?",
+                    (usuario, *self._decode_cursor(cursor), limit + 1)
+                ).fetchall()
+            else:
+                linhas = self.db.execute(
+                    f"SELECT {COLUNAS_METADADOS} FROM senhas WHERE {FILTRO_USUARIO} ORDER BY nome, id LIMIT ?",
+                    (usuario, limit + 1)
+                ).fetchall()
+
+            proximo_cursor = None
+            if len(linhas) > limit:
+                linhas = linhas[:limit]
+                proximo_cursor = self._encode_cursor(linhas[-1]['nome'], linhas[-1]['id'])
+            return [decode_row(linha) for linha in linhas], proximo_cursor
+
+        except Exception as e:
+            logger.error("❌ Erro ao listar página de senhas: %s", e)
+            return [], None
+
+    def search_passwords(self, usuario, query, limit=20):
+        """
+        READ - Busca senhas cujo nome começa com o texto informado
+
+        O prefixo normalizado vira um intervalo no índice (usuario, nome_busca).
+
+        Args:
+            usuario (str): Nome do usuário
+            query (str): Início do nome/serviço
+            limit (int): Quantidade máxima de resultados
+
+        Returns:
+            list: Documentos encontrados, sem o texto cifrado
+        """
+        try:
+            prefixo = search_key(query or '')
+            linhas = self.db.execute(
+                f"SELECT {COLUNAS_METADADOS} FROM senhas WHERE {FILTRO_USUARIO} "
+                "AND nome_busca >= ? AND nome_busca < ? ORDER BY nome_busca LIMIT ?",
+                (usuario, prefixo, prefixo + FIM_PREFIXO, limit)
+            )
+            return [decode_row(linha) for linha in linhas]
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senhas: %s", e)
+            return []
+
+    def get_password_by_id(self, usuario, password_id):
+        """
+        READ - Busca uma senha específica do usuário por ID
+
+        Args:
+            usuario (str): Dono da senha (senhas de outros usuários não são devolvidas)
+            password_id (str): ID da senha
+
+        Returns:
+            dict: Documento da senha ou None
+        """
+        try:
+            linha = self.db.execute(
+                f"SELECT {COLUNAS_DOCUMENTO} FROM senhas WHERE id = ? AND {FILTRO_USUARIO}",
+                (password_id, usuario)
+            ).fetchone()
+
+            if linha:
+                return decode_row(linha)
+            logger.warning("⚠️ Senha com ID %s não encontrada", password_id)
+            return None
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senha: %s", e)
+            return None
+
+    def _raise_if_conflict(self, usuario, password_id, expected_version):
+        """
+        Depois de uma alteração que não casou com nada, distingue senha
+        inexistente (ou de outro usuário) de senha em outra versão
+
+        Raises:
+            VersionConflict: Se a senha existe, mas não na versão esperada
+        """
+        if expected_version is None:
+            return
+        atual = self.db.execute(
+            f"SELECT {COLUNAS_METADADOS} FROM senhas WHERE {FILTRO_ALTERACAO}",
+            (password_id, usuario, None)
+        ).fetchone()
+        if atual:
+            raise VersionConflict(password_id, expected_version, decode_row(atual))
+
+    def update_password(self, usuario, password_id, novo_nome, nova_senha, impressao=None, expected_version=None):
+        """
+        UPDATE - Atualiza uma senha do usuário e devolve a linha já alterada
+
+        Um único UPDATE ... RETURNING filtra pelo dono e, se informada, pela
+        versão lida pelo chamador, e incrementa a versão.
+
+        Args:
+            usuario (str): Dono da senha
+            password_id (str): ID da senha a ser atualizada
+            novo_nome (str): Novo nome/serviço
+            nova_senha (str): Nova senha criptografada
+            impressao (bytes): Impressão digital da nova senha (sem ela, a antiga é removida)
+            expected_version (int): Versão lida pelo chamador (None = sem verificação)
+
+        Returns:
+            dict: Documento atualizado ou None se a senha não existe (ou é de outro usuário)
+
+        Raises:
+            VersionConflict: Se a senha foi alterada desde a leitura
+        """
+        try:
+            linhas = self.db.execute(
+                # Sem marca de chave, como em MongoDBManager._update_operation
+                "UPDATE senhas SET nome = ?, nome_busca = ?, senha = ?, impressao = ?, data_atualizacao = ?, "
+                f"versao_chave = NULL, versao = versao + 1 WHERE {FILTRO_ALTERACAO} RETURNING {COLUNAS_DOCUMENTO}",
+                (novo_nome, search_key(novo_nome), encode_ciphertext(nova_senha), impressao,
+                 _to_db(write_time()), password_id, usuario, expected_version)
+            ).fetchall()
+            if linhas:
+                logger.debug("✅ Senha atualizada com sucesso!")
+                AUDIT.record('update_password', usuario, password_id=password_id, versao=linhas[0]['versao'])
+                return decode_row(linhas[0])
+
+            self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi modificada (ID pode não existir)")
+            return None
+
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except Exception as e:
+            logger.error("❌ Erro ao atualizar senha: %s", e)
+            return None
+
+    def delete_password(self, usuario, password_id, expected_version=None):
+        """
+        DELETE - Remove uma senha do usuário
+
+        A linha vira uma lápide (sem o texto cifrado) para a sincronização
+        incremental; lápides antigas são apagadas por compact_tombstones.
+
+        Args:
+            usuario (str): Dono da senha
+            password_id (str): ID da senha a ser removida
+            expected_version (int): Versão lida pelo chamador (None = sem verificação)
+
+        Returns:
+            dict: Lápide ('_id', 'nome', 'excluido', 'versao'...) ou None se a senha não existe
+
+        Raises:
+            VersionConflict: Se a senha foi alterada desde a leitura
+        """
+        try:
+            linhas = self.db.execute(
+                "UPDATE senhas SET excluido = 1, senha = NULL, nome_busca = NULL, impressao = NULL, "
+                f"data_atualizacao = ?, versao = versao + 1 WHERE {FILTRO_ALTERACAO} RETURNING {COLUNAS_ALTERACOES}",
+                (_to_db(write_time()), password_id, usuario, expected_version)
+            ).fetchall()
+            if linhas:
+                logger.debug("✅ Senha excluída com sucesso!")
+                AUDIT.record('delete_password', usuario, password_id=password_id, versao=linhas[0]['versao'])
+                return decode_row(linhas[0])
+
+            self._raise_if_conflict(usuario, password_id, expected_version)
+            logger.warning("⚠️ Nenhuma senha foi excluída (ID pode não existir)")
+            return None
+
+        except VersionConflict as e:
+            logger.warning("⚠️ %s", e)
+            raise
+        except Exception as e:
+            logger.error("❌ Erro ao excluir senha: %s", e)
+            return None
+
+    def delete_user_passwords(self, usuario):
+        """
+        DELETE - Apaga definitivamente todas as entradas de um usuário (inclusive lápides)
+
+        Args:
+            usuario (str): Nome do usuário
+
+        Returns:
+            int: Quantidade de linhas removidas
+        """
+        try:
+            return self.db.execute("DELETE FROM senhas WHERE usuario = ?", (usuario,)).rowcount
+
+        except Exception as e:
+            logger.error("❌ Erro ao remover senhas do usuário: %s", e)
+            return 0
+
+    def changes_since(self, usuario, checkpoint=None, limit=500, settle_seconds=2):
+        """
+        SYNC - Lista as entradas criadas, alteradas ou excluídas após um checkpoint
+
+        Mesmo contrato de MongoDBManager.changes_since, sobre o índice
+        (usuario, data_atualizacao, id).
+
+        Args:
+            usuario (str): Nome do usuário
+            checkpoint (str): Checkpoint devolvido pela chamada anterior (None = tudo)
+            limit (int): Quantidade máxima de alterações devolvidas
+            settle_seconds (int): Atraso aplicado às alterações mais recentes
+
+        Returns:
+            dict: {'changes', 'checkpoint', 'has_more', 'reset'}
+        """
+        try:
+            limite_superior = _to_db(read_time() - timedelta(seconds=settle_seconds))
+
+            if checkpoint:
+                ultima_data, ultimo_id = self._decode_cursor(checkpoint)
+                ultima_data = _to_db(datetime.fromisoformat(ultima_data))
+
+                # Lápides anteriores ao horizonte já foram compactadas
+                horizonte = self.db.execute(
+                    "SELECT horizonte FROM sincronizacao WHERE id = 'lapides'"
+                ).fetchone()
+                if horizonte and ultima_data < horizonte['horizonte']:
+                    return {'changes': [], 'checkpoint': None, 'has_more': False, 'reset': True}
+
+                linhas = self.db.execute(
+                    f"SELECT {COLUNAS_ALTERACOES} FROM senhas WHERE usuario = ? AND data_atualizacao <= ? "
+                    "AND (data_atualizacao, id) > (?, ?) ORDER BY data_atualizacao, id LIMIT ?",
+                    (usuario, limite_superior, ultima_data, ultimo_id, limit + 1)
+                ).fetchall()
+            else:
+                linhas = self.db.execute(
+                    f"SELECT {COLUNAS_ALTERACOES} FROM senhas WHERE usuario = ? AND data_atualizacao <= ? "
+                    "ORDER BY data_atualizacao, id LIMIT ?",
+                    (usuario, limite_superior, limit + 1)
+                ).fetchall()
+
+            has_more = len(linhas) > limit
+            alteracoes = [decode_row(linha) for linha in linhas[:limit]]
+
+            novo_checkpoint = checkpoint
+            if alteracoes:
+                ultima = alteracoes[-1]
+                novo_checkpoint = self._encode_cursor(ultima['data_atualizacao'].isoformat(), ultima['_id'])
+
+            return {'changes': alteracoes, 'checkpoint': novo_checkpoint, 'has_more': has_more, 'reset': False}
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar alterações: %s", e)
+            return {'changes': [], 'checkpoint': checkpoint, 'has_more': False, 'reset': False}
+
+    def compact_tombstones(self, retention=None):
+        """
+        Apaga definitivamente as lápides mais antigas que a retenção
+
+        Args:
+            retention (timedelta): Retenção (padrão: TOMBSTONE_RETENTION_DAYS)
+
+        Returns:
+            int: Quantidade de lápides removidas
+        """
+        try:
+            horizonte = _to_db(utc_now() - (self.tombstone_retention if retention is None else retention))
+
+            # O horizonte é gravado junto com a remoção: checkpoints anteriores
+            # a ele passam a exigir recarga completa
+            with self.db.transaction() as conexao:
+                conexao.execute(
+                    "INSERT INTO sincronizacao (id, horizonte) VALUES ('lapides', ?) "
+                    "ON CONFLICT (id) DO UPDATE SET horizonte = max(horizonte, excluded.horizonte)",
+                    (horizonte,)
+                )
+                removidas = conexao.execute(
+                    "DELETE FROM senhas WHERE excluido = 1 AND data_atualizacao < ?", (horizonte,)
+                ).rowcount
+
+            if removidas:
+                logger.info("✅ %s lápide(s) compactada(s)", removidas)
+            return removidas
+
+        except Exception as e:
+            logger.error("❌ Erro ao compactar lápides: %s", e)
+            return 0
+
+    def _compaction_loop(self, interval):
+        """Executa compact_tombstones a cada interval segundos até o fechamento"""
+        while not self._compaction_stop.wait(interval):
+            self.compact_tombstones()
+
+    def find_reused_passwords(self, usuario):
+        """
+        READ - Grupos de senhas do usuário que usam a mesma senha
+
+        Agrupa pela impressão digital no índice senhas_usuario_impressao,
+        sem ler nem descriptografar o texto cifrado.
+
+        Args:
+            usuario (str): Nome do usuário
+
+        Returns:
+            list: Grupos {'count', 'entries': [{'_id', 'nome'}]}, maiores primeiro
+        """
+        try:
+            linhas = self.db.execute(
+                "SELECT count(*) AS total, json_group_array(json_object('_id', id, 'nome', nome)) AS entradas "
+                "FROM senhas WHERE usuario = ? AND impressao IS NOT NULL AND excluido = 0 "
+                "GROUP BY impressao HAVING count(*) > 1 ORDER BY total DESC",
+                (usuario,)
+            )
+            return [{'count': linha['total'], 'entries': json.loads(linha['entradas'])} for linha in linhas]
+
+        except Exception as e:
+            logger.error("❌ Erro ao buscar senhas repetidas: %s", e)
+            return []
+
+    def fingerprint_backlog(self, usuario, limit=500):
+        """
+        Lote de senhas ativas do usuário ainda sem impressão digital
+
+        Args:
+            usuario (str): Nome do usuário
+            limit (int): Quantidade máxima de senhas no lote
+
+        Returns:
+            list: Tuplas (ID, token Fernet)
+        """
+        linhas = self.db.execute(
+            f"SELECT id, senha FROM senhas WHERE {FILTRO_USUARIO} AND impressao IS NULL LIMIT ?",
+            (usuario, limit)
+        )
+        return [(linha['id'], decode_ciphertext(linha['senha'])) for linha in linhas]
+
+    def set_fingerprints(self, usuario, impressoes):
+        """
+        Grava as impressões digitais de senhas já existentes
+
+        Cada escrita só é aplicada se o texto cifrado não mudou desde a leitura.
+
+        Args:
+            usuario (str): Nome do usuário
+            impressoes (list): Tuplas (ID, token lido, impressão digital)
+
+        Returns:
+            int: Quantidade de linhas gravadas
+        """
+        if not impressoes:
+            return 0
+
+        with self.db.transaction() as conexao:
+            return conexao.executemany(
+                "UPDATE senhas SET impressao = ? WHERE id = ? AND usuario = ? AND senha = ?",
+                [
+                    (impressao, password_id, usuario, encode_ciphertext(token))
+                    for password_id, token, impressao in impressoes
+                ]
+            ).rowcount
+
+    def rotation_batch(self, usuario, key_id, cursor=None, limit=500):
+        """
+        ROTAÇÃO - Lote de senhas do usuário ainda não re-cifradas com a chave key_id
+
+        Args:
+            usuario (str): Nome do usuário
+            key_id (str): Identificador da nova chave (VaultCrypto.key_id)
+            cursor (str): Cursor devolvido pelo lote anterior (None = início)
+            limit (int): Quantidade máxima de senhas no lote
+
+        Returns:
+            tuple: (lista de (ID, token Fernet), cursor do próximo lote ou None)
+        """
+        ultimo = self._decode_cursor(cursor) if cursor else ('', '')
+        linhas = self.db.execute(
+            f"SELECT id, nome, senha FROM senhas WHERE {FILTRO_USUARIO} AND (nome, id) > (?, ?) "
+            "AND (versao_chave IS NULL OR versao_chave <> ?) ORDER BY nome, id LIMIT ?",
+            (usuario, *ultimo, key_id, limit)
+        ).fetchall()
+
+        proximo_cursor = None
+        if len(linhas) == limit:
+            proximo_cursor = self._encode_cursor(linhas[-1]['nome'], linhas[-1]['id'])
+        return [(linha['id'], decode_ciphertext(linha['senha'])) for linha in linhas], proximo_cursor
+
+    def rotation_pending(self, usuario, key_id):
+        """
+        ROTAÇÃO - Quantidade de senhas do usuário ainda não re-cifradas com a chave key_id
+
+        Args:
+            usuario (str): Nome do usuário
+            key_id (str): Identificador da nova chave (VaultCrypto.key_id)
+
+        Returns:
+            int: Senhas ativas fora da nova chave
+        """
+        return self.db.execute(
+            f"SELECT COUNT(*) FROM senhas WHERE {FILTRO_USUARIO} "
+            "AND (versao_chave IS NULL OR versao_chave <> ?)",
+            (usuario, key_id)
+        ).fetchone()[0]
+
+    def apply_rotation(self, usuario, resultados, key_id):
+        """
+        ROTAÇÃO - Grava um lote re-cifrado em uma única transação
+
+        Cada escrita só é aplicada se o texto cifrado ainda é o que foi lido e
+        a senha ainda não está na nova chave.
+
+        Args:
+            usuario (str): Nome do usuário
+            resultados (list): Tuplas (ID, token lido, token re-cifrado, impressão digital)
+            key_id (str): Identificador da nova chave
+
+        Returns:
+            int: Quantidade de linhas gravadas
+        """
+        if not resultados:
+            return 0
+
+        agora = _to_db(write_time())
+        with self.db.transaction() as conexao:
+            return conexao.executemany(
+                "UPDATE senhas SET senha = ?, versao_chave = ?, impressao = ?, data_atualizacao = ?, "
+                "versao = versao + 1 WHERE id = ? AND usuario = ? AND senha = ? "
+                "AND (versao_chave IS NULL OR versao_chave <> ?)",
+                [
+                    (encode_ciphertext(novo), key_id, impressao, agora, password_id, usuario, encode_ciphertext(antigo),
+                     key_id)
+                    for password_id, antigo, novo, impressao in resultados
+                ]
+            ).rowcount
+
+    def load_rotation_checkpoint(self, job_id):
+        """
+        ROTAÇÃO - Lê o checkpoint de uma rotação de chave
+
+        Args:
+            job_id (str): Identificador da rotação
+
+        Returns:
+            dict: Checkpoint gravado ou None
+        """
+        linha = self.db.execute(
+            "SELECT dados, iniciado_em, atualizado_em FROM rotacoes WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not linha:
+            return None
+        return {
+            '_id': job_id,
+            **json.loads(linha['dados']),
+            'iniciado_em': datetime.fromisoformat(linha['iniciado_em']),
+            'atualizado_em': datetime.fromisoformat(linha['atualizado_em'])
+        }
+
+    def save_rotation_checkpoint(self, job_id, campos):
+        """
+        ROTAÇÃO - Grava o checkpoint de uma rotação de chave
+
+        Args:
+            job_id (str): Identificador da rotação
+            campos (dict): Campos a gravar (cursor, contadores, conclusão)
+        """
+        agora = _to_db(utc_now())
+        with self.db.transaction() as conexao:
+            linha = conexao.execute("SELECT dados FROM rotacoes WHERE id = ?", (job_id,)).fetchone()
+            dados = {**(json.loads(linha['dados']) if linha else {}), **campos}
+            conexao.execute(
+                "INSERT INTO rotacoes (id, dados, iniciado_em, atualizado_em) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET dados = excluded.dados, atualizado_em = excluded.atualizado_em",
+                (job_id, json.dumps(dados), agora, agora)
+            )
+
+    def close_connection(self):
+        """Fecha as conexões com o banco SQLite"""
+        try:
+            self._compaction_stop.set()
+            self.db.close()
+            logger.info("✅ Cofre SQLite fechado")
+        except Exception as e:
+            logger.error("❌ Erro ao fechar conexão: %s", e)
+
+    def __del__(self):
+        """Destrutor para garantir que a conexão seja fechada"""
+        try:
+            self.close_connection()
+        except:
+            pass
+
+
+class SQLiteAuditSink:
+    def __init__(self, path=None):
+        """
+        Destino da trilha de auditoria (AuditTrail) na tabela auditoria
+
+        Sem Redis, o próprio escritor da trilha grava cada lote em uma
+        transação; não há stream nem worker.
+
+        Args:
+            path (str): Arquivo do banco (padrão: SQLITE_PATH)
+        """
+        self.db = SQLiteDatabase(path)
+        self.db.executescript(ESQUEMA_AUDITORIA)
+
+    def write(self, eventos):
+        with self.db.transaction() as conexao:
+            conexao.executemany(
+                "INSERT INTO auditoria (ts, acao, usuario, dados) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        evento['ts'], evento['acao'], evento.get('usuario'),
+                        json.dumps({k: v for k, v in evento.items() if k not in ('ts', 'acao', 'usuario')})
+                    )
+                    for evento in eventos
+                ]
+            )
+
+
+class SQLiteRateLimiter:
+    def __init__(self, db, user_capacity=10, user_rate=10 / 60,
+                 client_capacity=30, client_rate=30 / 60, max_failures=5,
+                 failure_window=900, lockout_base=30, lockout_max=3600):
+        """
+        Limitador de tentativas de login gravado no SQLite
+
+        Mesma política do LoginRateLimiter (token bucket por usuário e por
+        cliente + bloqueio progressivo), com o estado de cada identidade em
+        uma linha de limites_login, lida e gravada na mesma transação.
+
+        Args:
+            db (SQLiteDatabase): Banco da autenticação
+            demais: Ver LoginRateLimiter
+        """
+        self.db = db
+        self.user_capacity = user_capacity
+        self.user_rate = user_rate
+        self.client_capacity = client_capacity
+        self.client_rate = client_rate
+        self.max_failures = max_failures
+        self.failure_window = failure_window
+        self.lockout_base = lockout_base
+        self.lockout_max = lockout_max
+
+    @classmethod
+    def from_env(cls, db):
+        """Cria o limitador com limites vindos das variáveis de ambiente"""
+        return cls(db, **LoginRateLimiter.env_limits())
+
+    def _limits(self, username, client_id):
+        """(identidade, capacidade, fichas por segundo) de cada identidade limitada"""
+        return list(zip(
+            LoginRateLimiter._identities(username, client_id),
+            [self.user_capacity, self.client_capacity],
+            [self.user_rate, self.client_rate]
+        ))
+
+    @staticmethod
+    def _rows(conexao, identidades):
+        """Estado atual das identidades (as que ainda não têm linha ficam de fora)"""
+        marcadores = ', '.join('?' * len(identidades))
+        return {
+            linha['identidade']: linha
+            for linha in conexao.execute(
+                f"SELECT * FROM limites_login WHERE identidade IN ({marcadores})", identidades
+            )
+        }
+
+    def check(self, username, client_id=None):
+        """
+        Consome uma tentativa; recusa se a identidade estiver bloqueada ou sem fichas
+
+        Args:
+            username (str): Usuário da tentativa
+            client_id (str): Identificador do cliente (ex.: IP), se conhecido
+
+        Raises:
+            LoginThrottled: Se a tentativa deve ser recusada
+        """
+        limites = self._limits(username, client_id)
+        agora = time.time()
+
+        with self.db.transaction() as conexao:
+            linhas = self._rows(conexao, [identidade for identidade, _, _ in limites])
+            espera = 0.0
+            fichas = []
+            for identidade, capacidade, taxa in limites:
+                linha = linhas.get(identidade)
+                disponivel = capacidade
+                if linha:
+                    if linha['bloqueado_ate'] and linha['bloqueado_ate'] > agora:
+                        espera = max(espera, linha['bloqueado_ate'] - agora)
+                    if linha['fichas'] is not None:
+                        disponivel = min(capacidade, linha['fichas'] + (agora - linha['ts']) * taxa)
+                if disponivel < 1:
+                    espera = max(espera, (1 - disponivel) / taxa)
+                fichas.append((identidade, disponivel - 1, agora))
+
+            if espera > 0:
+                raise LoginThrottled(espera)
+
+            conexao.executemany(
+                "INSERT INTO limites_login (identidade, fichas, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT (identidade) DO UPDATE SET fichas = excluded.fichas, ts = excluded.ts",
+                fichas
+            )
+
+    def record_failure(self, username, client_id=None):
+        """
+        Registra uma falha de login para o usuário e o cliente
+
+        Returns:
+            int: Duração do bloqueio aplicado, em segundos (0 se nenhum)
+        """
+        identidades = LoginRateLimiter._identities(username, client_id)
+        agora = time.time()
+        aplicado = 0
+
+        with self.db.transaction() as conexao:
+            linhas = self._rows(conexao, identidades)
+            estados = []
+            for identidade in identidades:
+                linha = linhas.get(identidade)
+                falhas, falhas_ate, nivel, nivel_ate, bloqueado_ate = 0, agora + self.failure_window, 0, None, None
+                if linha:
+                    if linha['falhas_ate'] and linha['falhas_ate'] > agora:
+                        falhas, falhas_ate = linha['falhas'], linha['falhas_ate']
+                    if linha['nivel_ate'] and linha['nivel_ate'] > agora:
+                        nivel, nivel_ate = linha['nivel'], linha['nivel_ate']
+                    bloqueado_ate = linha['bloqueado_ate']
+
+                falhas += 1
+                if falhas >= self.max_failures:
+                    nivel += 1
+                    nivel_ate = agora + self.lockout_max * 4
+                    duracao = min(self.lockout_max, self.lockout_base * 2 ** (nivel - 1))
+                    bloqueado_ate = agora + duracao
+                    falhas, falhas_ate = 0, None
+                    aplicado = max(aplicado, duracao)
+
+                estados.append((identidade, falhas, falhas_ate, nivel, nivel_ate, bloqueado_ate))
+
+            conexao.executemany(
+                "INSERT INTO limites_login (identidade, falhas, falhas_ate, nivel, nivel_ate, bloqueado_ate) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (identidade) DO UPDATE SET "
+                "falhas = excluded.falhas, falhas_ate = excluded.falhas_ate, nivel = excluded.nivel, "
+                "nivel_ate = excluded.nivel_ate, bloqueado_ate = excluded.bloqueado_ate",
+                estados
+            )
+        return aplicado
+
+    def reset(self, conexao, username):
+        """
+        Zera falhas e nível do usuário após um login bem-sucedido
+
+        Recebe a conexão da transação que registra o login, para que tudo
+        seja gravado junto.
+        """
+        conexao.execute(
+            "UPDATE limites_login SET falhas = 0, falhas_ate = NULL, nivel = 0, nivel_ate = NULL "
+            "WHERE identidade = ?",
+            (LoginRateLimiter._identities(username, None)[0],)
+        )
+
+
+@instrumented('sqlite')
+class SQLiteAuthStore(AuthStore):
+    def __init__(self, path=None):
+        """
+        Usuários, sessões e limite de tentativas em um arquivo SQLite local
+
+        Mesmo contrato do RedisAuth (ver storage.AuthStore); o hash das
+        senhas continua no pool de hashing.
+
+        Args:
+            path (str): Arquivo do banco (padrão: SQLITE_PATH)
+        """
+        try:
+            self.db = SQLiteDatabase(path)
+            self.db.executescript(ESQUEMA_AUTENTICACAO)
+            logger.info("✅ Autenticação SQLite aberta em %s", self.db.path)
+
+            self.hasher = PasswordHasher.from_env()
+            self.rate_limiter = SQLiteRateLimiter.from_env(self.db)
+            # Tempo (em segundos) sem uso após o qual a sessão expira
+            self.session_ttl = int(os.getenv('SESSION_TTL', 1800))
+
+        except Exception as e:
+            logger.error("❌ Erro ao abrir o banco SQLite: %s", e)
+            raise
+
+    def register(self, username, password):
+        """
+        Registra um novo usuário
+
+        Args:
+            username (str): Nome de usuário
+            password (str): Senha do usuário
+
+        Returns:
+            bool: True se registrado com sucesso, False se usuário já existe
+        """
+        try:
+            registro = split_hash(self.hasher.hash(password))
+            cursor = self.db.execute(
+                "INSERT INTO usuarios (username, kdf, kdf_params, salt, password_hash, vault_salt, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (username) DO NOTHING",
+                (username, registro['kdf'], registro['kdf_params'], registro['salt'], registro['password_hash'],
+                 new_salt(), datetime.now().isoformat())
+            )
+            if not cursor.rowcount:
+                logger.warning("⚠️ Usuário '%s' já existe", username)
+                return False
+            logger.debug("✅ Usuário '%s' registrado com sucesso!", username)
+            return True
+
+        except Exception as e:
+            logger.error("❌ Erro ao registrar usuário: %s", e)
+            return False
+
+    def login(self, username, password, client_id=None):
+        """
+        Autentica um usuário e devolve os dados necessários para a sessão
+
+        Args:
+            username (str): Nome de usuário
+            password (str): Senha do usuário
+            client_id (str): Identificador do cliente (ex.: IP) para o limitador
+
+        Returns:
+            dict: {'username', 'vault_salt', 'created_at', 'last_login'} ou None
+
+        Raises:
+            LoginThrottled: Se a tentativa foi recusada pelo limitador
+        """
+        try:
+            self.rate_limiter.check(username, client_id)
+            registro = self.db.execute("SELECT * FROM usuarios WHERE username = ?", (username,)).fetchone()
+            if not registro:
+                logger.warning("⚠️ Usuário '%s' não encontrado", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                self.rate_limiter.record_failure(username, client_id)
+                return None
+
+            stored_hash = join_hash(registro)
+            if not self.hasher.verify(password, stored_hash):
+                logger.warning("❌ Senha incorreta para usuário '%s'", username)
+                AUDIT.record('login_failed', username, cliente=client_id)
+                self.rate_limiter.record_failure(username, client_id)
+                return None
+
+            # Hashes com custo desatualizado são regravados, desde que o hash
+            # guardado ainda seja o conferido (não desfaz uma troca de senha
+            # concorrente). O novo hash é calculado antes da transação, para não
+            # segurar o lock de escrita do arquivo durante o KDF
+            novo = None
+            if self.hasher.needs_rehash(stored_hash):
+                novo = split_hash(self.hasher.hash(password))
+
+            with self.db.transaction() as conexao:
+                if novo:
+                    conexao.execute(
+                        "UPDATE usuarios SET kdf = ?, kdf_params = ?, salt = ?, password_hash = ? "
+                        "WHERE username = ? AND password_hash = ?",
+                        (novo['kdf'], novo['kdf_params'], novo['salt'], novo['password_hash'], username,
+                         registro['password_hash'])
+                    )
+                conexao.execute(
+                    "UPDATE usuarios SET last_login = ?, login_count = login_count + 1 WHERE username = ?",
+                    (datetime.now().isoformat(), username)
+                )
+                self.rate_limiter.reset(conexao, username)
+
+            logger.debug("✅ Usuário '%s' autenticado com sucesso!", username)
+            AUDIT.record('login', username, cliente=client_id)
+            return {
+                'username': username,
+                'vault_salt': registro['vault_salt'],
+                'created_at': registro['created_at'],
+                'last_login': registro['last_login']
+            }
+
+        except LoginThrottled as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            AUDIT.record('login_throttled', username, cliente=client_id)
+            raise
+        except HashingQueueFull as e:
+            logger.warning("⚠️ Autenticação recusada: %s", e)
+            return None
+        except Exception as e:
+            logger.error("❌ Erro ao autenticar usuário: %s", e)
+            return None
+
+    def get_vault_salt(self, username):
+        """
+        Retorna o salt usado para derivar a chave do cofre do usuário
+
+        Args:
+            username (str): Nome de usuário
+
+        Returns:
+            str: Salt em base64 ou None
+        """
+        try:
+            linha = self.db.execute("SELECT vault_salt FROM usuarios WHERE username = ?", (username,)).fetchone()
+            return linha['vault_salt'] if linha else None
+        except Exception as e:
+            logger.error("❌ Erro ao obter salt do cofre: %s", e)
+            return None
+
+    def begin_key_rotation(self, username):
+        """
+        Reserva o salt da nova chave do cofre para uma troca de senha mestra
+
+        Args:
+            username (str): Nome de usuário
+
+        Returns:
+            str: Salt da nova chave em base64 ou None em caso de erro
+        """
+        try:
+            linha = self.db.execute(
+                "UPDATE usuarios SET pending_vault_salt = coalesce(pending_vault_salt, ?) "
+                "WHERE username = ? RETURNING pending_vault_salt",
+                (new_salt(), username)
+            ).fetchall()
+            return linha[0]['pending_vault_salt'] if linha else None
+        except Exception as e:
+            logger.error("❌ Erro ao reservar salt do cofre: %s", e)
+            return None
+
+    def change_password(self, username, new_password, vault_salt):
+        """
+        Troca a senha mestra e o salt do cofre, revogando todas as sessões
+
+        Args:
+            username (str): Nome de usuário
+            new_password (str): Nova senha
+            vault_salt (str): Salt da nova chave (de begin_key_rotation)
+
+        Returns:
+            bool: True se a senha foi trocada
+        """
+        try:
+            registro = split_hash(self.hasher.hash(new_password))
+            with self.db.transaction() as conexao:
+                conexao.execute(
+                    "UPDATE usuarios SET kdf = ?, kdf_params = ?, salt = ?, password_hash = ?, vault_salt = ?, "
+                    "pending_vault_salt = NULL WHERE username = ?",
+                    (registro['kdf'], registro['kdf_params'], registro['salt'], registro['password_hash'],
+                     vault_salt, username)
+                )
+                conexao.execute("DELETE FROM sessoes WHERE username = ?", (username,))
+            logger.info("✅ Senha de '%s' alterada com sucesso!", username)
+            return True
+        except Exception as e:
+            logger.error("❌ Erro ao alterar senha: %s", e)
+            return False
+
+    @staticmethod
+    def _session_id(token):
+        """ID da sessão: hash do token, que nunca é armazenado"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def create_session(self, username, seal=None):
+        """
+        Cria uma sessão e devolve o token opaco que a identifica
+
+        Sessões expiradas são apagadas aqui (faixa do índice sessoes_expiracao).
+
+        Args:
+            username (str): Nome de usuário autenticado
+            seal (callable): Opcional; recebe o token e devolve o texto guardado como 'sealed_key'
+
+        Returns:
+            str: Token de sessão ou None em caso de erro
+        """
+        try:
+            token = secrets.token_urlsafe(32)
+            agora = time.time()
+            with self.db.transaction() as conexao:
+                conexao.execute("DELETE FROM sessoes WHERE expires_at <= ?", (agora,))
+                conexao.execute(
+                    "INSERT INTO sessoes (id, username, sealed_key, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (self._session_id(token), username, seal(token) if seal else None,
+                     datetime.now().isoformat(), agora + self.session_ttl)
+                )
+            return token
+        except Exception as e:
+            logger.error("❌ Erro ao criar sessão: %s", e)
+            return None
+
+    def resolve_session(self, token):
+        """
+        Busca a sessão de um token e renova sua expiração
+
+        Args:
+            token (str): Token de sessão
+
+        Returns:
+            dict: {'username', 'created_at', 'sealed_key'?} ou None se inválida/expirada
+        """
+        try:
+            agora = time.time()
+            linha = self.db.execute(
+                "UPDATE sessoes SET expires_at = ? WHERE id = ? AND expires_at > ? "
+                "RETURNING username, created_at, sealed_key",
+                (agora + self.session_ttl, self._session_id(token), agora)
+            ).fetchall()
+            if not linha:
+                return None
+            return {campo: linha[0][campo] for campo in linha[0].keys() if linha[0][campo] is not None}
+        except Exception as e:
+            logger.error("❌ Erro ao buscar sessão: %s", e)
+            return None
+
+    def revoke_session(self, token):
+        """
+        Revoga uma sessão (logout)
+
+        Args:
+            token (str): Token de sessão
+
+        Returns:
+            bool: True se a sessão existia
+        """
+        try:
+            return self.db.execute("DELETE FROM sessoes WHERE id = ?", (self._session_id(token),)).rowcount > 0
+        except Exception as e:
+            logger.error("❌ Erro ao revogar sessão: %s", e)
+            return False
+
+    def revoke_user_sessions(self, username):
+        """
+        Revoga todas as sessões de um usuário
+
+        Args:
+            username (str): Nome de usuário
+
+        Returns:
+            int: Quantidade de sessões revogadas
+        """
+        try:
+            return self.db.execute("DELETE FROM sessoes WHERE username = ?", (username,)).rowcount
+        except Exception as e:
+            logger.error("❌ Erro ao revogar sessões: %s", e)
+            return 0
+
+    def delete_user(self, username):
+        """
+        Remove um usuário e suas sessões
+
+        Args:
+            username (str): Nome de usuário
+
+        Returns:
+            bool: True se removido, False caso contrário
+        """
+        try:
+            with self.db.transaction() as conexao:
+                removido = conexao.execute("DELETE FROM usuarios WHERE username = ?", (username,)).rowcount
+                conexao.execute("DELETE FROM sessoes WHERE username = ?", (username,))
+            if removido:
+                logger.debug("✅ Usuário '%s' removido com sucesso!", username)
+                return True
+            logger.warning("⚠️ Usuário '%s' não encontrado", username)
+            return False
+        except Exception as e:
+            logger.error("❌ Erro ao remover usuário: %s", e)
+            return False
+
+    def user_exists(self, username):
+        """
+        Verifica se um usuário existe
+
+        Args:
+            username (str): Nome de usuário
+
+        Returns:
+            bool: True se existe, False caso contrário
+        """
+        try:
+            return self.db.execute("SELECT 1 FROM usuarios WHERE username = ?", (username,)).fetchone() is not None
+        except Exception as e:
+            logger.error("❌ Erro ao verificar usuário: %s", e)
+            return False
+
+    def list_users_page(self, prefix="", cursor=None, page_size=100):
+        """
+        Lista uma página de usuários (intervalo na chave primária)
+
+        Args:
+            prefix (str): Retorna apenas usernames que começam com este prefixo
+            cursor (str): Último username da página anterior (None = início)
+            page_size (int): Quantidade máxima de usernames na página
+
+        Returns:
+            tuple: (lista de usernames, cursor da próxima página ou None)
+        """
+        try:
+            # Busca um username a mais para saber se existe próxima página
+            if cursor:
+                linhas = self.db.execute(
+                    "SELECT username FROM usuarios WHERE username > ? AND username < ? ORDER BY username LIMIT ?",
+                    (cursor, prefix + FIM_PREFIXO, page_size + 1)
+                )
+            else:
+                linhas = self.db.execute(
+                    "SELECT username FROM usuarios WHERE username >= ? AND username < ? ORDER BY username LIMIT ?",
+                    (prefix, prefix + FIM_PREFIXO, page_size + 1)
+                )
+            usernames = [linha['username'] for linha in linhas]
+            if len(usernames) > page_size:
+                usernames = usernames[:page_size]
+                return usernames, usernames[-1]
+            return usernames, None
+        except Exception as e:
+            logger.error("❌ Erro ao listar usuários: %s", e)
+            return [], None
+
+    def hash_stats(self):
+        """
+        Estatísticas de latência do hashing de senhas
+
+        Returns:
+            dict: Ver PasswordHasher.stats
+        """
+        return self.hasher.stats()
+
+    def close_connection(self):
+        """Fecha as conexões com o banco SQLite"""
+        try:
+            self.db.close()
+            self.hasher.shutdown()
+            logger.info("✅ Autenticação SQLite fechada")
+        except Exception as e:
+            logger.error("❌ Erro ao fechar conexão: %s", e)
+
+    def __del__(self):
+        """Destrutor para garantir que a conexão seja fechada"""
+        try:
+            self.close_connection()
+        except:
+            pass
@@ -0,0 +1,316 @@
+import base64
+import importlib
+import json
+import os
+from abc import ABC, abstractmethod
+
+from ratelimit import LoginThrottled
+
+# Implementações disponíveis: STORAGE_BACKEND -> ((rótulo, módulo, classe) do cofre, (...) da autenticação)
+BACKENDS = {
+    'mongo': (('mongodb', 'database', 'MongoDBManager'), ('redis', 'auth', 'RedisAuth')),
+    'sqlite': (('sqlite', 'sqlite_store', 'SQLiteVaultStore'), ('sqlite', 'sqlite_store', 'SQLiteAuthStore'))
+}
+
+
+class VersionConflict(Exception):
+    def __init__(self, password_id, expected_version, current):
+        """
+        A senha foi alterada (por outra sessão ou pela rotação de chave) desde que foi lida
+
+        Args:
+            password_id (str): ID da senha
+            expected_version (int): Versão lida pelo chamador
+            current (dict): Documento atual (metadados), com a versão vigente em 'versao'
+        """
+        super().__init__(
+            f"Senha {password_id} alterada por outra sessão "
+            f"(versão lida {expected_version}, atual {current.get('versao', 0)})"
+        )
+        self.password_id = password_id
+        self.expected_version = expected_version
+        self.current = current
+
+
+class VaultStore(ABC):
+    """
+    Armazenamento das senhas do cofre
+
+    Os documentos usam os nomes de campo do app ('usuario', 'nome', 'senha',
+    'data_criacao', 'data_atualizacao'...) com '_id' como string; o texto
+    cifrado ('senha') é o token Fernet e nunca é lido nem gerado aqui.
+
+    Cada alteração incrementa 'versao'. update_password e delete_password
+    só alteram senhas do próprio usuário, em uma única ida ao banco, e
+    devolvem o documento já alterado; com expected_version, levantam
+    VersionConflict se a senha mudou desde a leitura.
+    """
+
+    @staticmethod
+    def _encode_cursor(nome, password_id):
+        """
+        Gera um cursor opaco a partir da última entrada de uma página
+
+        Args:
+            nome (str): Nome/serviço da última entrada
+            password_id: ID da última entrada
+
+        Returns:
+            str: Cursor codificado em base64
+        """
+        bruto = json.dumps([nome, str(password_id)]).encode()
+        return base64.urlsafe_b64encode(bruto).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """
+        Decodifica um cursor gerado por _encode_cursor
+
+        Args:
+            cursor (str): Cursor codificado
+
+        Returns:
+            tuple: (nome, ID como string) da última entrada da página anterior
+        """
+        nome, password_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return nome, password_id
+
+    @abstractmethod
+    def create_password(self, usuario, nome, senha, impressao=None):
+        """CREATE - Insere uma senha; devolve o ID ou None"""
+
+    @abstractmethod
+    def bulk_create_passwords(self, usuario, entradas, ordered=False):
+        """CREATE (em lote) - Devolve (quantidade inserida, [(índice, mensagem)])"""
+
+    @abstractmethod
+    def iter_passwords(self, usuario, batch_size=1000):
+        """READ - Gerador das senhas do usuário, em ordem de nome"""
+
+    @abstractmethod
+    def list_passwords(self, usuario):
+        """READ - Todas as senhas do usuário, em ordem de nome"""
+
+    @abstractmethod
+    def list_passwords_page(self, usuario, limit=50, cursor=None):
+        """READ - Página keyset (nome, _id) sem o texto cifrado; devolve (documentos, cursor)"""
+
+    @abstractmethod
+    def search_passwords(self, usuario, query, limit=20):
+        """READ - Busca por prefixo do nome, sem diferenciar maiúsculas"""
+
+    @abstractmethod
+    def get_password_by_id(self, usuario, password_id):
+        """READ - Uma senha do usuário pelo ID, ou None"""
+
+    @abstractmethod
+    def update_password(self, usuario, password_id, novo_nome, nova_senha, impressao=None, expected_version=None):
+        """UPDATE - Documento alterado, ou None se não existe/não é do usuário"""
+
+    @abstractmethod
+    def delete_password(self, usuario, password_id, expected_version=None):
+        """DELETE - Lápide da senha, ou None se não existe/não é do usuário"""
+
+    @abstractmethod
+    def delete_user_passwords(self, usuario):
+        """Apaga definitivamente todas as entradas do usuário; devolve a quantidade"""
+
+    @abstractmethod
+    def changes_since(self, usuario, checkpoint=None, limit=500, settle_seconds=2):
+        """SYNC - Alterações após o checkpoint (ver MongoDBManager.changes_since)"""
+
+    @abstractmethod
+    def find_reused_passwords(self, usuario):
+        """READ - Grupos {'count', 'entries'} de senhas com a mesma impressão digital"""
+
+    @abstractmethod
+    def fingerprint_backlog(self, usuario, limit=500):
+        """Lote de (ID, token) de senhas ainda sem impressão digital"""
+
+    @abstractmethod
+    def set_fingerprints(self, usuario, impressoes):
+        """Grava (ID, token lido, impressão); devolve a quantidade gravada"""
+
+    @abstractmethod
+    def rotation_batch(self, usuario, key_id, cursor=None, limit=500):
+        """ROTAÇÃO - Lote de (ID, token) ainda fora da chave key_id; devolve (lote, cursor)"""
+
+    @abstractmethod
+    def rotation_pending(self, usuario, key_id):
+        """ROTAÇÃO - Quantidade de senhas ativas ainda fora da chave key_id"""
+
+    @abstractmethod
+    def apply_rotation(self, usuario, resultados, key_id):
+        """ROTAÇÃO - Grava (ID, token lido, token novo, impressão); devolve a quantidade gravada"""
+
+    @abstractmethod
+    def load_rotation_checkpoint(self, job_id):
+        """ROTAÇÃO - Checkpoint gravado ou None"""
+
+    @abstractmethod
+    def save_rotation_checkpoint(self, job_id, campos):
+        """ROTAÇÃO - Grava (upsert) o checkpoint"""
+
+    @abstractmethod
+    def close_connection(self):
+        """Libera as conexões"""
+
+
+class AuthStore(ABC):
+    """
+    Usuários, sessões e limite de tentativas de login
+
+    Os métodos seguem o contrato de RedisAuth (mesmos argumentos, retornos
+    e exceções, como LoginThrottled em login).
+    """
+
+    @abstractmethod
+    def register(self, username, password):
+        """Registra o usuário; False se já existe"""
+
+    @abstractmethod
+    def login(self, username, password, client_id=None):
+        """Dados da sessão ({'username', 'vault_salt', ...}) ou None"""
+
+    def authenticate(self, username, password, client_id=None):
+        """
+        Autentica um usuário
+
+        Args:
+            username (str): Nome de usuário
+            password (str): Senha do usuário
+            client_id (str): Identificador do cliente (ex.: IP) para o limitador
+
+        Returns:
+            bool: True se autenticado, False caso contrário (inclusive se limitado)
+        """
+        try:
+            return self.login(username, password, client_id) is not None
+        except LoginThrottled:
+            return False
+
+    @abstractmethod
+    def get_vault_salt(self, username):
+        """Salt da chave do cofre, ou None"""
+
+    @abstractmethod
+    def begin_key_rotation(self, username):
+        """Reserva (ou devolve o já reservado) salt da nova chave do cofre"""
+
+    @abstractmethod
+    def change_password(self, username, new_password, vault_salt):
+        """Troca senha mestra e salt, revogando as sessões"""
+
+    @abstractmethod
+    def create_session(self, username, seal=None):
+        """Cria uma sessão; devolve o token opaco"""
+
+    @abstractmethod
+    def resolve_session(self, token):
+        """Dados da sessão (renovando a expiração) ou None"""
+
+    @abstractmethod
+    def revoke_session(self, token):
+        """Revoga uma sessão; True se existia"""
+
+    @abstractmethod
+    def revoke_user_sessions(self, username):
+        """Revoga todas as sessões do usuário; devolve a quantidade"""
+
+    @abstractmethod
+    def delete_user(self, username):
+        """Remove o usuário; True se existia"""
+
+    @abstractmethod
+    def user_exists(self, username):
+        """True se o usuário existe"""
+
+    @abstractmethod
+    def list_users_page(self, prefix="", cursor=None, page_size=100):
+        """Página de usernames em ordem; devolve (usernames, cursor)"""
+
+    def iter_users(self, prefix="", page_size=1000):
+        """
+        Percorre os usuários cadastrados, página por página
+
+        Args:
+            prefix (str): Filtra usernames por prefixo
+            page_size (int): Usernames buscados por página
+
+        Yields:
+            str: Username
+        """
+        cursor = None
+        while True:
+            usernames, cursor = self.list_users_page(prefix, cursor, page_size)
+            yield from usernames
+            if not cursor:
+                break
+
+    def list_users(self, prefix=""):
+        """
+        Lista todos os usuários cadastrados
+
+        Args:
+            prefix (str): Filtra usernames por prefixo
+
+        Returns:
+            list: Lista de usernames
+        """
+        return list(self.iter_users(prefix))
+
+    @abstractmethod
+    def close_connection(self):
+        """Libera as conexões"""
+
+
+def backend_name(backend=None):
+    """
+    Backend de armazenamento configurado
+
+    Args:
+        backend (str): Nome explícito (padrão: STORAGE_BACKEND ou 'mongo')
+
+    Returns:
+        str: 'mongo' ou 'sqlite'
+
+    Raises:
+        ValueError: Se o backend não existe
+    """
+    nome = (backend or os.getenv('STORAGE_BACKEND', 'mongo')).lower()
+    if nome not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND inválido: {nome} (use {', '.join(BACKENDS)})")
+    return nome
+
+
+def store_factories(backend=None):
+    """
+    Classes do cofre e da autenticação do backend configurado
+
+    Os módulos são importados aqui, então um backend não exige os drivers
+    do outro além dos já instalados.
+
+    Args:
+        backend (str): Nome do backend (padrão: STORAGE_BACKEND ou 'mongo')
+
+    Returns:
+        tuple: ((rótulo, classe do cofre), (rótulo, classe da autenticação))
+    """
+    return tuple(
+        (rotulo, getattr(importlib.import_module(modulo), classe))
+        for rotulo, modulo, classe in BACKENDS[backend_name(backend)]
+    )
+
+
+def create_stores(backend=None):
+    """
+    Cria o cofre e a autenticação do backend configurado
+
+    Args:
+        backend (str): Nome do backend (padrão: STORAGE_BACKEND ou 'mongo')
+
+    Returns:
+        tuple: (VaultStore, AuthStore)
+    """
+    (_, cofre), (_, autenticacao) = store_factories(backend)
+    return cofre(), autenticacao()
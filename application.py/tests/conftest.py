@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos do app são importados pelo nome (ex.: `from storage import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
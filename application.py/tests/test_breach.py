@@ -0,0 +1,64 @@
+"""
+Filtro de Bloom de senhas vazadas (breach.build_filter / BreachChecker)
+"""
+import hashlib
+
+import pytest
+
+from breach import BreachChecker, build_filter, filter_size
+
+VAZADAS = [f"senha-vazada-{i}" for i in range(200)]
+
+
+@pytest.fixture
+def checker(tmp_path):
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text('\n'.join(VAZADAS) + '\n', encoding='utf-8')
+    destino = str(tmp_path / 'vazadas.bloom')
+
+    resumo = build_filter(str(corpus), destino, plaintext=True)
+    assert resumo['items'] == len(VAZADAS)
+
+    verificador = BreachChecker(destino)
+    yield verificador
+    verificador.close()
+
+
+def test_members_are_always_found(checker):
+    assert all(checker.is_breached(senha) for senha in VAZADAS)
+
+
+def test_non_members_are_rejected(checker):
+    # Com taxa de 1e-6, mil consultas fora do corpus não devem dar falso positivo
+    assert not any(checker.is_breached(f"nunca-vazou-{i}") for i in range(1000))
+
+
+def test_check_many(checker):
+    assert checker.check_many([VAZADAS[0], 'inedita', None]) == [True, False, False]
+
+
+def test_sha1_corpus_with_counts(tmp_path):
+    corpus = tmp_path / 'pwned.txt'
+    linhas = [f"{hashlib.sha1(s.encode()).hexdigest().upper()}:{i + 1}" for i, s in enumerate(VAZADAS[:10])]
+    corpus.write_text('\n'.join(linhas + ['lixo']) + '\n', encoding='utf-8')
+    destino = str(tmp_path / 'pwned.bloom')
+
+    assert build_filter(str(corpus), destino)['items'] == 10
+    verificador = BreachChecker(destino)
+    assert verificador.is_breached(VAZADAS[0])
+    assert not verificador.is_breached(VAZADAS[10])
+    verificador.close()
+
+
+def test_filter_size_grows_with_precision():
+    m_1, k_1 = filter_size(1000, 1e-3)
+    m_2, k_2 = filter_size(1000, 1e-6)
+    assert m_2 > m_1 and k_2 > k_1
+
+
+def test_invalid_file_is_refused(tmp_path):
+    caminho = tmp_path / 'invalido.bloom'
+    caminho.write_bytes(b'nao sou um filtro' * 4)
+
+    with pytest.raises(ValueError):
+        BreachChecker(str(caminho))
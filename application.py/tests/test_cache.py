@@ -0,0 +1,120 @@
+"""
+Invalidação do cache de consultas (cache.VaultCache / CachedMongoDBManager)
+
+O cache roda na frente do backend 'sqlite', para que os casos não dependam
+de um MongoDB.
+"""
+import pytest
+
+import cache
+from cache import CachedMongoDBManager, VaultCache
+from observability import MetricsRegistry
+from sqlite_store import SQLiteVaultStore
+from storage import VersionConflict
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: agora[0])
+    return agora
+
+
+@pytest.fixture
+def cofre(tmp_path):
+    banco = SQLiteVaultStore(str(tmp_path / 'cofre.db'))
+    yield CachedMongoDBManager(banco, VaultCache(registry=MetricsRegistry()))
+    banco.close_connection()
+
+
+def _nomes(pagina):
+    return [senha['nome'] for senha in pagina[0]]
+
+
+def test_ttl_expires_entries(relogio):
+    consultas = VaultCache(ttl=60, registry=MetricsRegistry())
+    consultas.set('ana', ('pagina', None, 50), [{'_id': 1, 'nome': 'A'}])
+
+    relogio[0] += 59
+    assert consultas.get('ana', ('pagina', None, 50)) is not None
+    relogio[0] += 2
+    assert consultas.get('ana', ('pagina', None, 50)) is None
+    assert consultas.stats()['hits'] == 1 and consultas.stats()['misses'] == 1
+
+
+def test_lru_evicts_least_recent_user():
+    consultas = VaultCache(max_users=2, registry=MetricsRegistry())
+    for usuario in ('ana', 'bia'):
+        consultas.set(usuario, ('pagina', None, 50), [{'_id': 1, 'nome': 'A'}])
+
+    consultas.get('ana', ('pagina', None, 50))
+    consultas.set('caio', ('pagina', None, 50), [{'_id': 1, 'nome': 'A'}])
+
+    assert consultas.get('bia', ('pagina', None, 50)) is None
+    assert consultas.get('ana', ('pagina', None, 50)) is not None
+    assert consultas.stats()['evictions'] == 1
+
+
+def test_readers_get_copies():
+    consultas = VaultCache(registry=MetricsRegistry())
+    consultas.set('ana', ('pagina', None, 50), [{'_id': 1, 'nome': 'A'}])
+
+    consultas.get('ana', ('pagina', None, 50))[0][0]['nome'] = 'alterado'
+    assert consultas.get('ana', ('pagina', None, 50))[0][0]['nome'] == 'A'
+
+
+def test_create_invalidates(cofre):
+    cofre.create_password('ana', 'B', 'token')
+    assert _nomes(cofre.list_passwords_page('ana')) == ['B']
+
+    cofre.create_password('ana', 'A', 'token')
+    assert _nomes(cofre.list_passwords_page('ana')) == ['A', 'B']
+
+
+def test_update_replaces_in_place(cofre):
+    password_id = cofre.create_password('ana', 'A', 'token')
+    cofre.create_password('ana', 'B', 'token')
+    cofre.list_passwords_page('ana')
+    falhas = cofre.cache_stats()['misses']
+
+    cofre.update_password('ana', password_id, 'A', 'token-2')
+    pagina = cofre.list_passwords_page('ana')
+
+    assert cofre.cache_stats()['misses'] == falhas
+    assert _nomes(pagina) == ['A', 'B']
+    assert all('senha' not in senha for senha in pagina[0])
+
+
+def test_rename_drops_user_queries(cofre):
+    password_id = cofre.create_password('ana', 'A', 'token')
+    cofre.create_password('ana', 'B', 'token')
+    cofre.list_passwords_page('ana')
+
+    cofre.update_password('ana', password_id, 'C', 'token')
+
+    assert _nomes(cofre.list_passwords_page('ana')) == ['B', 'C']
+
+
+def test_delete_removes_from_cached_page(cofre):
+    password_id = cofre.create_password('ana', 'A', 'token')
+    cofre.create_password('ana', 'B', 'token')
+    cofre.list_passwords_page('ana')
+    falhas = cofre.cache_stats()['misses']
+
+    cofre.delete_password('ana', password_id)
+
+    assert _nomes(cofre.list_passwords_page('ana')) == ['B']
+    assert cofre.cache_stats()['misses'] == falhas
+
+
+def test_version_conflict_invalidates(cofre):
+    password_id = cofre.create_password('ana', 'A', 'token')
+    versao = cofre.get_password_by_id('ana', password_id).get('versao', 0)
+    cofre.list_passwords_page('ana')
+
+    # Escrita de outra instância, por fora do cache
+    cofre.manager.update_password('ana', password_id, 'A2', 'token-2')
+    with pytest.raises(VersionConflict):
+        cofre.update_password('ana', password_id, 'A3', 'token-3', expected_version=versao)
+
+    assert _nomes(cofre.list_passwords_page('ana')) == ['A2']
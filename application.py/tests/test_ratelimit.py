@@ -0,0 +1,65 @@
+"""
+Limitador de tentativas de login (ratelimit.LoginRateLimiter) sobre fakeredis
+
+Os scripts Lua rodam de verdade (fakeredis com lupa), então os casos cobrem
+o balde de fichas e o bloqueio progressivo como o Redis os executa.
+"""
+import pytest
+
+pytest.importorskip('lupa')
+fakeredis = pytest.importorskip('fakeredis')
+
+from ratelimit import LoginRateLimiter, LoginThrottled
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_bucket_refuses_after_capacity(redis_client):
+    limitador = LoginRateLimiter(redis_client, user_capacity=3, user_rate=1 / 60)
+
+    for _ in range(3):
+        limitador.check('ana')
+    with pytest.raises(LoginThrottled) as recusa:
+        limitador.check('ana')
+    assert 0 < recusa.value.retry_after <= 60
+
+    # O balde é por usuário
+    limitador.check('bia')
+
+
+def test_client_bucket_is_shared_between_users(redis_client):
+    limitador = LoginRateLimiter(redis_client, client_capacity=2, client_rate=1 / 60)
+
+    limitador.check('ana', '10.0.0.1')
+    limitador.check('bia', '10.0.0.1')
+    with pytest.raises(LoginThrottled):
+        limitador.check('caio', '10.0.0.1')
+    limitador.check('caio', '10.0.0.2')
+
+
+def test_lockout_doubles_and_is_capped(redis_client):
+    limitador = LoginRateLimiter(redis_client, max_failures=2, lockout_base=30, lockout_max=100)
+
+    bloqueios = [limitador.record_failure('ana') for _ in range(8)]
+
+    assert bloqueios[0] == 0
+    assert [b for b in bloqueios if b][:3] == [30, 60, 100]
+    with pytest.raises(LoginThrottled) as recusa:
+        limitador.check('ana')
+    assert recusa.value.retry_after > 60
+
+
+def test_reset_keys_clear_failures(redis_client):
+    limitador = LoginRateLimiter(redis_client, max_failures=3)
+
+    limitador.record_failure('ana')
+    limitador.record_failure('ana')
+    chaves = limitador.reset_keys('ana')
+    assert redis_client.exists(*chaves)
+
+    redis_client.delete(*chaves)
+    assert limitador.record_failure('ana') == 0
+    assert limitador.record_failure('ana') == 0
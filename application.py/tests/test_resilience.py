@@ -0,0 +1,84 @@
+"""
+Transições do disjuntor (resilience.CircuitBreaker)
+
+O relógio (time.monotonic) é controlado pelo teste para atravessar o
+reset_timeout sem esperar.
+"""
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpen, ServiceUnavailable
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: agora[0])
+    return agora
+
+
+@pytest.fixture
+def disjuntor(relogio):
+    return CircuitBreaker('mongodb', failure_threshold=3, reset_timeout=30)
+
+
+def test_opens_after_threshold(disjuntor):
+    for _ in range(2):
+        disjuntor.before_call()
+        disjuntor.record_failure()
+    assert disjuntor.state == 'closed'
+
+    disjuntor.record_failure()
+    assert disjuntor.state == 'open'
+    with pytest.raises(CircuitOpen) as recusa:
+        disjuntor.before_call()
+    assert isinstance(recusa.value, ServiceUnavailable)
+
+
+def test_success_resets_failure_count(disjuntor):
+    disjuntor.record_failure()
+    disjuntor.record_failure()
+    disjuntor.record_success()
+    disjuntor.record_failure()
+    assert disjuntor.state == 'closed'
+
+
+def test_half_open_allows_a_single_test_call(disjuntor, relogio):
+    for _ in range(3):
+        disjuntor.record_failure()
+
+    relogio[0] += 29
+    assert disjuntor.state == 'open'
+    relogio[0] += 1
+    assert disjuntor.state == 'half-open'
+
+    disjuntor.before_call()
+    with pytest.raises(CircuitOpen):
+        disjuntor.before_call()
+
+
+def test_test_call_success_closes(disjuntor, relogio):
+    for _ in range(3):
+        disjuntor.record_failure()
+    relogio[0] += 30
+
+    disjuntor.before_call()
+    disjuntor.record_success()
+
+    assert disjuntor.state == 'closed'
+    disjuntor.before_call()
+    disjuntor.before_call()
+
+
+def test_test_call_failure_reopens(disjuntor, relogio):
+    for _ in range(3):
+        disjuntor.record_failure()
+    relogio[0] += 30
+
+    disjuntor.before_call()
+    disjuntor.record_failure()
+
+    assert disjuntor.state == 'open'
+    with pytest.raises(CircuitOpen) as recusa:
+        disjuntor.before_call()
+    assert recusa.value.retry_after == pytest.approx(30)
@@ -0,0 +1,123 @@
+"""
+Rotação da chave do cofre (rotation.KeyRotationJob) sobre o backend 'sqlite'
+
+Um processo no pool basta: os casos tratam de retomada, progresso e troca
+da chave, não de paralelismo.
+"""
+import pytest
+from cryptography.fernet import Fernet
+
+from crypto import VaultCrypto
+from rotation import KeyRotationJob
+from sqlite_store import SQLiteVaultStore
+
+TOTAL = 25
+
+
+@pytest.fixture
+def chaves():
+    return Fernet.generate_key(), Fernet.generate_key()
+
+
+@pytest.fixture
+def cofre(tmp_path, chaves):
+    banco = SQLiteVaultStore(str(tmp_path / 'cofre.db'))
+    antiga = VaultCrypto(chaves[0])
+    banco.bulk_create_passwords('ana', [(f"servico-{i:02d}", antiga.encrypt(f"senha-{i}")) for i in range(TOTAL)])
+    yield banco
+    banco.close_connection()
+
+
+def _job(cofre, chaves):
+    return KeyRotationJob(cofre, 'ana', *chaves, workers=1, batch_size=5)
+
+
+def _abrem_com(cofre, chave):
+    cifrador = VaultCrypto(chave)
+    senhas = cofre.list_passwords('ana')
+    return cifrador.decrypt_many([senha['senha'] for senha in senhas], None).count(None) == 0
+
+
+def test_run_reencrypts_everything(cofre, chaves):
+    progresso = []
+    relatorio = _job(cofre, chaves).run(progress=lambda feitas, total: progresso.append((feitas, total)))
+
+    assert relatorio == {'regravadas': TOTAL, 'erros': []}
+    assert _abrem_com(cofre, chaves[1])
+    assert progresso[-1] == (TOTAL, TOTAL)
+    assert [feitas for feitas, _ in progresso] == sorted(feitas for feitas, _ in progresso)
+    assert {total for _, total in progresso} == {TOTAL}
+
+
+def test_interrupted_run_resumes_from_checkpoint(cofre, chaves, monkeypatch):
+    original = cofre.apply_rotation
+    chamadas = []
+
+    def falha_no_terceiro_lote(*args):
+        chamadas.append(args)
+        if len(chamadas) == 3:
+            raise RuntimeError('queda')
+        return original(*args)
+
+    monkeypatch.setattr(cofre, 'apply_rotation', falha_no_terceiro_lote)
+    job = _job(cofre, chaves)
+    with pytest.raises(RuntimeError):
+        job.run()
+    checkpoint = cofre.load_rotation_checkpoint(job.job_id)
+    assert checkpoint['regravadas'] == 10 and not checkpoint['concluida']
+
+    monkeypatch.setattr(cofre, 'apply_rotation', original)
+    progresso = []
+    relatorio = _job(cofre, chaves).run(progress=lambda feitas, total: progresso.append((feitas, total)))
+
+    assert relatorio['regravadas'] == TOTAL
+    assert progresso[0][0] > 10 and progresso[-1] == (TOTAL, TOTAL)
+    assert cofre.load_rotation_checkpoint(job.job_id)['concluida']
+    assert _abrem_com(cofre, chaves[1])
+
+
+def test_finished_rotation_picks_up_late_writes(cofre, chaves):
+    _job(cofre, chaves).run()
+    cofre.create_password('ana', 'tardia', VaultCrypto(chaves[0]).encrypt('gravada-depois'))
+
+    relatorio = _job(cofre, chaves).run()
+
+    assert relatorio['regravadas'] == TOTAL + 1
+    assert cofre.rotation_pending('ana', VaultCrypto(chaves[1]).key_id) == 0
+
+
+def test_unreadable_entries_are_reported(cofre, chaves):
+    password_id = cofre.create_password('ana', 'corrompida', 'nao-e-um-token')
+
+    relatorio = _job(cofre, chaves).run()
+
+    assert relatorio['erros'] == [str(password_id)]
+    assert relatorio['regravadas'] == TOTAL
+
+
+def test_commit_switches_only_when_nothing_is_pending(cofre, chaves):
+    job = _job(cofre, chaves)
+    pendentes_na_troca = []
+
+    def troca():
+        pendentes_na_troca.append(cofre.rotation_pending('ana', job.key_id))
+        return True
+
+    relatorio = job.commit(troca)
+
+    assert relatorio['trocada'] and pendentes_na_troca == [0]
+
+
+def test_commit_rotates_writes_made_during_switch(cofre, chaves):
+    job = _job(cofre, chaves)
+
+    def troca_com_escrita_antiga():
+        # Sessão ainda na chave antiga grava enquanto a troca acontece
+        cofre.create_password('ana', 'durante', VaultCrypto(chaves[0]).encrypt('x'))
+        return True
+
+    relatorio = job.commit(troca_com_escrita_antiga)
+
+    assert relatorio['trocada']
+    assert cofre.rotation_pending('ana', job.key_id) == 0
+    assert _abrem_com(cofre, chaves[1])
@@ -0,0 +1,158 @@
+"""
+Contrato dos backends de armazenamento (storage.VaultStore/AuthStore)
+
+Os mesmos casos rodam contra o backend 'memory' (MongoDBManager/RedisAuth
+sobre mongomock e fakeredis) e o 'sqlite', para que os dois continuem
+intercambiáveis.
+"""
+import pytest
+
+from storage import VersionConflict
+
+BACKENDS = ('memory', 'sqlite')
+
+
+@pytest.fixture(params=BACKENDS)
+def stores(request, tmp_path):
+    """(cofre, autenticação) de cada backend, vazios"""
+    if request.param == 'memory':
+        pytest.importorskip('mongomock')
+        pytest.importorskip('fakeredis')
+        from auth import RedisAuth
+        from benchmark import memory_backends
+        from database import MongoDBManager
+
+        with memory_backends():
+            cofre, autenticacao = MongoDBManager(), RedisAuth()
+            yield cofre, autenticacao
+    else:
+        from sqlite_store import SQLiteAuthStore, SQLiteVaultStore
+
+        caminho = str(tmp_path / 'cofre.db')
+        cofre, autenticacao = SQLiteVaultStore(caminho), SQLiteAuthStore(caminho)
+        yield cofre, autenticacao
+    cofre.close_connection()
+    autenticacao.close_connection()
+
+
+@pytest.fixture
+def vault(stores):
+    return stores[0]
+
+
+@pytest.fixture
+def auth_store(stores):
+    return stores[1]
+
+
+def test_crud(vault):
+    password_id = vault.create_password('ana', 'Email', 'token-1')
+    assert password_id
+
+    senha = vault.get_password_by_id('ana', password_id)
+    assert (senha['nome'], senha['senha']) == ('Email', 'token-1')
+
+    alterada = vault.update_password('ana', password_id, 'E-mail', 'token-2')
+    assert (alterada['nome'], alterada['senha']) == ('E-mail', 'token-2')
+    assert vault.get_password_by_id('ana', password_id)['senha'] == 'token-2'
+
+    assert vault.delete_password('ana', password_id)
+    assert vault.get_password_by_id('ana', password_id) is None
+    assert not vault.delete_password('ana', password_id)
+
+
+def test_other_users_entries_are_untouchable(vault):
+    password_id = vault.create_password('ana', 'Email', 'token-1')
+
+    assert vault.get_password_by_id('bia', password_id) is None
+    assert not vault.update_password('bia', password_id, 'Roubada', 'x')
+    assert not vault.delete_password('bia', password_id)
+    assert vault.set_fingerprints('bia', [(password_id, 'token-1', 'impressao')]) == 0
+    assert vault.apply_rotation('bia', [(password_id, 'token-1', 'token-novo', 'impressao')], 'chave-2') == 0
+    assert vault.get_password_by_id('ana', password_id)['senha'] == 'token-1'
+
+
+def test_paging(vault):
+    nomes = [f"servico-{i:02d}" for i in range(7)]
+    for nome in reversed(nomes):
+        vault.create_password('ana', nome, 'token')
+    vault.create_password('bia', 'servico-00', 'token')
+
+    vistos, cursor = [], None
+    while True:
+        pagina, cursor = vault.list_passwords_page('ana', limit=3, cursor=cursor)
+        assert len(pagina) <= 3
+        assert all('senha' not in senha for senha in pagina)
+        vistos += [senha['nome'] for senha in pagina]
+        if cursor is None:
+            break
+
+    assert vistos == nomes
+    assert [senha['nome'] for senha in vault.list_passwords('ana')] == nomes
+
+
+def test_search_by_prefix(vault):
+    for nome in ('GitHub', 'gitlab', 'Gmail', 'Banco'):
+        vault.create_password('ana', nome, 'token')
+    vault.create_password('bia', 'Gitea', 'token')
+
+    encontradas = vault.search_passwords('ana', 'GIT')
+    assert sorted(senha['nome'] for senha in encontradas) == ['GitHub', 'gitlab']
+    assert all('senha' not in senha for senha in encontradas)
+    assert len(vault.search_passwords('ana', 'g', limit=2)) == 2
+    assert vault.search_passwords('ana', 'xyz') == []
+
+
+def test_changes_since(vault):
+    primeiro = vault.create_password('ana', 'A', 'token')
+    segundo = vault.create_password('ana', 'B', 'token')
+
+    inicio = vault.changes_since('ana', settle_seconds=0)
+    assert sorted(senha['_id'] for senha in inicio['changes']) == sorted([primeiro, segundo])
+    assert not inicio['has_more'] and not inicio['reset']
+
+    assert vault.changes_since('ana', inicio['checkpoint'], settle_seconds=0)['changes'] == []
+
+    # Sem espera: escritas no mesmo milissegundo do checkpoint ainda ficam depois dele
+    vault.update_password('ana', primeiro, 'A2', 'token')
+    vault.delete_password('ana', segundo)
+    alteracoes = vault.changes_since('ana', inicio['checkpoint'], settle_seconds=0)['changes']
+    por_id = {senha['_id']: senha for senha in alteracoes}
+
+    assert set(por_id) == {primeiro, segundo}
+    assert por_id[primeiro]['nome'] == 'A2'
+    assert por_id[segundo].get('excluido') is True
+
+
+def test_versions(vault):
+    password_id = vault.create_password('ana', 'Email', 'token-1')
+    versao = vault.get_password_by_id('ana', password_id).get('versao', 0)
+
+    alterada = vault.update_password('ana', password_id, 'Email', 'token-2', expected_version=versao)
+    assert alterada['versao'] == versao + 1
+
+    with pytest.raises(VersionConflict) as conflito:
+        vault.update_password('ana', password_id, 'Email', 'token-3', expected_version=versao)
+    assert conflito.value.current['versao'] == versao + 1
+
+    with pytest.raises(VersionConflict):
+        vault.delete_password('ana', password_id, expected_version=versao)
+    assert vault.delete_password('ana', password_id, expected_version=versao + 1)
+
+
+def test_sessions(auth_store):
+    assert auth_store.register('ana', 'senha-mestra')
+    assert not auth_store.register('ana', 'outra')
+    assert auth_store.login('ana', 'errada') is None
+    assert auth_store.login('ana', 'senha-mestra')['username'] == 'ana'
+
+    primeira = auth_store.create_session('ana')
+    segunda = auth_store.create_session('ana')
+    assert auth_store.resolve_session(primeira)['username'] == 'ana'
+
+    auth_store.revoke_session(primeira)
+    assert auth_store.resolve_session(primeira) is None
+    assert auth_store.resolve_session(segunda)['username'] == 'ana'
+
+    assert auth_store.revoke_user_sessions('ana') == 1
+    assert auth_store.resolve_session(segunda) is None